@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres',
     # Apps del proyecto
     'inventario',
     'pedidos',
@@ -169,6 +170,11 @@ HOTEL_CONFIG = {
     'STOCK_CRITICO_PORCENTAJE': 10,  # % del stock mínimo para considerar crítico
 }
 
+# Correo de reportes programados (ejecutar_reportes_programados). En desarrollo se
+# muestran en consola; en producción configurar el backend SMTP y sus credenciales.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = HOTEL_CONFIG['EMAIL_REPORTES']
+
 # Configuración de logging
 LOGGING = {
     'version': 1,
@@ -33,7 +33,7 @@ urlpatterns = [
     
     # Aplicaciones principales
     path('', include('inventario.urls')),  # Home y dashboard
-    # path('pedidos/', include('pedidos.urls')),
+    path('pedidos/', include('pedidos.urls')),
     path('reportes/', include('reportes.urls')),
 ]
 
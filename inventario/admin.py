@@ -1,9 +1,13 @@
+from decimal import Decimal
+
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import (
-    Categoria, Area, Producto, Stock, Movimiento, AlertaStock,
-    Proveedor, EntradaStock, DetalleEntradaStock
+    Categoria, Area, Producto, Stock, MinimoArea, PronosticoConsumo, StockSnapshotDiario, Movimiento,
+    AlertaStock, Proveedor, EntradaStock, DetalleEntradaStock
 )
+from .services.alertas import evaluar_alertas_por_area
+from .services.stock import apply_movement, apply_movements
 
 
 @admin.register(Categoria)
@@ -30,6 +34,12 @@ class AreaAdmin(admin.ModelAdmin):
     total_stocks.short_description = 'Productos en Stock'
 
 
+class MinimoAreaInline(admin.TabularInline):
+    model = MinimoArea
+    extra = 0
+    fields = ['area', 'stock_minimo']
+
+
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ['codigo', 'nombre', 'categoria', 'unidad_medida', 'stock_minimo', 'stock_total_display', 'activo']
@@ -37,6 +47,7 @@ class ProductoAdmin(admin.ModelAdmin):
     search_fields = ['codigo', 'nombre', 'descripcion']
     ordering = ['categoria__nombre', 'nombre']
     readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
+    inlines = [MinimoAreaInline]
     
     fieldsets = (
         ('Información Básica', {
@@ -52,7 +63,7 @@ class ProductoAdmin(admin.ModelAdmin):
     )
     
     def stock_total_display(self, obj):
-        stock = obj.stock_total()
+        stock = obj.stock_total
         if obj.tiene_stock_bajo():
             return format_html('<span style="color: red; font-weight: bold;">{} {}</span>', 
                              stock, obj.get_unidad_medida_display().lower())
@@ -70,6 +81,92 @@ class StockAdmin(admin.ModelAdmin):
     def unidad_medida(self, obj):
         return obj.producto.get_unidad_medida_display()
     unidad_medida.short_description = 'Unidad'
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Mover un saldo de producto o área es una transferencia, no una edición
+        return ['producto', 'area'] if obj else []
+
+    # Las ediciones manuales se registran como AJUSTE por la diferencia, a través del
+    # servicio de stock: el libro de movimientos sigue cuadrando (ver `verificar_libro`)
+    def save_model(self, request, obj, form, change):
+        anterior = Stock.objects.filter(pk=obj.pk).values_list('cantidad', flat=True).first() if change else None
+        diferencia = obj.cantidad - (anterior or Decimal('0'))
+        if diferencia:
+            apply_movement(
+                producto=obj.producto, tipo='AJUSTE', motivo='AJUSTE_INVENTARIO',
+                area_origen=obj.area if diferencia < 0 else None,
+                area_destino=obj.area if diferencia > 0 else None,
+                cantidad=abs(diferencia), usuario=request.user,
+                observaciones='Ajuste manual desde el administrador',
+            )
+            obj.pk = Stock.objects.get(producto=obj.producto, area=obj.area).pk
+        elif not change:
+            super().save_model(request, obj, form, change)
+
+    def _dar_de_baja(self, request, stocks):
+        """Registra la salida del saldo que queda en las filas antes de borrarlas"""
+        apply_movements([
+            Movimiento(
+                producto=stock.producto, area_origen=stock.area, tipo='AJUSTE', motivo='AJUSTE_INVENTARIO',
+                cantidad=stock.cantidad, usuario=request.user,
+                observaciones='Baja de stock desde el administrador',
+            )
+            for stock in stocks if stock.cantidad > 0
+        ])
+
+    def delete_model(self, request, obj):
+        self._dar_de_baja(request, [obj])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        self._dar_de_baja(request, queryset.select_related('producto', 'area'))
+        super().delete_queryset(request, queryset)
+
+
+@admin.register(MinimoArea)
+class MinimoAreaAdmin(admin.ModelAdmin):
+    list_display = ['producto', 'area', 'stock_minimo']
+    list_filter = ['area', 'producto__categoria']
+    search_fields = ['producto__codigo', 'producto__nombre', 'area__nombre']
+    ordering = ['area__nombre', 'producto__nombre']
+    
+    # El borrado masivo no pasa por MinimoArea.delete: reevaluar las alertas por área
+    def delete_queryset(self, request, queryset):
+        producto_ids = list(queryset.values_list('producto_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        evaluar_alertas_por_area(producto_ids)
+
+
+@admin.register(PronosticoConsumo)
+class PronosticoConsumoAdmin(admin.ModelAdmin):
+    list_display = ['producto', 'area', 'consumo_diario', 'promedio_movil', 'stock_actual', 'dias_cobertura', 'fecha_calculo']
+    list_filter = ['area', 'producto__categoria']
+    search_fields = ['producto__codigo', 'producto__nombre', 'area__nombre']
+    list_select_related = ['producto', 'area']
+    readonly_fields = [
+        'producto', 'area', 'promedio_movil', 'consumo_diario', 'consumo_total',
+        'dias_con_consumo', 'stock_actual', 'dias_cobertura', 'fecha_calculo',
+    ]
+
+    # Se recalcula con `calcular_pronosticos`; no se cargan a mano
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockSnapshotDiario)
+class StockSnapshotDiarioAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'producto', 'area', 'cantidad']
+    list_filter = ['area']
+    search_fields = ['producto__codigo', 'producto__nombre']
+    date_hierarchy = 'fecha'
+    list_select_related = ['producto', 'area']
+
+    # Se generan desde el libro con `generar_snapshots`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Movimiento)
@@ -221,4 +221,35 @@ DetalleEntradaFormSet = forms.inlineformset_factory(
     extra=1,
     min_num=1,
     can_delete=True
-)
\ No newline at end of file
+)
+
+class ImportarEntradasForm(forms.Form):
+    """Formulario para importar facturas o conteos físicos desde CSV/XLSX"""
+    MODOS = [
+        ('factura', 'Facturas (una entrada por número de documento)'),
+        ('conteo', 'Conteo físico (ajusta el stock a lo contado)'),
+    ]
+
+    archivo = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+        help_text="Archivo .csv (UTF-8, separado por coma o punto y coma) o .xlsx"
+    )
+    modo = forms.ChoiceField(choices=MODOS, widget=forms.Select(attrs={'class': 'form-select'}))
+    numero = forms.CharField(
+        max_length=50,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: CONTEO-2025-10'}),
+        help_text="Número de documento por defecto o del conteo (opcional)"
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Solo validar (no guardar cambios)',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if not archivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('El archivo debe ser .csv o .xlsx.')
+        return archivo
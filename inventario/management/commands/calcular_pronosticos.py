@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.services.pronostico import ALFA, DIAS_HISTORIA, VENTANA, calcular_pronosticos
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el consumo diario pronosticado y los días de cobertura de cada producto '
+        'por área a partir de las salidas registradas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_HISTORIA, help='Días de historia a analizar')
+        parser.add_argument('--ventana', type=int, default=VENTANA, help='Días del promedio móvil')
+        parser.add_argument('--alfa', type=float, default=ALFA, help='Factor del suavizamiento exponencial (0-1)')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1 or options['ventana'] < 1 or not 0 < options['alfa'] <= 1:
+            raise CommandError('--dias y --ventana deben ser positivos y --alfa estar entre 0 y 1.')
+
+        resultado = calcular_pronosticos(options['dias'], options['ventana'], options['alfa'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.pares} pronóstico(s) calculados a partir de {resultado.filas} día(s)-área con salidas '
+            f'en {resultado.segundos:.2f} s; {resultado.eliminados} obsoleto(s) eliminados.'
+        ))
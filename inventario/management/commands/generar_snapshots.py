@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventario.services.snapshots import generar_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Guarda la foto del stock por producto y área al cierre de ayer (tarea nocturna). '
+        'Con --desde rellena también los días anteriores desde el libro de movimientos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primer día a fotografiar (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Último día (por defecto ayer)')
+
+    def handle(self, *args, **options):
+        ayer = timezone.localdate() - timedelta(days=1)
+        hasta = options['hasta'] or ayer
+        desde = options['desde'] or hasta
+        try:
+            resultado = generar_snapshots(desde, hasta)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.dias} día(s) fotografiados ({desde:%d/%m/%Y} - {hasta:%d/%m/%Y}), '
+            f'{resultado.filas} saldo(s) guardados.'
+        ))
@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.services.importacion import MODOS, TAMANO_LOTE, ArchivoInvalido, importar_entradas
+
+
+class Command(BaseCommand):
+    help = 'Importa facturas o conteos físicos de stock desde un archivo CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--modo',
+            choices=MODOS,
+            default='factura',
+            help='factura: entradas por número de documento; conteo: ajusta el stock a lo contado',
+        )
+        parser.add_argument('--usuario', default='admin', help='Usuario que registra la importación')
+        parser.add_argument('--numero', default='', help='Número de documento por defecto (o del conteo)')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por transacción')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida y simula la importación sin guardar cambios',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'No existe el usuario "{options["usuario"]}".')
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor a 0.')
+
+        try:
+            resultado = importar_entradas(
+                options['archivo'],
+                usuario,
+                modo=options['modo'],
+                numero=options['numero'],
+                dry_run=options['dry_run'],
+                tamano_lote=options['lote'],
+            )
+        except (ArchivoInvalido, OSError) as e:
+            raise CommandError(str(e))
+
+        for fila, mensaje in resultado.errores:
+            self.stdout.write(self.style.WARNING(f'- Fila {fila}: {mensaje}'))
+
+        prefijo = '[Simulación] ' if resultado.dry_run else ''
+        resumen = (
+            f'{prefijo}{resultado.filas_importadas} de {resultado.filas_leidas} fila(s) importada(s), '
+            f'{resultado.documentos} documento(s), {resultado.movimientos} movimiento(s).'
+        )
+        if resultado.errores:
+            self.stdout.write(self.style.WARNING(f'{resumen} {len(resultado.errores)} error(es).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(resumen))
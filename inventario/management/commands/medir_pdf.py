@@ -0,0 +1,46 @@
+import io
+
+from django.core.management.base import BaseCommand
+
+from inventario.services.exportacion import PDF_ALINEACIONES, PDF_ANCHOS, PDF_CABECERAS, PDF_LARGOS
+from inventario.services.pdf import renderizar_tabla
+
+
+def filas_sinteticas(cantidad):
+    for i in range(1, cantidad + 1):
+        yield (
+            i, f'PRD-{i:05d}', f'Producto de prueba número {i} con un nombre bastante largo', 'Abarrotes',
+            'UN', i % 50, 1990 + i % 1000, 'Bodega Central:12; Cocina:3; Bar Piscina:1',
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el tiempo de renderizado del PDF de productos con stock con filas sintéticas '
+        '(no toca la base de datos)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=10000, help='Cantidad de filas (por defecto 10000)')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Veces que se renderiza (se informa la mejor)')
+        parser.add_argument('--salida', help='Guarda el último PDF en esta ruta para revisarlo')
+
+    def handle(self, *args, **options):
+        mejor = None
+        for _ in range(max(options['repeticiones'], 1)):
+            destino = io.BytesIO()
+            resultado = renderizar_tabla(
+                filas_sinteticas(options['filas']), destino, 'Reporte de Productos con Stock',
+                PDF_CABECERAS, PDF_ANCHOS, largos=PDF_LARGOS, alineaciones=PDF_ALINEACIONES,
+            )
+            if mejor is None or resultado.segundos < mejor.segundos:
+                mejor = resultado
+
+        if options['salida']:
+            with open(options['salida'], 'wb') as archivo:
+                archivo.write(destino.getvalue())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{mejor.filas} filas, {mejor.paginas} páginas, {len(destino.getvalue()) / 1024:.0f} KB: '
+            f'{mejor.segundos:.2f} s ({mejor.filas / mejor.segundos:.0f} filas/s)'
+        ))
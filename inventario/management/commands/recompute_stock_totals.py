@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventario.services.stock import productos_desincronizados, recalcular_totales
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye y verifica en bloque los totales de stock desnormalizados de cada producto'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-verificar',
+            action='store_true',
+            help='Solo informa los productos desincronizados, sin modificar datos',
+        )
+
+    def handle(self, *args, **options):
+        desfasados = list(productos_desincronizados()[:50])
+        total_desfasados = productos_desincronizados().count()
+        for producto in desfasados:
+            self.stdout.write(
+                f'- {producto.codigo}: guardado {producto.stock_total} (valor {producto.valor_stock}), '
+                f'real {producto.stock_total_real} (valor {producto.valor_stock_real})'
+            )
+        if total_desfasados > len(desfasados):
+            self.stdout.write(f'  ... y {total_desfasados - len(desfasados)} más')
+
+        if options['solo_verificar']:
+            if total_desfasados:
+                raise CommandError(f'{total_desfasados} producto(s) desincronizado(s).')
+            self.stdout.write(self.style.SUCCESS('Todos los totales están sincronizados.'))
+            return
+
+        with transaction.atomic():
+            actualizados = recalcular_totales()
+
+        restantes = productos_desincronizados().count()
+        if restantes:
+            raise CommandError(f'Quedan {restantes} producto(s) desincronizado(s) tras recalcular.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Totales recalculados para {actualizados} producto(s); corregidos {total_desfasados}.'
+        ))
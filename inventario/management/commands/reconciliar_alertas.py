@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventario.services.alertas import reconciliar_alertas
+
+
+class Command(BaseCommand):
+    help = (
+        'Reevalúa en bloque las alertas de stock bajo de todo el catálogo. Red de seguridad '
+        'periódica: las alertas se mantienen en cada movimiento de stock'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            resultado = reconciliar_alertas()
+
+        if resultado.total:
+            self.stdout.write(self.style.WARNING(
+                f'Alertas corregidas: {resultado.abiertas} abierta(s), '
+                f'{resultado.actualizadas} actualizada(s), {resultado.resueltas} resuelta(s).'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Las alertas ya estaban sincronizadas con el stock.'))
@@ -0,0 +1,158 @@
+import json
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventario.models import AlertaStock, Area, Categoria, EntradaStock, Movimiento, Producto, Stock
+from inventario.services.fechas import rango_del_dia
+
+
+def consultas_frecuentes(producto_id, productos_ids):
+    """Consultas en caliente del sistema: (nombre, queryset) cuya tabla principal no debe recorrerse completa.
+
+    La numeración de entradas (`order_by('-id')[:1]`) no se incluye: la resuelve la
+    clave primaria.
+    """
+    hoy_inicio, hoy_fin = rango_del_dia(timezone.localdate())
+    return [
+        ('Historial de un producto (trazabilidad)',
+         Movimiento.objects.filter(producto_id=producto_id).order_by('-fecha', '-id')[:100]),
+        ('Movimientos de hoy (dashboard)',
+         Movimiento.objects.filter(fecha__gte=hoy_inicio, fecha__lt=hoy_fin).order_by().values('id')),
+        ('Movimientos de la última semana (dashboard)',
+         Movimiento.objects.filter(fecha__gte=timezone.now() - timedelta(days=7)).order_by('-fecha')[:10]),
+        ('Historial de movimientos (API, primera página)',
+         Movimiento.objects.order_by('-fecha', '-id')[:50]),
+        ('Alertas activas',
+         AlertaStock.objects.filter(estado='ACTIVA').order_by('-fecha_creacion')[:200]),
+        ('Alerta activa general de un producto',
+         AlertaStock.objects.filter(estado='ACTIVA', area__isnull=True, producto_id=producto_id)),
+        ('Alertas activas por área de un producto',
+         AlertaStock.objects.filter(estado='ACTIVA', area__isnull=False, producto_id=producto_id).order_by()),
+        ('Stock con saldo de una página de productos',
+         Stock.objects.filter(producto_id__in=productos_ids, cantidad__gt=0).order_by()),
+    ]
+
+
+def _recorridos_postgres(plan, tabla):
+    nodos = [json.loads(plan)[0]['Plan']]
+    while nodos:
+        nodo = nodos.pop()
+        if nodo.get('Node Type') == 'Seq Scan' and nodo.get('Relation Name') == tabla:
+            yield nodo
+        nodos.extend(nodo.get('Plans', []))
+
+
+def recorre_tabla_completa(queryset):
+    """Devuelve `(plan, hay_recorrido_completo)` para la tabla principal del queryset"""
+    tabla = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        plan = queryset.explain(format='json')
+        return plan, any(_recorridos_postgres(plan, tabla))
+    plan = queryset.explain()
+    if connection.vendor == 'sqlite':
+        # "SCAN tabla" sin "USING ... INDEX" es un recorrido completo
+        patron = re.compile(rf'\bSCAN {re.escape(tabla)}\b(?!.*USING)')
+        return plan, any(patron.search(linea) for linea in plan.splitlines())
+    raise CommandError(f'Motor de base de datos no soportado: {connection.vendor}.')
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta EXPLAIN sobre las consultas frecuentes de inventario y falla si alguna '
+        'recorre completa su tabla principal (usar --sembrar para probar con volumen)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sembrar',
+            type=int,
+            default=0,
+            help='Crea N movimientos sintéticos (y productos, stocks y alertas proporcionales) '
+                 'antes de verificar; todo se revierte al terminar. Ej: --sembrar 200000',
+        )
+        parser.add_argument('--verbose-plan', action='store_true', help='Muestra el plan de cada consulta')
+
+    def handle(self, *args, **options):
+        fallas = []
+        with transaction.atomic():
+            if options['sembrar']:
+                self._sembrar(options['sembrar'])
+                self._analizar()
+            productos_ids = list(Producto.objects.order_by('id').values_list('id', flat=True)[:12])
+            if not productos_ids:
+                raise CommandError('No hay productos: use --sembrar N para generar datos de prueba.')
+
+            for nombre, queryset in consultas_frecuentes(productos_ids[0], productos_ids):
+                plan, recorre = recorre_tabla_completa(queryset)
+                if recorre:
+                    fallas.append(nombre)
+                    self.stdout.write(self.style.ERROR(f'- {nombre}: recorre completa la tabla'))
+                else:
+                    self.stdout.write(f'- {nombre}: usa índice')
+                if options['verbose_plan'] or recorre:
+                    self.stdout.write(plan)
+            transaction.set_rollback(True)
+
+        if fallas:
+            raise CommandError(f'{len(fallas)} consulta(s) frecuente(s) sin índice adecuado.')
+        self.stdout.write(self.style.SUCCESS('Todas las consultas frecuentes usan índices.'))
+
+    def _analizar(self):
+        tablas = [m._meta.db_table for m in (Producto, Stock, Movimiento, AlertaStock, EntradaStock)]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                for tabla in tablas:
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(tabla)}')
+            else:
+                cursor.execute('ANALYZE')
+
+    def _sembrar(self, total_movimientos):
+        self.stdout.write(f'Sembrando {total_movimientos} movimientos sintéticos (se revierten al terminar)...')
+        usuario = User.objects.order_by('id').first() or User.objects.create(username='verificar_indices')
+        categoria = Categoria.objects.create(nombre=f'Verificación índices {timezone.now():%H%M%S%f}')
+        areas = Area.objects.bulk_create([
+            Area(nombre=f'Área verificación {i}', tipo='BODEGA') for i in range(5)
+        ])
+        productos = Producto.objects.bulk_create([
+            Producto(
+                codigo=f'IDX-{i:06d}', nombre=f'Producto verificación {i}', categoria=categoria,
+                unidad_medida='UN', stock_minimo=Decimal('5'), precio_unitario=Decimal('100'),
+            )
+            for i in range(max(total_movimientos // 200, 100))
+        ], batch_size=2000)
+        Stock.objects.bulk_create([
+            Stock(producto=producto, area=area, cantidad=Decimal(i % 3) * 10)
+            for i, producto in enumerate(productos)
+            for area in areas
+        ], batch_size=5000)
+        AlertaStock.objects.bulk_create([
+            AlertaStock(
+                producto=producto, stock_actual=Decimal('0'), stock_minimo=Decimal('5'),
+                estado='ACTIVA' if i % 20 == 0 else 'RESUELTA',
+            )
+            for i, producto in enumerate(productos)
+        ], batch_size=5000)
+
+        # `fecha` es auto_now_add: se desactiva mientras se siembra para repartir los
+        # movimientos hacia atrás (uno cada 5 minutos, ~2 años con 200.000)
+        campo_fecha = Movimiento._meta.get_field('fecha')
+        ahora = timezone.now()
+        campo_fecha.auto_now_add = False
+        try:
+            for inicio in range(0, total_movimientos, 5000):
+                Movimiento.objects.bulk_create([
+                    Movimiento(
+                        producto=productos[i % len(productos)], area_destino=areas[i % len(areas)],
+                        tipo='ENTRADA', motivo='COMPRA', cantidad=Decimal('1'), usuario=usuario,
+                        fecha=ahora - timedelta(minutes=5 * i),
+                    )
+                    for i in range(inicio, min(inicio + 5000, total_movimientos))
+                ])
+        finally:
+            campo_fecha.auto_now_add = True
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.models import Area, Producto
+from inventario.services.libro import verificar_libro
+
+
+class Command(BaseCommand):
+    help = (
+        'Reproduce el libro de movimientos y lo compara con el stock por producto y área (tarea '
+        'nocturna). Con --reconstruir corrige el stock con los saldos del libro'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconstruir',
+            action='store_true',
+            help='Escribe en Stock los saldos del libro para cada diferencia encontrada',
+        )
+
+    def handle(self, *args, **options):
+        resultado = verificar_libro(reconstruir=options['reconstruir'])
+        self.stdout.write(
+            f'{resultado.movimientos} movimiento(s) reproducidos en {resultado.pares} par(es) '
+            f'producto/área ({resultado.segundos:.2f} s).'
+        )
+
+        if resultado.ejemplos:
+            productos = Producto.objects.in_bulk({d.producto_id for d in resultado.ejemplos})
+            areas = Area.objects.in_bulk({d.area_id for d in resultado.ejemplos})
+            for deriva in resultado.ejemplos:
+                self.stdout.write(
+                    f'- {productos[deriva.producto_id].codigo} en {areas[deriva.area_id].nombre}: '
+                    f'libro {deriva.libro}, stock {deriva.stock} (diferencia {deriva.diferencia:+})'
+                )
+            if resultado.derivas > len(resultado.ejemplos):
+                self.stdout.write(f'  ... y {resultado.derivas - len(resultado.ejemplos)} más')
+
+        if resultado.negativos:
+            self.stderr.write(self.style.WARNING(
+                f'{resultado.negativos} saldo(s) del libro quedan negativos: faltan movimientos, no se reconstruyen.'
+            ))
+        if not resultado.derivas:
+            self.stdout.write(self.style.SUCCESS('El stock coincide con el libro de movimientos.'))
+        elif options['reconstruir']:
+            self.stdout.write(self.style.SUCCESS(f'Stock reconstruido en {resultado.corregidos} par(es).'))
+        else:
+            raise CommandError(f'{resultado.derivas} diferencia(s) entre el stock y el libro.')
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:26
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_totales(apps, schema_editor):
+    Producto = apps.get_model('inventario', 'Producto')
+    Stock = apps.get_model('inventario', 'Stock')
+    cero = Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    def total():
+        return Coalesce(
+            Subquery(
+                Stock.objects.filter(producto=OuterRef('pk')).order_by().values('producto').annotate(
+                    total=Sum('cantidad')
+                ).values('total')[:1]
+            ),
+            cero,
+        )
+
+    Producto.objects.update(
+        stock_total=total(),
+        valor_stock=ExpressionWrapper(
+            total() * Coalesce(F('precio_unitario'), cero),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_seed_demo_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='stock_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, help_text='Stock total sumando todas las áreas', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='valor_stock',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, help_text='Stock total valorizado al precio unitario de referencia', max_digits=14),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+
+# Configuración de texto en español insensible a tildes, trigger que mantiene el
+# vector de búsqueda y los índices GIN. Solo aplica en PostgreSQL: en otros motores
+# la búsqueda usa icontains (ver inventario/services/busqueda.py).
+SQL_BUSQUEDA = [
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = pg_catalog.spanish);
+            ALTER TEXT SEARCH CONFIGURATION es_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END $$;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION inventario_producto_busqueda() RETURNS trigger AS $$
+    BEGIN
+        NEW.busqueda :=
+            setweight(to_tsvector('es_unaccent', coalesce(NEW.codigo, '')), 'A') ||
+            setweight(to_tsvector('es_unaccent', coalesce(NEW.nombre, '')), 'A') ||
+            setweight(to_tsvector('es_unaccent', coalesce(NEW.descripcion, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER inventario_producto_busqueda_trg
+        BEFORE INSERT OR UPDATE OF codigo, nombre, descripcion ON inventario_producto
+        FOR EACH ROW EXECUTE FUNCTION inventario_producto_busqueda();
+    """,
+    # Recalcular los productos existentes (el trigger se dispara con UPDATE OF codigo)
+    "UPDATE inventario_producto SET codigo = codigo;",
+    "CREATE INDEX IF NOT EXISTS inventario_producto_busqueda_gin ON inventario_producto USING gin (busqueda);",
+    """
+    CREATE INDEX IF NOT EXISTS inventario_producto_codigo_trgm
+        ON inventario_producto USING gin (UPPER(codigo::text) gin_trgm_ops);
+    """,
+]
+
+SQL_DESHACER = [
+    "DROP INDEX IF EXISTS inventario_producto_codigo_trgm;",
+    "DROP INDEX IF EXISTS inventario_producto_busqueda_gin;",
+    "DROP TRIGGER IF EXISTS inventario_producto_busqueda_trg ON inventario_producto;",
+    "DROP FUNCTION IF EXISTS inventario_producto_busqueda();",
+    "DROP TEXT SEARCH CONFIGURATION IF EXISTS es_unaccent;",
+]
+
+
+def crear_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_BUSQUEDA:
+        schema_editor.execute(sql)
+
+
+def eliminar_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_DESHACER:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_producto_stock_total_valor_stock'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='producto',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_busqueda, eliminar_busqueda),
+    ]
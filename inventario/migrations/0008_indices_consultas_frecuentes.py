@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_producto_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alertastock',
+            index=models.Index(condition=models.Q(('estado', 'ACTIVA')), fields=['producto', 'area'], name='alerta_activa_producto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertastock',
+            index=models.Index(condition=models.Q(('estado', 'ACTIVA')), fields=['-fecha_creacion'], name='alerta_activa_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['producto', '-fecha', '-id'], name='mov_producto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['-fecha', '-id'], name='mov_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(condition=models.Q(('cantidad__gt', 0)), fields=['producto', 'area'], name='stock_con_saldo_idx'),
+        ),
+    ]
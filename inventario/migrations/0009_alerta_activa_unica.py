@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+def resolver_duplicadas(apps, schema_editor):
+    """Deja solo la alerta general activa más reciente de cada producto"""
+    AlertaStock = apps.get_model('inventario', 'AlertaStock')
+    activas = AlertaStock.objects.filter(estado='ACTIVA', area__isnull=True)
+    ultimas = activas.values('producto').annotate(ultima=Max('id')).values('ultima')
+    activas.exclude(id__in=ultimas).update(estado='RESUELTA', fecha_resolucion=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_indices_consultas_frecuentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(resolver_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alertastock',
+            constraint=models.UniqueConstraint(condition=models.Q(('area__isnull', True), ('estado', 'ACTIVA')), fields=('producto',), name='alerta_activa_unica_producto'),
+        ),
+    ]
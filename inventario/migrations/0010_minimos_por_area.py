@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:46
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+def resolver_duplicadas(apps, schema_editor):
+    """Deja solo la alerta activa más reciente de cada producto y área"""
+    AlertaStock = apps.get_model('inventario', 'AlertaStock')
+    activas = AlertaStock.objects.filter(estado='ACTIVA', area__isnull=False)
+    ultimas = activas.values('producto', 'area').annotate(ultima=Max('id')).values('ultima')
+    activas.exclude(id__in=ultimas).update(estado='RESUELTA', fecha_resolucion=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_alerta_activa_unica'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MinimoArea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_minimo', models.DecimalField(decimal_places=2, help_text='Cantidad mínima en esta área antes de generar alerta', max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0'))])),
+            ],
+            options={
+                'verbose_name': 'Mínimo por Área',
+                'verbose_name_plural': 'Mínimos por Área',
+                'ordering': ['area__nombre', 'producto__nombre'],
+            },
+        ),
+        migrations.RunPython(resolver_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alertastock',
+            constraint=models.UniqueConstraint(condition=models.Q(('area__isnull', False), ('estado', 'ACTIVA')), fields=('producto', 'area'), name='alerta_activa_unica_area'),
+        ),
+        migrations.AddField(
+            model_name='minimoarea',
+            name='area',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='minimos', to='inventario.area'),
+        ),
+        migrations.AddField(
+            model_name='minimoarea',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='minimos_area', to='inventario.producto'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='minimoarea',
+            unique_together={('producto', 'area')},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:54
+
+from django.db import migrations, models
+
+
+def crear_version(apps, schema_editor):
+    apps.get_model('inventario', 'VersionInventario').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_minimos_por_area'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versión de Datos del Inventario',
+                'verbose_name_plural': 'Versión de Datos del Inventario',
+            },
+        ),
+        migrations.RunPython(crear_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_version_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorDocumento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=20, unique=True)),
+                ('ultimo', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Documentos',
+                'verbose_name_plural': 'Contadores de Documentos',
+                'ordering': ['serie'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:06
+
+import re
+
+from django.db import migrations
+
+
+def sembrar_contadores(apps, schema_editor):
+    """Arranca las series FAC, ENT y REC en el mayor número correlativo ya emitido.
+
+    Los números de respaldo con marca de tiempo (`REC-10181658`, 8 o más dígitos)
+    que generaban las vistas anteriores no cuentan como correlativos.
+    """
+    EntradaStock = apps.get_model('inventario', 'EntradaStock')
+    ContadorDocumento = apps.get_model('inventario', 'ContadorDocumento')
+    patron = re.compile(r'^(FAC|ENT|REC)-(\d{1,7})$')
+
+    ultimos = {}
+    for numero in EntradaStock.objects.values_list('numero_entrada', flat=True).iterator():
+        coincidencia = patron.match(numero or '')
+        if coincidencia:
+            serie, valor = coincidencia.group(1), int(coincidencia.group(2))
+            ultimos[serie] = max(ultimos.get(serie, 0), valor)
+    for serie, ultimo in ultimos.items():
+        ContadorDocumento.objects.update_or_create(serie=serie, defaults={'ultimo': ultimo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0012_contador_documentos'),
+    ]
+
+    operations = [
+        migrations.RunPython(sembrar_contadores, migrations.RunPython.noop),
+    ]
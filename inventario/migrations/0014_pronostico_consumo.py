@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:06
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0013_numeracion_entradas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PronosticoConsumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('promedio_movil', models.DecimalField(decimal_places=3, help_text='Consumo diario promedio de la ventana reciente', max_digits=12)),
+                ('consumo_diario', models.DecimalField(decimal_places=3, help_text='Consumo diario con suavizamiento exponencial', max_digits=12)),
+                ('consumo_total', models.DecimalField(decimal_places=2, help_text='Salidas del período analizado', max_digits=14)),
+                ('dias_con_consumo', models.PositiveIntegerField(default=0)),
+                ('stock_actual', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10)),
+                ('dias_cobertura', models.DecimalField(blank=True, decimal_places=1, help_text='Días que alcanza el stock actual al consumo diario (vacío si no hay consumo)', max_digits=10, null=True)),
+                ('fecha_calculo', models.DateTimeField()),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pronosticos', to='inventario.area')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pronosticos', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Pronóstico de Consumo',
+                'verbose_name_plural': 'Pronósticos de Consumo',
+                'ordering': ['dias_cobertura'],
+                'unique_together': {('producto', 'area')},
+            },
+        ),
+    ]
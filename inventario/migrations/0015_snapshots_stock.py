@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0014_pronostico_consumo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshotDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventario.area')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Snapshot Diario de Stock',
+                'verbose_name_plural': 'Snapshots Diarios de Stock',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'producto', 'area')},
+            },
+        ),
+    ]
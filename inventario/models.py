@@ -1,6 +1,9 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from decimal import Decimal
 
 
@@ -81,6 +84,28 @@ class Producto(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     
+    # Totales desnormalizados: los mantiene inventario.services.stock en cada escritura de Stock
+    stock_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0'),
+        editable=False,
+        help_text="Stock total sumando todas las áreas"
+    )
+    valor_stock = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0'),
+        editable=False,
+        help_text="Stock total valorizado al precio unitario de referencia"
+    )
+    
+    # Vector de búsqueda (código, nombre, descripción). En PostgreSQL lo mantiene un
+    # trigger y tiene índice GIN; ver services/busqueda.py y la migración 0007.
+    busqueda = SearchVectorField(null=True, editable=False)
+
+    CAMPOS_STOCK = ('stock_total', 'valor_stock')
+    
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
@@ -89,15 +114,26 @@ class Producto(models.Model):
     def __str__(self):
         return f"{self.codigo} - {self.nombre}"
     
-    def stock_total(self):
-        """Calcula el stock total sumando todas las áreas"""
-        return self.stocks.aggregate(
-            total=models.Sum('cantidad')
-        )['total'] or Decimal('0')
+    def save(self, *args, **kwargs):
+        # Los totales de stock solo se escriben desde el servicio de stock: al editar
+        # un producto existente no se sobrescriben con valores posiblemente desfasados.
+        if not self._state.adding and self.pk and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_STOCK
+            ]
+            super().save(*args, **kwargs)
+            from .services.stock import recalcular_valor_stock
+            recalcular_valor_stock(self)
+        else:
+            super().save(*args, **kwargs)
+        # El mínimo o el estado pueden haber cambiado: reevaluar solo la alerta de este producto
+        from .services.alertas import evaluar_alertas
+        evaluar_alertas([self.pk])
     
     def tiene_stock_bajo(self):
         """Verifica si el producto tiene stock bajo"""
-        return self.stock_total() <= self.stock_minimo
+        return self.stock_total <= self.stock_minimo
 
 
 class Stock(models.Model):
@@ -117,11 +153,103 @@ class Stock(models.Model):
         verbose_name_plural = "Stocks"
         unique_together = ['producto', 'area']
         ordering = ['area__nombre', 'producto__nombre']
+        indexes = [
+            # Desglose por área del listado de productos (solo filas con saldo)
+            models.Index(fields=['producto', 'area'], condition=models.Q(cantidad__gt=0), name='stock_con_saldo_idx'),
+        ]
     
     def __str__(self):
         return f"{self.producto.nombre} en {self.area.nombre}: {self.cantidad} {self.producto.get_unidad_medida_display()}"
 
 
+class MinimoArea(models.Model):
+    """Stock mínimo de un producto en un área específica (genera alertas por área)"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='minimos_area')
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='minimos')
+    stock_minimo = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0'))],
+        help_text="Cantidad mínima en esta área antes de generar alerta"
+    )
+
+    class Meta:
+        verbose_name = "Mínimo por Área"
+        verbose_name_plural = "Mínimos por Área"
+        unique_together = ['producto', 'area']
+        ordering = ['area__nombre', 'producto__nombre']
+
+    def __str__(self):
+        return f"{self.producto.nombre} en {self.area.nombre}: mínimo {self.stock_minimo}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .services.alertas import evaluar_alertas_por_area
+        evaluar_alertas_por_area([self.producto_id])
+
+    def delete(self, *args, **kwargs):
+        producto_id = self.producto_id
+        resultado = super().delete(*args, **kwargs)
+        from .services.alertas import evaluar_alertas_por_area
+        evaluar_alertas_por_area([producto_id])
+        return resultado
+
+
+class PronosticoConsumo(models.Model):
+    """Velocidad de consumo estimada de un producto en un área (ver services/pronostico.py).
+
+    Se recalcula completo con el comando `calcular_pronosticos`; solo existen filas
+    para los pares con salidas en el período analizado.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='pronosticos')
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='pronosticos')
+    promedio_movil = models.DecimalField(
+        max_digits=12, decimal_places=3, help_text="Consumo diario promedio de la ventana reciente"
+    )
+    consumo_diario = models.DecimalField(
+        max_digits=12, decimal_places=3, help_text="Consumo diario con suavizamiento exponencial"
+    )
+    consumo_total = models.DecimalField(max_digits=14, decimal_places=2, help_text="Salidas del período analizado")
+    dias_con_consumo = models.PositiveIntegerField(default=0)
+    stock_actual = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0'))
+    dias_cobertura = models.DecimalField(
+        max_digits=10, decimal_places=1, null=True, blank=True,
+        help_text="Días que alcanza el stock actual al consumo diario (vacío si no hay consumo)"
+    )
+    fecha_calculo = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Pronóstico de Consumo"
+        verbose_name_plural = "Pronósticos de Consumo"
+        unique_together = ['producto', 'area']
+        ordering = ['dias_cobertura']
+
+    def __str__(self):
+        return f"{self.producto.nombre} en {self.area.nombre}: {self.consumo_diario}/día"
+
+
+class StockSnapshotDiario(models.Model):
+    """Saldo de un producto en un área al cierre de un día (ver services/snapshots.py).
+
+    Lo genera cada noche el comando `generar_snapshots`; los saldos en 0 no se
+    guardan.
+    """
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='snapshots')
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='snapshots')
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Snapshot Diario de Stock"
+        verbose_name_plural = "Snapshots Diarios de Stock"
+        # El índice único empieza por fecha: leer un día completo es un rango del índice
+        unique_together = ['fecha', 'producto', 'area']
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} {self.producto.nombre} en {self.area.nombre}: {self.cantidad}"
+
+
 class Movimiento(models.Model):
     """Registro de movimientos de inventario"""
     TIPOS_MOVIMIENTO = [
@@ -181,6 +309,12 @@ class Movimiento(models.Model):
         verbose_name = "Movimiento"
         verbose_name_plural = "Movimientos"
         ordering = ['-fecha']
+        indexes = [
+            # Historial por producto (trazabilidad, detalle) paginado por (-fecha, -id)
+            models.Index(fields=['producto', '-fecha', '-id'], name='mov_producto_fecha_idx'),
+            # Movimientos recientes / por rango de fechas (dashboard, API)
+            models.Index(fields=['-fecha', '-id'], name='mov_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.producto.nombre} - {self.cantidad} {self.producto.get_unidad_medida_display()}"
@@ -220,6 +354,25 @@ class AlertaStock(models.Model):
         verbose_name = "Alerta de Stock"
         verbose_name_plural = "Alertas de Stock"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Solo las alertas activas se consultan en caliente; las resueltas son historial
+            models.Index(fields=['producto', 'area'], condition=models.Q(estado='ACTIVA'), name='alerta_activa_producto_idx'),
+            models.Index(fields=['-fecha_creacion'], condition=models.Q(estado='ACTIVA'), name='alerta_activa_fecha_idx'),
+        ]
+        constraints = [
+            # Una sola alerta general activa por producto (ver services/alertas.py)
+            models.UniqueConstraint(
+                fields=['producto'],
+                condition=models.Q(estado='ACTIVA', area__isnull=True),
+                name='alerta_activa_unica_producto',
+            ),
+            # ...y una sola alerta activa por producto y área
+            models.UniqueConstraint(
+                fields=['producto', 'area'],
+                condition=models.Q(estado='ACTIVA', area__isnull=False),
+                name='alerta_activa_unica_area',
+            ),
+        ]
     
     def __str__(self):
         area_text = f" en {self.area.nombre}" if self.area else ""
@@ -332,3 +485,48 @@ Movimiento.add_to_class('detalle_entrada', models.ForeignKey(
     blank=True,
     related_name='movimientos'
 ))
+
+
+class ContadorDocumento(models.Model):
+    """Último número emitido de cada serie de documentos ('PED-2026', 'FAC', ...).
+
+    Los números se reservan con un UPDATE atómico sobre la fila de la serie (ver
+    services/numeracion.py) en lugar de contar o leer el último documento.
+    """
+    serie = models.CharField(max_length=20, unique=True)
+    ultimo = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Contador de Documentos"
+        verbose_name_plural = "Contadores de Documentos"
+        ordering = ['serie']
+
+    def __str__(self):
+        return f"{self.serie}: {self.ultimo}"
+
+
+class VersionInventario(models.Model):
+    """Contador monótono de cambios del inventario (una sola fila, pk=1).
+
+    Se incrementa al confirmar cada transacción que cambia el stock o el catálogo
+    (ver services/version.py); los reportes lo usan para saber si un archivo ya
+    generado sigue vigente.
+    """
+    version = models.BigIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Versión de Datos del Inventario"
+        verbose_name_plural = "Versión de Datos del Inventario"
+
+    def __str__(self):
+        return f"Versión {self.version}"
+
+
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=Categoria)
+@receiver([post_save, post_delete], sender=Area)
+def catalogo_modificado(sender, **kwargs):
+    """Nombres, precios, mínimos y categorías aparecen en los reportes: invalidan los generados"""
+    from .services.version import incrementar_version
+    incrementar_version()
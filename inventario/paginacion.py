@@ -0,0 +1,138 @@
+"""Paginación por cursor (keyset) para listados grandes.
+
+En lugar de `OFFSET`, cada página se pide con los valores de orden de la última
+(o primera) fila vista: `WHERE (orden) > (valores del cursor) ORDER BY orden LIMIT n`.
+Con un índice sobre las columnas de orden, la página 1.000 cuesta lo mismo que la
+primera. El conteo exacto es opcional porque sobre tablas grandes suele costar más
+que la propia página.
+
+Las columnas de orden deben terminar en una clave única (p. ej. `id`) y no admitir
+nulos, para que el cursor identifique una posición exacta.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class _CodificadorCursor(DjangoJSONEncoder):
+    """Como DjangoJSONEncoder pero sin truncar microsegundos (el cursor debe ser exacto)"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se puede decodificar para este orden"""
+
+
+@dataclass
+class PaginaCursor:
+    items: list = field(default_factory=list)
+    siguiente: str = None  # cursor para la página siguiente
+    anterior: str = None  # cursor para la página anterior
+    total: int = None  # solo si se pidió el conteo exacto
+
+    @property
+    def tiene_siguiente(self):
+        return self.siguiente is not None
+
+    @property
+    def tiene_anterior(self):
+        return self.anterior is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class PaginadorCursor:
+    """Pagina un queryset por las columnas de `orden` (prefijo `-` = descendente)"""
+
+    def __init__(self, queryset, orden, por_pagina=50, contar=False):
+        self.queryset = queryset
+        self.orden = tuple(orden)
+        self.por_pagina = por_pagina
+        self.contar = contar
+        self._campos = [self._campo(nombre.lstrip('-')) for nombre in self.orden]
+
+    def _campo(self, ruta):
+        modelo = self.queryset.model
+        partes = ruta.split('__')
+        for parte in partes[:-1]:
+            modelo = modelo._meta.get_field(parte).related_model
+        return modelo._meta.pk if partes[-1] == 'pk' else modelo._meta.get_field(partes[-1])
+
+    def _valores(self, objeto):
+        valores = []
+        for nombre in self.orden:
+            valor = objeto
+            for parte in nombre.lstrip('-').split('__'):
+                valor = getattr(valor, parte)
+            valores.append(valor)
+        return valores
+
+    def _codificar(self, objeto):
+        datos = json.dumps(self._valores(objeto), cls=_CodificadorCursor, separators=(',', ':'))
+        return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+    def _decodificar(self, cursor):
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+            if not isinstance(valores, list) or len(valores) != len(self.orden):
+                raise ValueError
+            return [campo.to_python(valor) for campo, valor in zip(self._campos, valores)]
+        except (ValueError, TypeError, ValidationError, binascii.Error, UnicodeDecodeError) as e:
+            raise CursorInvalido('Cursor de paginación inválido.') from e
+
+    def _despues_de(self, valores, invertir=False):
+        """Condición `(orden) > valores` expandida como OR de igualdades + comparación"""
+        condiciones = []
+        for i, nombre in enumerate(self.orden):
+            descendente = nombre.startswith('-') != invertir
+            ruta = nombre.lstrip('-')
+            iguales = {self.orden[j].lstrip('-'): valores[j] for j in range(i)}
+            condiciones.append(Q(**iguales, **{f'{ruta}__{"lt" if descendente else "gt"}': valores[i]}))
+        return reduce(or_, condiciones)
+
+    def pagina(self, despues=None, antes=None):
+        """Devuelve la página que sigue al cursor `despues` o la que precede a `antes`.
+
+        Lanza `CursorInvalido` si el cursor no corresponde a este orden.
+        """
+        if antes:
+            invertido = [n[1:] if n.startswith('-') else f'-{n}' for n in self.orden]
+            queryset = self.queryset.filter(self._despues_de(self._decodificar(antes), invertir=True))
+            filas = list(queryset.order_by(*invertido)[:self.por_pagina + 1])
+            hay_mas = len(filas) > self.por_pagina
+            items = filas[:self.por_pagina][::-1]
+            pagina = PaginaCursor(items=items)
+            if items:
+                pagina.siguiente = self._codificar(items[-1])
+                pagina.anterior = self._codificar(items[0]) if hay_mas else None
+        else:
+            queryset = self.queryset
+            if despues:
+                queryset = queryset.filter(self._despues_de(self._decodificar(despues)))
+            filas = list(queryset.order_by(*self.orden)[:self.por_pagina + 1])
+            items = filas[:self.por_pagina]
+            pagina = PaginaCursor(items=items)
+            if items:
+                pagina.siguiente = self._codificar(items[-1]) if len(filas) > self.por_pagina else None
+                pagina.anterior = self._codificar(items[0]) if despues else None
+
+        if self.contar:
+            pagina.total = self.queryset.order_by().count()
+        return pagina
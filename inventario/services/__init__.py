@@ -0,0 +1 @@
+"""Servicios de dominio del inventario (lógica reutilizable fuera de las vistas)."""
@@ -0,0 +1,187 @@
+"""Motor de alertas de stock bajo.
+
+Las alertas se evalúan de forma incremental: el servicio de stock llama a
+`evaluar_alertas` con los productos cuyo total cambió, dentro de la misma
+transacción, y solo esas alertas se abren, actualizan o resuelven. Todo se hace
+con sentencias sobre conjuntos (UPDATE con subconsulta e INSERT en bloque), de
+modo que el costo no depende de cuántos productos toque el lote.
+
+Hay dos niveles: la alerta general del producto (`area` nula) compara
+`stock_total` con `Producto.stock_minimo`, y las alertas por área comparan el
+saldo de cada `Stock` con su `MinimoArea`. Un área con mínimo y sin fila de
+stock cuenta como saldo 0.
+
+`reconciliar_alertas` (comando del mismo nombre) ejecuta la misma evaluación
+sobre todo el catálogo como red de seguridad para cambios hechos por fuera del
+servicio de stock. La página de alertas solo lee.
+"""
+from dataclasses import dataclass
+
+from decimal import Decimal
+
+from django.db.models import DecimalField, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import AlertaStock, MinimoArea, Producto, Stock
+
+
+@dataclass
+class ResultadoAlertas:
+    abiertas: int = 0
+    actualizadas: int = 0
+    resueltas: int = 0
+
+    @property
+    def total(self):
+        return self.abiertas + self.actualizadas + self.resueltas
+
+    def __add__(self, otro):
+        return ResultadoAlertas(
+            self.abiertas + otro.abiertas,
+            self.actualizadas + otro.actualizadas,
+            self.resueltas + otro.resueltas,
+        )
+
+
+def _del_producto(campo):
+    """Subconsulta con `campo` del producto de la alerta (UPDATE no admite JOIN)"""
+    return Subquery(Producto.objects.filter(pk=OuterRef('producto_id')).order_by().values(campo)[:1])
+
+
+def _saldo_en_area():
+    """Subconsulta con el saldo del `Stock` de `(producto_id, area_id)` externos (0 si no hay fila)"""
+    return Coalesce(
+        Subquery(
+            Stock.objects.filter(
+                producto_id=OuterRef('producto_id'), area_id=OuterRef('area_id')
+            ).order_by().values('cantidad')[:1]
+        ),
+        Value(Decimal('0'), output_field=DecimalField(max_digits=10, decimal_places=2)),
+    )
+
+
+def _sin_productos(productos):
+    return isinstance(productos, (list, tuple, set)) and not productos
+
+
+# Condición de alerta general del producto, evaluada desde AlertaStock
+EN_FALTA = Q(producto__activo=True, producto__stock_total__lte=F('producto__stock_minimo'))
+
+
+def evaluar_alertas(productos=None):
+    """Sincroniza las alertas generales y por área de `productos`.
+
+    `productos` es una lista de ids o un queryset; `None` evalúa todo el catálogo.
+    Devuelve un `ResultadoAlertas` con la suma de ambos niveles.
+    """
+    return evaluar_alertas_generales(productos) + evaluar_alertas_por_area(productos)
+
+
+def evaluar_alertas_generales(productos=None):
+    """Sincroniza las alertas generales (sin área) de `productos` con su stock total.
+
+    Abre alertas para productos activos con `stock_total <= stock_minimo`, actualiza
+    los valores de las activas que siguen en falta y resuelve las que ya no lo
+    están.
+    """
+    if _sin_productos(productos):
+        return ResultadoAlertas()
+
+    activas = AlertaStock.objects.filter(estado='ACTIVA', area__isnull=True)
+    candidatos = Producto.objects.filter(activo=True, stock_total__lte=F('stock_minimo'))
+    if productos is not None:
+        activas = activas.filter(producto_id__in=productos)
+        candidatos = candidatos.filter(pk__in=productos)
+
+    resultado = ResultadoAlertas()
+    resultado.resueltas = activas.exclude(EN_FALTA).update(
+        estado='RESUELTA',
+        fecha_resolucion=timezone.now(),
+        stock_actual=_del_producto('stock_total'),
+    )
+    resultado.actualizadas = activas.filter(EN_FALTA).exclude(
+        stock_actual=F('producto__stock_total'),
+        stock_minimo=F('producto__stock_minimo'),
+    ).update(
+        stock_actual=_del_producto('stock_total'),
+        stock_minimo=_del_producto('stock_minimo'),
+    )
+
+    nuevas = [
+        AlertaStock(producto_id=producto_id, stock_actual=stock_total, stock_minimo=stock_minimo)
+        for producto_id, stock_total, stock_minimo in candidatos.exclude(
+            Exists(AlertaStock.objects.filter(producto=OuterRef('pk'), estado='ACTIVA', area__isnull=True))
+        ).order_by().values_list('pk', 'stock_total', 'stock_minimo')
+    ]
+    if nuevas:
+        # La restricción única de alerta activa por producto evita duplicados concurrentes
+        AlertaStock.objects.bulk_create(nuevas, ignore_conflicts=True)
+        resultado.abiertas = len(nuevas)
+    return resultado
+
+
+def faltantes_por_area(productos=None):
+    """Pares `(producto, área)` activos cuyo saldo está en o bajo su `MinimoArea`.
+
+    Una sola consulta sobre los mínimos configurados con el saldo de cada área
+    como subconsulta indexada (`Stock` es único por producto y área). Devuelve
+    un dict `{(producto_id, area_id): (saldo, stock_minimo)}`.
+    """
+    minimos = MinimoArea.objects.filter(producto__activo=True, area__activo=True)
+    if productos is not None:
+        minimos = minimos.filter(producto_id__in=productos)
+    filas = minimos.annotate(saldo=_saldo_en_area()).filter(
+        saldo__lte=F('stock_minimo')
+    ).order_by().values_list('producto_id', 'area_id', 'saldo', 'stock_minimo')
+    return {(producto_id, area_id): (saldo, minimo) for producto_id, area_id, saldo, minimo in filas}
+
+
+def evaluar_alertas_por_area(productos=None):
+    """Sincroniza las alertas por área de `productos` con sus mínimos por área.
+
+    Compara los faltantes actuales con las alertas por área activas (dos lecturas)
+    y aplica la diferencia en bloque: un UPDATE para resolver, `bulk_update` para
+    refrescar valores y `bulk_create` para abrir las nuevas.
+    """
+    if _sin_productos(productos):
+        return ResultadoAlertas()
+
+    faltantes = faltantes_por_area(productos)
+    activas = AlertaStock.objects.filter(estado='ACTIVA', area__isnull=False)
+    if productos is not None:
+        activas = activas.filter(producto_id__in=productos)
+
+    resultado = ResultadoAlertas()
+    resolver = []
+    refrescar = []
+    for alerta in activas.order_by().only('id', 'producto_id', 'area_id', 'stock_actual', 'stock_minimo'):
+        valores = faltantes.pop((alerta.producto_id, alerta.area_id), None)
+        if valores is None:
+            resolver.append(alerta.pk)
+        elif valores != (alerta.stock_actual, alerta.stock_minimo):
+            alerta.stock_actual, alerta.stock_minimo = valores
+            refrescar.append(alerta)
+
+    if resolver:
+        resultado.resueltas = AlertaStock.objects.filter(pk__in=resolver).update(
+            estado='RESUELTA',
+            fecha_resolucion=timezone.now(),
+            stock_actual=_saldo_en_area(),
+        )
+    if refrescar:
+        AlertaStock.objects.bulk_update(refrescar, ['stock_actual', 'stock_minimo'], batch_size=500)
+        resultado.actualizadas = len(refrescar)
+    if faltantes:
+        # Lo que queda en `faltantes` no tiene alerta activa
+        AlertaStock.objects.bulk_create([
+            AlertaStock(producto_id=producto_id, area_id=area_id, stock_actual=saldo, stock_minimo=minimo)
+            for (producto_id, area_id), (saldo, minimo) in faltantes.items()
+        ], batch_size=500, ignore_conflicts=True)
+        resultado.abiertas = len(faltantes)
+    return resultado
+
+
+def reconciliar_alertas():
+    """Reevalúa las alertas de todo el catálogo (red de seguridad periódica)"""
+    return evaluar_alertas()
@@ -0,0 +1,89 @@
+"""Búsqueda de productos por texto.
+
+En PostgreSQL se usa el vector `Producto.busqueda` (mantenido por un trigger, ver
+la migración 0007) con la configuración `es_unaccent`: español con stemming e
+insensible a tildes, de modo que "azucar" encuentra "Azúcar". Cada término se
+busca como prefijo para servir el autocompletado. El código se resuelve además
+con el índice trigram sobre `UPPER(codigo)`: prefijos ("BEB-0") y coincidencias
+aproximadas ("BEB001"). Los resultados se ordenan por relevancia.
+
+En otros motores (SQLite en pruebas) se cae a `icontains` por término.
+"""
+import re
+
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, TextField, Value, When
+from django.db.models.functions import Cast, Upper
+
+
+CONFIGURACION = 'es_unaccent'
+LIMITE_SUGERENCIAS = 10
+
+
+def _terminos(texto):
+    return re.findall(r'\w+', texto or '')
+
+
+def _codigo_normalizado():
+    # Debe coincidir con la expresión del índice trigram: UPPER(codigo::text)
+    return Upper(Cast('codigo', output_field=TextField()))
+
+
+def _buscar_postgres(queryset, texto, terminos):
+    consulta = SearchQuery(
+        ' & '.join(f'{termino}:*' for termino in terminos),
+        config=CONFIGURACION,
+        search_type='raw',
+    )
+    codigo = texto.strip().upper()
+    return queryset.filter(
+        Q(busqueda=consulta)
+        | Q(codigo__istartswith=texto.strip())
+        | TrigramSimilar(_codigo_normalizado(), codigo)
+    ).annotate(
+        relevancia=(
+            SearchRank(F('busqueda'), consulta)
+            + TrigramSimilarity(_codigo_normalizado(), codigo)
+            + Case(When(codigo__iexact=texto.strip(), then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+        )
+    )
+
+
+def _buscar_generico(queryset, texto, terminos):
+    for termino in terminos:
+        queryset = queryset.filter(
+            Q(nombre__icontains=termino) |
+            Q(codigo__icontains=termino) |
+            Q(descripcion__icontains=termino)
+        )
+    texto = texto.strip()
+    return queryset.annotate(relevancia=Case(
+        When(codigo__iexact=texto, then=Value(3.0)),
+        When(codigo__istartswith=texto, then=Value(2.0)),
+        When(nombre__istartswith=texto, then=Value(1.0)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+
+
+def buscar_productos(queryset, texto):
+    """Filtra `queryset` de productos por `texto` y anota `relevancia`.
+
+    No cambia el orden: quien quiera los más relevantes primero debe ordenar por
+    `-relevancia`. Un texto sin palabras devuelve el queryset sin filtrar.
+    """
+    terminos = _terminos(texto)
+    if not terminos:
+        return queryset
+    if connection.vendor == 'postgresql':
+        return _buscar_postgres(queryset, texto, terminos)
+    return _buscar_generico(queryset, texto, terminos)
+
+
+def sugerir_productos(queryset, texto, limite=LIMITE_SUGERENCIAS):
+    """Los `limite` productos más relevantes para el autocompletado"""
+    if not _terminos(texto):
+        return queryset.none()
+    return buscar_productos(queryset, texto).order_by('-relevancia', 'nombre', 'id')[:limite]
@@ -0,0 +1,88 @@
+"""Estadísticas del dashboard calculadas con un número fijo de consultas agrupadas."""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Categoria, Movimiento, Producto
+from .fechas import rango_del_dia
+
+
+CERO = Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+@dataclass
+class EstadisticasDashboard:
+    """Resultado tipado con los indicadores del dashboard."""
+    total_productos: int
+    total_categorias: int
+    total_bajo_stock: int
+    valor_inventario: Decimal
+    movimientos_hoy: int
+    productos_bajo_stock: list = field(default_factory=list)
+    productos_por_categoria: list = field(default_factory=list)
+
+    def resumen(self):
+        """Indicadores principales (mismo formato que usa el template como `stats`)"""
+        return {
+            'total_productos': self.total_productos,
+            'productos_bajo_stock': self.total_bajo_stock,
+            'movimientos_hoy': self.movimientos_hoy,
+            'valor_inventario': self.valor_inventario,
+        }
+
+
+def calcular_estadisticas_dashboard(limite_bajo_stock=10, limite_categorias=5):
+    """Calcula los indicadores del dashboard sin iterar producto por producto.
+
+    Todas las métricas se resuelven con consultas agregadas en la base de datos,
+    por lo que el número de consultas no depende de la cantidad de productos.
+    """
+    # Cantidad de productos y valor del inventario (total valorizado que mantiene el servicio de stock)
+    totales = Producto.objects.filter(activo=True).aggregate(
+        total=Count('id'),
+        valor=Sum('valor_stock'),
+    )
+    total_productos = totales['total']
+    valor_inventario = totales['valor'] or Decimal('0')
+    total_categorias = Categoria.objects.filter(activo=True).count()
+
+    bajo_stock = Producto.objects.filter(
+        activo=True, stock_total__lte=F('stock_minimo')
+    ).select_related('categoria').order_by('stock_total', 'nombre')
+    total_bajo_stock = bajo_stock.count()
+    productos_bajo_stock = list(bajo_stock[:limite_bajo_stock])
+
+    inicio, fin = rango_del_dia(timezone.localdate())
+    movimientos_hoy = Movimiento.objects.filter(fecha__gte=inicio, fecha__lt=fin).count()
+
+    productos_por_categoria = list(
+        Categoria.objects.filter(activo=True).annotate(
+            total=Count('productos', filter=Q(productos__activo=True))
+        ).order_by('-total')[:limite_categorias]
+    )
+    for categoria in productos_por_categoria:
+        categoria.porcentaje = (categoria.total * 100) / total_productos if total_productos else 0
+
+    return EstadisticasDashboard(
+        total_productos=total_productos,
+        total_categorias=total_categorias,
+        total_bajo_stock=total_bajo_stock,
+        valor_inventario=valor_inventario,
+        movimientos_hoy=movimientos_hoy,
+        productos_bajo_stock=productos_bajo_stock,
+        productos_por_categoria=productos_por_categoria,
+    )
+
+
+def stock_por_categoria():
+    """Stock total por categoría activa en una sola consulta agrupada"""
+    categorias = Categoria.objects.filter(activo=True).annotate(
+        total_stock=Coalesce(Sum('productos__stocks__cantidad'), CERO)
+    ).order_by('nombre')
+    return [
+        {'categoria': categoria.nombre, 'total': float(categoria.total_stock)}
+        for categoria in categorias
+    ]
@@ -0,0 +1,82 @@
+"""Ingreso en bloque de entradas de stock (facturas, boletas, recepciones).
+
+Registra las cabeceras, todos sus detalles y los movimientos con un número fijo de
+consultas: los detalles y movimientos se insertan con `bulk_create` y los saldos
+se actualizan con los upserts agrupados del servicio de stock.
+"""
+from django.db import transaction
+
+from ..models import DetalleEntradaStock, EntradaStock, Movimiento
+from .stock import apply_movements
+
+
+class EntradaInvalida(ValueError):
+    """Alguna línea de la entrada no se puede registrar"""
+
+
+def validar_detalles(detalles):
+    """Valida todas las líneas antes de escribir y devuelve la lista de errores"""
+    errores = []
+    for numero, detalle in enumerate(detalles, 1):
+        if not detalle.producto_id:
+            errores.append(f'Línea {numero}: falta el producto.')
+        if not detalle.area_destino_id:
+            errores.append(f'Línea {numero}: falta el área de destino.')
+        if detalle.cantidad is None or detalle.cantidad <= 0:
+            errores.append(f'Línea {numero}: la cantidad debe ser mayor a 0.')
+        if detalle.precio_unitario is not None and detalle.precio_unitario < 0:
+            errores.append(f'Línea {numero}: el precio unitario no puede ser negativo.')
+    return errores
+
+
+def registrar_entradas(documentos, usuario, motivo='COMPRA', tipo='ENTRADA',
+                       observaciones='Entrada: {numero}', otros_movimientos=()):
+    """Guarda varias entradas con sus detalles y aplica el stock en un solo lote.
+
+    `documentos` es una lista de pares `(entrada, detalles)` con instancias sin
+    guardar (una entrada ya guardada se reutiliza). Cada movimiento queda enlazado
+    desde su creación a la entrada y a su detalle; `observaciones` es el texto de
+    los movimientos (`{numero}` se reemplaza por el número de la entrada).
+    `otros_movimientos` se aplican en el mismo lote (p. ej. descuentos de un conteo).
+    Lanza `EntradaInvalida` sin escribir nada si alguna línea no es válida.
+    Devuelve los movimientos registrados.
+    """
+    documentos = [(entrada, list(detalles)) for entrada, detalles in documentos]
+    errores = []
+    for entrada, detalles in documentos:
+        prefijo = f'{entrada.numero_entrada}: ' if len(documentos) > 1 and entrada.numero_entrada else ''
+        if not detalles:
+            errores.append(f'{prefijo}La entrada debe tener al menos un producto.')
+        errores.extend(prefijo + error for error in validar_detalles(detalles))
+    if errores:
+        raise EntradaInvalida(' '.join(errores))
+
+    with transaction.atomic():
+        EntradaStock.objects.bulk_create([entrada for entrada, _ in documentos if entrada.pk is None])
+        for entrada, detalles in documentos:
+            for detalle in detalles:
+                detalle.entrada = entrada
+        DetalleEntradaStock.objects.bulk_create([d for _, detalles in documentos for d in detalles])
+
+        movimientos = [
+            Movimiento(
+                producto=detalle.producto,
+                area_destino=detalle.area_destino,
+                tipo=tipo,
+                motivo=motivo,
+                cantidad=detalle.cantidad,
+                precio_unitario=detalle.precio_unitario,
+                usuario=usuario,
+                observaciones=observaciones.format(numero=entrada.numero_entrada),
+                entrada=entrada,
+                detalle_entrada=detalle,
+            )
+            for entrada, detalles in documentos
+            for detalle in detalles
+        ]
+        return apply_movements(movimientos + list(otros_movimientos))
+
+
+def registrar_entrada(entrada, detalles, usuario, **opciones):
+    """Guarda una entrada con sus detalles (ver `registrar_entradas`)"""
+    return registrar_entradas([(entrada, detalles)], usuario, **opciones)
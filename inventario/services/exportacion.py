@@ -0,0 +1,209 @@
+"""Exportación del reporte de productos con stock.
+
+Las filas salen de una sola consulta recorrida con `.iterator()` (cursor del lado
+del servidor en PostgreSQL), de modo que la memoria no crece con el catálogo.
+El desglose por área viene preagregado: en PostgreSQL con `STRING_AGG` en una
+subconsulta; en otros motores con una consulta de `Stock` por bloque de
+productos.
+
+El Excel se escribe con una hoja `write_only` de openpyxl (las filas no quedan en
+memoria) sobre un `SpooledTemporaryFile` que pasa a disco si crece, y se entrega
+con `FileResponse`. Los escritores (`lineas_csv`, `escribir_excel`,
+`escribir_pdf`, que delega en `services.pdf`) reciben cualquier iterable de
+filas; también los usa la cola de reportes (`reportes/services`).
+"""
+import csv
+import tempfile
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import connection
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from ..models import Movimiento, Producto, Stock
+
+
+CABECERAS = [
+    'ID', 'Código', 'Nombre', 'Categoría', 'Unidad', 'Stock Total', 'Precio Unitario',
+    'Áreas (nombre:cantidad)',
+]
+TAMANO_BLOQUE = 2000  # filas por viaje al cursor
+MAX_EXCEL_EN_MEMORIA = 5 * 1024 * 1024  # bytes antes de pasar el archivo a disco
+ANCHOS_EXCEL = [8, 16, 40, 24, 12, 12, 16, 60]
+NUMERICAS = (5, 6)  # columnas con formato numérico (stock y precio)
+FORMATO_NUMERO = '#,##0.00'
+UNIDADES = dict(Producto.UNIDADES_MEDIDA)
+CAMPOS = ('id', 'codigo', 'nombre', 'categoria__nombre', 'unidad_medida', 'stock_total', 'precio_unitario')
+
+# Reporte en PDF: anchos en puntos (A4 horizontal) y largo máximo de los textos
+PDF_CABECERAS = ['ID', 'Código', 'Nombre del Producto', 'Categoría', 'Unidad', 'Stock', 'Precio', 'Áreas']
+PDF_ANCHOS = [25, 50, 120, 70, 45, 40, 55, 120]
+PDF_LARGOS = [None, None, 25, 15, None, None, None, 35]
+PDF_ALINEACIONES = {0: 'CENTER', 1: 'CENTER', 4: 'CENTER', 5: 'CENTER', 6: 'RIGHT'}
+
+CABECERAS_MOVIMIENTOS = [
+    'Fecha', 'Código', 'Producto', 'Tipo', 'Motivo', 'Cantidad', 'Área Origen', 'Área Destino', 'Usuario',
+]
+ANCHOS_MOVIMIENTOS = [18, 16, 40, 14, 18, 12, 20, 20, 16]
+TIPOS_MOVIMIENTO = dict(Movimiento.TIPOS_MOVIMIENTO)
+MOTIVOS = dict(Movimiento.MOTIVOS)
+
+
+def productos_con_stock():
+    """Productos activos con stock, en el orden del reporte"""
+    return Producto.objects.filter(activo=True, stock_total__gt=0).order_by('categoria__nombre', 'nombre', 'id')
+
+
+def _areas_agregadas(entre, cierre, separador):
+    """Subconsulta con el desglose `área<entre>cantidad<cierre>` del producto externo"""
+    detalle = Concat(
+        'area__nombre', Value(entre), Cast('cantidad', output_field=TextField()), Value(cierre),
+        output_field=TextField(),
+    )
+    return Subquery(
+        Stock.objects.filter(producto=OuterRef('pk'), cantidad__gt=0).order_by().values('producto').annotate(
+            detalle=StringAgg(detalle, separador, order_by='area__nombre')
+        ).values('detalle')[:1],
+        output_field=TextField(),
+    )
+
+
+def _areas_por_bloque(ids, entre, cierre, separador):
+    """Desglose por área de un bloque de productos con una sola consulta"""
+    areas = {}
+    stocks = Stock.objects.filter(producto_id__in=ids, cantidad__gt=0).order_by(
+        'producto_id', 'area__nombre'
+    ).values_list('producto_id', 'area__nombre', 'cantidad')
+    for producto_id, area, cantidad in stocks:
+        areas.setdefault(producto_id, []).append(f'{area}{entre}{cantidad}{cierre}')
+    return {producto_id: separador.join(detalle) for producto_id, detalle in areas.items()}
+
+
+def _fila(valores, areas):
+    id_, codigo, nombre, categoria, unidad, stock_total, precio = valores
+    return (id_, codigo, nombre, categoria or '', UNIDADES.get(unidad, unidad), stock_total, precio, areas or '')
+
+
+def filas_productos_stock(queryset=None, entre=':', cierre='', separador='; ', tamano_bloque=TAMANO_BLOQUE):
+    """Genera las filas del reporte como tuplas en el orden de `CABECERAS`.
+
+    Stock y precio se entregan como `Decimal` (precio `None` si no tiene); cada
+    formato decide cómo escribirlos. `entre`, `cierre` y `separador` arman el
+    desglose por área, p. ej. "Bodega:10.00; Bar:2.00".
+    """
+    queryset = productos_con_stock() if queryset is None else queryset
+    if connection.vendor == 'postgresql':
+        filas = queryset.annotate(areas=_areas_agregadas(entre, cierre, separador)).values_list(*CAMPOS, 'areas')
+        for *valores, areas in filas.iterator(chunk_size=tamano_bloque):
+            yield _fila(valores, areas)
+        return
+
+    bloque = []
+    for valores in queryset.values_list(*CAMPOS).iterator(chunk_size=tamano_bloque):
+        bloque.append(valores)
+        if len(bloque) == tamano_bloque:
+            yield from _filas_de_bloque(bloque, entre, cierre, separador)
+            bloque = []
+    yield from _filas_de_bloque(bloque, entre, cierre, separador)
+
+
+def _filas_de_bloque(bloque, entre, cierre, separador):
+    if not bloque:
+        return
+    areas = _areas_por_bloque([valores[0] for valores in bloque], entre, cierre, separador)
+    for valores in bloque:
+        yield _fila(valores, areas.get(valores[0]))
+
+
+def filas_movimientos(queryset, tamano_bloque=TAMANO_BLOQUE):
+    """Filas de movimientos en el orden de `CABECERAS_MOVIMIENTOS` (fecha local sin zona)"""
+    filas = queryset.values_list(
+        'fecha', 'producto__codigo', 'producto__nombre', 'tipo', 'motivo', 'cantidad',
+        'area_origen__nombre', 'area_destino__nombre', 'usuario__username',
+    )
+    zona = timezone.get_current_timezone()
+    for fecha, codigo, nombre, tipo, motivo, cantidad, origen, destino, usuario in filas.iterator(chunk_size=tamano_bloque):
+        if timezone.is_aware(fecha):
+            fecha = timezone.localtime(fecha, zona).replace(tzinfo=None)
+        yield (
+            fecha.replace(microsecond=0), codigo, nombre, TIPOS_MOVIMIENTO.get(tipo, tipo),
+            MOTIVOS.get(motivo, motivo), cantidad, origen or '', destino or '', usuario,
+        )
+
+
+class _Eco:
+    """Pseudo-archivo para `csv.writer`: devuelve la línea en lugar de guardarla"""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(filas, cabeceras=CABECERAS):
+    """Convierte las filas en líneas CSV, una a una (para `StreamingHttpResponse`)"""
+    writer = csv.writer(_Eco())
+    yield writer.writerow(cabeceras)
+    for fila in filas:
+        yield writer.writerow(['' if valor is None else valor for valor in fila])
+
+
+def escribir_excel(filas, destino, cabeceras=CABECERAS, titulo='Productos con Stock',
+                   anchos=ANCHOS_EXCEL, numericas=NUMERICAS):
+    """Escribe las filas en un libro de una hoja `write_only` guardado en `destino`.
+
+    Las columnas `numericas` (índices) quedan como celdas numéricas, no texto,
+    con formato de dos decimales.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(titulo)
+    for columna, ancho in enumerate(anchos, 1):
+        hoja.column_dimensions[get_column_letter(columna)].width = ancho
+    hoja.freeze_panes = 'A2'
+
+    negrita = Font(bold=True)
+    encabezado = []
+    for texto in cabeceras:
+        celda = WriteOnlyCell(hoja, value=texto)
+        celda.font = negrita
+        encabezado.append(celda)
+    hoja.append(encabezado)
+
+    plantillas = {}
+    for indice in numericas:
+        plantillas[indice] = WriteOnlyCell(hoja)
+        plantillas[indice].number_format = FORMATO_NUMERO
+    for fila in filas:
+        fila = list(fila)
+        # En modo write_only `append` serializa la fila al instante: las celdas con
+        # formato se reutilizan en lugar de crear objetos por fila
+        for indice, celda in plantillas.items():
+            celda.value = fila[indice]
+            fila[indice] = celda
+        hoja.append(fila)
+    libro.save(destino)
+    return destino
+
+
+def excel_temporal(filas, **opciones):
+    """Genera el Excel en un archivo temporal (en memoria hasta `MAX_EXCEL_EN_MEMORIA`) listo para leer"""
+    archivo = tempfile.SpooledTemporaryFile(max_size=MAX_EXCEL_EN_MEMORIA, suffix='.xlsx')
+    escribir_excel(filas, archivo, **opciones)
+    archivo.seek(0)
+    return archivo
+
+
+def escribir_pdf(filas, destino, titulo='Reporte de Productos con Stock', cabeceras=PDF_CABECERAS,
+                 anchos=PDF_ANCHOS, largos=PDF_LARGOS, alineaciones=PDF_ALINEACIONES, subtitulo=None):
+    """Escribe las filas como tabla en un PDF A4 horizontal guardado en `destino` (ver `services.pdf`)"""
+    from .pdf import renderizar_tabla
+
+    renderizar_tabla(
+        filas, destino, titulo, cabeceras, anchos,
+        largos=largos, alineaciones=alineaciones, subtitulo=subtitulo,
+    )
+    return destino
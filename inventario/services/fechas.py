@@ -0,0 +1,19 @@
+"""Rangos de fechas aptos para índices.
+
+Filtrar con `fecha__date=dia` obliga a convertir cada fila (`fecha AT TIME ZONE ...`)
+y no puede usar el índice sobre `fecha`; un rango `[inicio, fin)` sobre la columna
+sí lo usa.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def inicio_del_dia(dia):
+    """Primer instante de `dia` en la zona horaria local"""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def rango_del_dia(dia):
+    """Par `(inicio, fin)` para filtrar `fecha__gte=inicio, fecha__lt=fin`"""
+    return inicio_del_dia(dia), inicio_del_dia(dia + timedelta(days=1))
@@ -0,0 +1,436 @@
+"""Importación masiva de facturas y conteos físicos desde CSV o Excel.
+
+El archivo se lee fila a fila (CSV con el módulo `csv`, XLSX con openpyxl en modo
+solo lectura), los códigos de producto, áreas y RUT de proveedor se resuelven con
+diccionarios cargados una sola vez y la escritura se hace por lotes, cada uno en
+su propia transacción, a través de `registrar_entradas`. Las filas con error no
+detienen la importación: se informan con su número de fila.
+
+Modos:
+
+* `factura`: cada grupo de filas consecutivas con el mismo `numero` es una
+  entrada (columnas `numero`, `fecha`, `proveedor_rut`, `codigo`, `area`,
+  `cantidad`, `precio_unitario`). Si una línea falla se omite la factura completa.
+* `conteo`: `cantidad` es lo contado en el área; la diferencia con el saldo
+  actual se registra como ajuste (entrada de tipo AJUSTE si sobra, movimiento de
+  ajuste con salida del área si falta).
+"""
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import DecimalValidator
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from ..models import Area, DetalleEntradaStock, EntradaStock, Movimiento, Producto, Proveedor, Stock
+from .entradas import EntradaInvalida, registrar_entradas
+from .stock import StockInsuficiente
+
+
+MODOS = ('factura', 'conteo')
+TAMANO_LOTE = 1000  # filas por transacción
+CENTAVO = Decimal('0.01')
+# Mismo límite que `DetalleEntradaStock.cantidad` y `precio_unitario`
+VALIDAR_DECIMAL = DecimalValidator(max_digits=10, decimal_places=2)
+
+ALIAS_COLUMNAS = {
+    'numero_entrada': 'numero',
+    'factura': 'numero',
+    'fecha_compra': 'fecha',
+    'rut': 'proveedor_rut',
+    'rut_proveedor': 'proveedor_rut',
+    'producto': 'codigo',
+    'codigo_producto': 'codigo',
+    'area_destino': 'area',
+    'precio': 'precio_unitario',
+}
+
+
+class ArchivoInvalido(ValueError):
+    """El archivo no se puede leer o le faltan columnas obligatorias"""
+
+
+@dataclass
+class ResultadoImportacion:
+    filas_leidas: int = 0
+    filas_importadas: int = 0
+    documentos: int = 0
+    movimientos: int = 0
+    errores: list = field(default_factory=list)  # (fila, mensaje)
+    dry_run: bool = False
+
+    def agregar_error(self, fila, mensaje):
+        self.errores.append((fila, mensaje))
+
+
+def _normalizar_columna(nombre):
+    nombre = str(nombre or '').strip().lower().replace(' ', '_')
+    return ALIAS_COLUMNAS.get(nombre, nombre)
+
+
+def _normalizar_rut(rut):
+    return str(rut or '').replace('.', '').replace(' ', '').upper()
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _decimal(valor):
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (int, float, Decimal)):
+        numero = Decimal(str(valor))
+    else:
+        texto = str(valor).strip().replace(' ', '')
+        if ',' in texto:
+            # Formato local: 1.234,50
+            texto = texto.replace('.', '').replace(',', '.')
+        try:
+            numero = Decimal(texto)
+        except InvalidOperation:
+            raise ValueError(f'"{valor}" no es un número válido')
+    if not numero.is_finite():
+        raise ValueError(f'"{valor}" no es un número válido')
+    try:
+        if isinstance(valor, float):
+            # Las celdas numéricas de Excel traen el ruido del punto flotante
+            numero = numero.quantize(CENTAVO)
+        VALIDAR_DECIMAL(numero.normalize())
+    except (InvalidOperation, ValidationError):
+        raise ValueError(f'"{valor}" excede el máximo de 10 dígitos con 2 decimales')
+    return numero.quantize(CENTAVO)
+
+
+def _fecha(valor):
+    if valor in (None, ''):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    for formato in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(str(valor).strip(), formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f'"{valor}" no es una fecha válida (use AAAA-MM-DD o DD/MM/AAAA)')
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.readline()
+    delimitador = ';' if muestra.count(';') > muestra.count(',') else ','
+    lector = csv.reader(io.StringIO(muestra), delimiter=delimitador)
+    yield next(lector, [])
+    yield from csv.reader(texto, delimiter=delimitador)
+
+
+def _filas_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre=None, requeridas=('codigo', 'area', 'cantidad')):
+    """Itera `(numero_fila, dict)` con las columnas normalizadas del archivo.
+
+    `archivo` puede ser una ruta o un archivo binario abierto (p. ej. un archivo
+    subido); el formato se deduce de la extensión de `nombre`.
+    """
+    nombre = nombre or getattr(archivo, 'name', None) or str(archivo)
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension not in ('.csv', '.xlsx'):
+        raise ArchivoInvalido('Formato no soportado: use un archivo .csv o .xlsx.')
+
+    propio = isinstance(archivo, (str, os.PathLike))
+    if propio:
+        archivo = open(archivo, 'rb')
+    try:
+        filas = _filas_xlsx(archivo) if extension == '.xlsx' else _filas_csv(archivo)
+        try:
+            encabezado = [_normalizar_columna(c) for c in next(filas)]
+        except StopIteration:
+            raise ArchivoInvalido('El archivo está vacío.')
+        faltantes = [columna for columna in requeridas if columna not in encabezado]
+        if faltantes:
+            raise ArchivoInvalido(f'Faltan columnas obligatorias: {", ".join(faltantes)}.')
+        for numero, fila in enumerate(filas, 2):
+            if not any(_texto(valor) for valor in fila):
+                continue
+            yield numero, dict(zip(encabezado, fila))
+    except UnicodeDecodeError:
+        raise ArchivoInvalido('El archivo CSV debe estar codificado en UTF-8.')
+    finally:
+        if propio:
+            archivo.close()
+
+
+class _Catalogos:
+    """Diccionarios de búsqueda cargados una vez por importación"""
+
+    def __init__(self):
+        self.productos = {
+            p.codigo.upper(): p
+            for p in Producto.objects.filter(activo=True).order_by().only(
+                'id', 'codigo', 'nombre', 'precio_unitario', 'stock_total'
+            )
+        }
+        self.areas = {}
+        for area in Area.objects.filter(activo=True).order_by().only('id', 'nombre'):
+            self.areas[area.nombre.strip().lower()] = area
+            self.areas[str(area.pk)] = area
+        self.proveedores = {
+            _normalizar_rut(p.rut): p for p in Proveedor.objects.filter(activo=True).order_by().only('id', 'rut', 'nombre')
+        }
+
+    def producto(self, codigo):
+        producto = self.productos.get(_texto(codigo).upper())
+        if producto is None:
+            raise ValueError(f'producto "{_texto(codigo)}" no existe o está inactivo')
+        return producto
+
+    def area(self, valor):
+        area = self.areas.get(_texto(valor).lower())
+        if area is None:
+            raise ValueError(f'área "{_texto(valor)}" no existe o está inactiva')
+        return area
+
+    def proveedor(self, rut):
+        if not _texto(rut):
+            return None
+        proveedor = self.proveedores.get(_normalizar_rut(rut))
+        if proveedor is None:
+            raise ValueError(f'proveedor con RUT "{_texto(rut)}" no existe')
+        return proveedor
+
+
+def _cantidad(fila, permitir_cero=False):
+    cantidad = _decimal(fila.get('cantidad'))
+    if cantidad is None:
+        raise ValueError('falta la cantidad')
+    if cantidad < 0 or (cantidad == 0 and not permitir_cero):
+        raise ValueError('la cantidad debe ser mayor a 0')
+    return cantidad
+
+
+class _Importador:
+
+    def __init__(self, usuario, numero, tamano_lote, resultado):
+        self.usuario = usuario
+        self.numero = numero
+        self.tamano_lote = tamano_lote
+        self.resultado = resultado
+        self.catalogos = _Catalogos()
+
+    def _escribir(self, filas, funcion):
+        """Ejecuta un lote en su propia transacción y registra su error si falla"""
+        try:
+            with transaction.atomic():
+                funcion()
+        except (EntradaInvalida, StockInsuficiente, DatabaseError) as e:
+            self.resultado.agregar_error(filas[0], f'Lote de filas {filas[0]}-{filas[-1]} omitido: {e}')
+            return False
+        return True
+
+    # Facturas
+
+    def importar_facturas(self, filas):
+        lote = []
+        documento = None
+        for numero_fila, fila in filas:
+            self.resultado.filas_leidas += 1
+            numero = _texto(fila.get('numero')) or self.numero
+            if documento is None or numero != documento['numero']:
+                if documento is not None:
+                    lote.append(documento)
+                    if sum(len(d['filas']) for d in lote) >= self.tamano_lote:
+                        self._guardar_facturas(lote)
+                        lote = []
+                documento = {'numero': numero, 'filas': [], 'detalles': [], 'entrada': None, 'valido': True}
+            self._agregar_linea(documento, numero_fila, fila)
+        if documento is not None:
+            lote.append(documento)
+        if lote:
+            self._guardar_facturas(lote)
+
+    def _agregar_linea(self, documento, numero_fila, fila):
+        documento['filas'].append(numero_fila)
+        try:
+            if documento['entrada'] is None:
+                if not documento['numero']:
+                    raise ValueError('falta el número de factura')
+                tipo = _texto(fila.get('tipo')).upper() or 'COMPRA'
+                if tipo not in dict(EntradaStock.TIPOS_ENTRADA):
+                    raise ValueError(f'tipo de entrada "{tipo}" no válido')
+                documento['entrada'] = EntradaStock(
+                    numero_entrada=documento['numero'],
+                    tipo=tipo,
+                    proveedor=self.catalogos.proveedor(fila.get('proveedor_rut')),
+                    fecha_compra=_fecha(fila.get('fecha')) or timezone.localdate(),
+                    registrado_por=self.usuario,
+                    total_compra=Decimal('0'),
+                )
+            producto = self.catalogos.producto(fila.get('codigo'))
+            precio = _decimal(fila.get('precio_unitario'))
+            if precio is None:
+                precio = producto.precio_unitario
+            elif precio < 0:
+                raise ValueError('el precio unitario no puede ser negativo')
+            detalle = DetalleEntradaStock(
+                producto=producto,
+                area_destino=self.catalogos.area(fila.get('area')),
+                cantidad=_cantidad(fila),
+                precio_unitario=precio,
+            )
+        except ValueError as e:
+            documento['valido'] = False
+            self.resultado.agregar_error(numero_fila, str(e))
+            return
+        documento['detalles'].append(detalle)
+        if detalle.precio_unitario is not None:
+            documento['entrada'].total_compra += detalle.cantidad * detalle.precio_unitario
+
+    def _guardar_facturas(self, lote):
+        validos = []
+        for documento in lote:
+            if documento['valido']:
+                validos.append(documento)
+            else:
+                self.resultado.agregar_error(
+                    documento['filas'][0],
+                    f'Factura "{documento["numero"]}" omitida por errores en sus líneas.',
+                )
+        if not validos:
+            return
+        filas = [f for documento in validos for f in documento['filas']]
+        movimientos = []
+
+        def guardar():
+            movimientos.extend(registrar_entradas(
+                [(d['entrada'], d['detalles']) for d in validos],
+                self.usuario,
+                observaciones='Importación factura: {numero}',
+            ))
+
+        if self._escribir(filas, guardar):
+            self.resultado.documentos += len(validos)
+            self.resultado.filas_importadas += len(filas)
+            self.resultado.movimientos += len(movimientos)
+
+    # Conteos físicos
+
+    def importar_conteo(self, filas):
+        vistos = set()
+        lote = []
+        for numero_fila, fila in filas:
+            self.resultado.filas_leidas += 1
+            try:
+                producto = self.catalogos.producto(fila.get('codigo'))
+                area = self.catalogos.area(fila.get('area'))
+                contado = _cantidad(fila, permitir_cero=True)
+            except ValueError as e:
+                self.resultado.agregar_error(numero_fila, str(e))
+                continue
+            if (producto.pk, area.pk) in vistos:
+                self.resultado.agregar_error(
+                    numero_fila, f'{producto.codigo} en {area.nombre} ya fue contado en otra fila'
+                )
+                continue
+            vistos.add((producto.pk, area.pk))
+            lote.append((numero_fila, producto, area, contado))
+            if len(lote) >= self.tamano_lote:
+                self._guardar_conteo(lote)
+                lote = []
+        if lote:
+            self._guardar_conteo(lote)
+
+    def _guardar_conteo(self, lote):
+        filas = [numero_fila for numero_fila, *_ in lote]
+        numero = self.numero or f'CONTEO-{timezone.localdate():%Y%m%d}'
+        movimientos = []
+
+        def guardar():
+            productos = {producto.pk for _, producto, _, _ in lote}
+            areas = {area.pk for _, _, area, _ in lote}
+            actuales = {
+                (producto_id, area_id): cantidad
+                for producto_id, area_id, cantidad in Stock.objects.select_for_update().filter(
+                    producto_id__in=productos, area_id__in=areas
+                ).values_list('producto_id', 'area_id', 'cantidad')
+            }
+            detalles = []
+            faltantes = []
+            for _, producto, area, contado in lote:
+                diferencia = contado - actuales.get((producto.pk, area.pk), Decimal('0'))
+                if diferencia > 0:
+                    detalles.append(DetalleEntradaStock(
+                        producto=producto, area_destino=area,
+                        cantidad=diferencia, precio_unitario=producto.precio_unitario,
+                    ))
+                elif diferencia < 0:
+                    faltantes.append(Movimiento(
+                        producto=producto, area_origen=area, tipo='AJUSTE', motivo='AJUSTE_INVENTARIO',
+                        cantidad=-diferencia, precio_unitario=producto.precio_unitario,
+                        usuario=self.usuario, observaciones=f'Conteo físico: {numero}',
+                    ))
+            documentos = []
+            if detalles:
+                entrada = EntradaStock(
+                    numero_entrada=numero, tipo='AJUSTE', fecha_compra=timezone.localdate(),
+                    registrado_por=self.usuario, observaciones='Sobrantes de conteo físico',
+                )
+                documentos.append((entrada, detalles))
+            movimientos.extend(registrar_entradas(
+                documentos, self.usuario, tipo='AJUSTE', motivo='AJUSTE_INVENTARIO',
+                observaciones='Conteo físico: {numero}', otros_movimientos=faltantes,
+            ))
+            if documentos:
+                self.resultado.documentos += 1
+
+        if self._escribir(filas, guardar):
+            self.resultado.filas_importadas += len(filas)
+            self.resultado.movimientos += len(movimientos)
+
+
+def importar_entradas(archivo, usuario, modo='factura', nombre=None, numero='', dry_run=False,
+                      tamano_lote=TAMANO_LOTE):
+    """Importa un archivo CSV/XLSX de facturas o de conteo físico.
+
+    Cada lote de `tamano_lote` filas se escribe en su propia transacción; con
+    `dry_run` todo se valida y ejecuta pero se revierte al final. Devuelve un
+    `ResultadoImportacion` con los contadores y los errores por fila.
+    """
+    if modo not in MODOS:
+        raise ValueError(f'Modo "{modo}" no válido (use {" o ".join(MODOS)}).')
+    resultado = ResultadoImportacion(dry_run=dry_run)
+    filas = leer_filas(archivo, nombre)
+
+    def importar():
+        importador = _Importador(usuario, numero, tamano_lote, resultado)
+        if modo == 'factura':
+            importador.importar_facturas(filas)
+        else:
+            importador.importar_conteo(filas)
+
+    if dry_run:
+        # Los lotes quedan como savepoints de una transacción que se revierte
+        with transaction.atomic():
+            importar()
+            transaction.set_rollback(True)
+    else:
+        importar()
+    return resultado
@@ -0,0 +1,153 @@
+"""Verificación del stock contra el libro de movimientos.
+
+`Movimiento` es el libro: cada fila resta su cantidad en `area_origen` y la suma
+en `area_destino` (ver `apply_movements`), así que reproducirlo desde cero debe
+dar exactamente `Stock.cantidad` de cada `(producto, area)`.
+
+`verificar_libro` recorre el libro con una sola consulta ordenada por
+`(producto, fecha, id)` leída con cursor, y la cruza con `Stock` leído en el
+mismo orden de producto (merge de dos flujos ordenados): en memoria solo están
+los saldos de un producto a la vez, los lotes de corrección pendientes y las
+primeras derivas como ejemplo. En PostgreSQL ambas lecturas corren en una
+transacción REPEATABLE READ para ver la misma foto de la base aunque lleguen
+movimientos durante la verificación.
+
+Con `reconstruir=True` cada deriva se corrige escribiendo el saldo del libro en
+`Stock` con upserts en bloque, y luego se recalculan los totales y alertas de
+los productos tocados. Los saldos negativos del libro no se escriben: indican
+movimientos que faltan y se informan aparte.
+"""
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Movimiento, Stock
+from .stock import recalcular_totales
+
+
+TAMANO_BLOQUE = 5000  # filas por viaje al cursor
+TAMANO_LOTE = 1000  # correcciones por upsert
+MAX_EJEMPLOS = 50
+CERO = Decimal('0')
+
+
+@dataclass
+class Deriva:
+    producto_id: int
+    area_id: int
+    libro: Decimal
+    stock: Decimal
+
+    @property
+    def diferencia(self):
+        return self.stock - self.libro
+
+
+@dataclass
+class ResultadoLibro:
+    movimientos: int = 0
+    pares: int = 0
+    derivas: int = 0
+    negativos: int = 0
+    corregidos: int = 0
+    ejemplos: list = field(default_factory=list)  # primeras `Deriva` encontradas
+    segundos: float = 0.0
+
+
+def _saldos_del_libro(tamano_bloque, resultado):
+    """`(producto_id, {area_id: saldo})` por producto, reproduciendo el libro en orden"""
+    filas = Movimiento.objects.order_by('producto_id', 'fecha', 'id').values_list(
+        'producto_id', 'area_origen_id', 'area_destino_id', 'cantidad',
+    ).iterator(chunk_size=tamano_bloque)
+    for producto_id, movimientos in groupby(filas, key=itemgetter(0)):
+        saldos = {}
+        for _, origen, destino, cantidad in movimientos:
+            resultado.movimientos += 1
+            if origen:
+                saldos[origen] = saldos.get(origen, CERO) - cantidad
+            if destino:
+                saldos[destino] = saldos.get(destino, CERO) + cantidad
+        yield producto_id, saldos
+
+
+def _saldos_de_stock(tamano_bloque):
+    """`(producto_id, {area_id: cantidad})` por producto desde la tabla `Stock`"""
+    filas = Stock.objects.order_by('producto_id', 'area_id').values_list(
+        'producto_id', 'area_id', 'cantidad',
+    ).iterator(chunk_size=tamano_bloque)
+    for producto_id, stocks in groupby(filas, key=itemgetter(0)):
+        yield producto_id, {area_id: cantidad for _, area_id, cantidad in stocks}
+
+
+def _por_producto(libro, stock):
+    """Cruza dos flujos ordenados por producto: `(producto_id, saldos_libro, saldos_stock)`"""
+    fin = (None, None)
+    actual_libro, actual_stock = next(libro, fin), next(stock, fin)
+    while actual_libro[0] is not None or actual_stock[0] is not None:
+        if actual_stock[0] is None or (actual_libro[0] is not None and actual_libro[0] < actual_stock[0]):
+            yield actual_libro[0], actual_libro[1], {}
+            actual_libro = next(libro, fin)
+        elif actual_libro[0] is None or actual_stock[0] < actual_libro[0]:
+            yield actual_stock[0], {}, actual_stock[1]
+            actual_stock = next(stock, fin)
+        else:
+            yield actual_libro[0], actual_libro[1], actual_stock[1]
+            actual_libro, actual_stock = next(libro, fin), next(stock, fin)
+
+
+def _corregir(lote, resultado):
+    """Escribe los saldos del libro del lote en `Stock` y recalcula los productos tocados"""
+    ahora = timezone.now()
+    Stock.objects.bulk_create(
+        [
+            Stock(producto_id=d.producto_id, area_id=d.area_id, cantidad=d.libro, fecha_actualizacion=ahora)
+            for d in lote
+        ],
+        update_conflicts=True, unique_fields=['producto', 'area'], update_fields=['cantidad', 'fecha_actualizacion'],
+    )
+    recalcular_totales(sorted({d.producto_id for d in lote}))
+    resultado.corregidos += len(lote)
+    lote.clear()
+
+
+def verificar_libro(reconstruir=False, tamano_bloque=TAMANO_BLOQUE):
+    """Compara `Stock` con el libro reproducido y devuelve un `ResultadoLibro`.
+
+    Con `reconstruir` corrige las derivas en la misma transacción.
+    """
+    inicio = time.perf_counter()
+    resultado = ResultadoLibro()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Debe ser la primera sentencia de la transacción
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+        lote = []
+        flujos = _por_producto(_saldos_del_libro(tamano_bloque, resultado), _saldos_de_stock(tamano_bloque))
+        for producto_id, libro, stock in flujos:
+            for area_id in libro.keys() | stock.keys():
+                resultado.pares += 1
+                saldo, cantidad = libro.get(area_id, CERO), stock.get(area_id, CERO)
+                if saldo == cantidad:
+                    continue
+                deriva = Deriva(producto_id, area_id, saldo, cantidad)
+                resultado.derivas += 1
+                if len(resultado.ejemplos) < MAX_EJEMPLOS:
+                    resultado.ejemplos.append(deriva)
+                if saldo < 0:
+                    resultado.negativos += 1
+                elif reconstruir:
+                    lote.append(deriva)
+            if len(lote) >= TAMANO_LOTE:
+                _corregir(lote, resultado)
+        if lote:
+            _corregir(lote, resultado)
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
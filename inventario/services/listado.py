@@ -0,0 +1,141 @@
+"""Consulta del listado de productos.
+
+`ListadoProductos` arma el queryset filtrado y ordenado a partir de los parámetros
+de la vista y entrega cada página como filas ya resueltas: el stock total y el
+desglose por área se calculan desde un único prefetch de `Stock`, de modo que una
+página cuesta siempre las mismas consultas sin importar cuántos productos tenga.
+La vista pagina por cursor (`pagina_cursor`); `pagina` queda para paginar por
+número de página.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.core.paginator import Paginator
+from django.db.models import Exists, F, OuterRef, Prefetch
+
+from ..models import Producto, Stock
+from ..paginacion import PaginadorCursor
+from .busqueda import buscar_productos
+
+
+@dataclass
+class StockArea:
+    area: object
+    cantidad: Decimal
+
+
+@dataclass
+class FilaProducto:
+    producto: Producto
+    stock_total: Decimal = Decimal('0')
+    areas: list = field(default_factory=list)  # StockArea con saldo > 0
+
+    @property
+    def agotado(self):
+        return self.stock_total <= 0
+
+    @property
+    def stock_bajo(self):
+        return 0 < self.stock_total <= self.producto.stock_minimo
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class ListadoProductos:
+    """Filtros, orden y paginación del listado de productos activos"""
+    ORDENES = (
+        'nombre', '-nombre', 'categoria__nombre', 'codigo',
+        '-fecha_creacion', 'stock_total', '-stock_total',
+    )
+    ORDEN_DEFECTO = 'categoria__nombre'
+    ESTADOS_STOCK = ('agotado', 'bajo', 'disponible')
+    POR_PAGINA = 12
+
+    def __init__(self, busqueda='', categoria=None, area=None, stock=None, orden=None):
+        self.busqueda = (busqueda or '').strip()
+        self.categoria = categoria
+        self.area = area
+        self.stock = stock if stock in self.ESTADOS_STOCK else None
+        self.orden = orden if orden in self.ORDENES else self.ORDEN_DEFECTO
+
+    @classmethod
+    def desde_parametros(cls, params):
+        """Construye el listado desde `request.GET` ignorando valores inválidos"""
+        return cls(
+            busqueda=params.get('q', ''),
+            categoria=_entero(params.get('categoria')),
+            area=_entero(params.get('area')),
+            stock=params.get('stock'),
+            orden=params.get('orden'),
+        )
+
+    def queryset(self):
+        productos = Producto.objects.filter(activo=True).select_related('categoria')
+
+        if self.busqueda:
+            productos = buscar_productos(productos, self.busqueda)
+        if self.categoria is not None:
+            productos = productos.filter(categoria_id=self.categoria)
+        if self.area is not None:
+            # EXISTS en lugar de JOIN + DISTINCT: no duplica filas ni rompe el orden
+            productos = productos.filter(
+                Exists(Stock.objects.filter(producto=OuterRef('pk'), area_id=self.area))
+            )
+        if self.stock == 'agotado':
+            productos = productos.filter(stock_total__lte=0)
+        elif self.stock == 'bajo':
+            productos = productos.filter(stock_total__lte=F('stock_minimo'), stock_total__gt=0)
+        elif self.stock == 'disponible':
+            productos = productos.filter(stock_total__gt=0)
+
+        return productos.order_by(*self.columnas_orden())
+
+    def columnas_orden(self):
+        """Orden activo completado con `nombre` e `id` para que sea total"""
+        columnas = [self.orden]
+        if self.orden.lstrip('-') != 'nombre':
+            columnas.append('nombre')
+        return columnas + ['id']
+
+    def _con_stocks(self):
+        return self.queryset().prefetch_related(Prefetch(
+            'stocks',
+            queryset=Stock.objects.filter(cantidad__gt=0).select_related('area').order_by('area__nombre'),
+            to_attr='stocks_con_saldo',
+        ))
+
+    def pagina(self, numero, por_pagina=POR_PAGINA):
+        """Devuelve `(page_obj, filas)` para la página pedida.
+
+        El prefetch se aplica solo a los productos de la página: una consulta
+        para contar, una para los productos y una para sus stocks por área.
+        """
+        page_obj = Paginator(self._con_stocks(), por_pagina).get_page(numero)
+        return page_obj, self._filas(page_obj)
+
+    def pagina_cursor(self, despues=None, antes=None, por_pagina=POR_PAGINA, contar=True):
+        """Devuelve `(pagina, filas)` paginando por cursor sobre el orden activo.
+
+        Sin `contar` la página cuesta dos consultas (productos y stocks) en
+        cualquier posición del listado. Lanza `CursorInvalido` si el cursor no
+        corresponde al orden actual.
+        """
+        paginador = PaginadorCursor(self._con_stocks(), self.columnas_orden(), por_pagina, contar=contar)
+        pagina = paginador.pagina(despues=despues, antes=antes)
+        return pagina, self._filas(pagina)
+
+    def _filas(self, productos):
+        filas = []
+        for producto in productos:
+            areas = [StockArea(stock.area, stock.cantidad) for stock in producto.stocks_con_saldo]
+            filas.append(FilaProducto(
+                producto=producto,
+                stock_total=sum((a.cantidad for a in areas), Decimal('0')),
+                areas=areas,
+            ))
+        return filas
@@ -0,0 +1,95 @@
+"""Numeración de documentos (pedidos, facturas, entradas).
+
+Cada serie tiene una fila en `ContadorDocumento`. Reservar un número es un
+`UPDATE ... SET ultimo = ultimo + 1 ... RETURNING ultimo`: una sola sentencia,
+sin contar documentos, y la fila queda bloqueada hasta que la transacción del
+llamador confirma, de modo que dos usuarios en paralelo nunca reciben el mismo
+número. Si la transacción se revierte el número vuelve a quedar libre.
+
+Series en uso: `PED-<año>` (pedidos), `FAC` (facturas), `ENT` (entradas) y
+`REC` (recibos de entrada rápida). Las vistas muestran el próximo número con
+`vista_previa`, que sale de la caché actualizada al reservar: renderizar un
+formulario no consulta la base. El número definitivo se reserva al guardar.
+"""
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+
+from ..models import ContadorDocumento
+
+
+TIEMPO_VISTA_PREVIA = 60 * 60
+
+
+def _clave(serie):
+    return f'numeracion:{serie}'
+
+
+def _con_returning():
+    # MySQL/MariaDB no admiten UPDATE ... RETURNING
+    return connection.vendor != 'mysql' and connection.features.can_return_rows_from_bulk_insert
+
+
+def _incrementar(serie, cantidad):
+    """Suma `cantidad` al contador de `serie` y devuelve el nuevo valor (None si la serie no existe)"""
+    if _con_returning():
+        tabla = connection.ops.quote_name(ContadorDocumento._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {tabla} SET ultimo = ultimo + %s WHERE serie = %s RETURNING ultimo', [cantidad, serie]
+            )
+            fila = cursor.fetchone()
+        return fila[0] if fila else None
+    contador = ContadorDocumento.objects.filter(serie=serie)
+    if not contador.update(ultimo=F('ultimo') + cantidad):
+        return None
+    return contador.values_list('ultimo', flat=True).get()
+
+
+def siguiente_valor(serie, cantidad=1):
+    """Reserva `cantidad` números consecutivos de `serie` y devuelve el último.
+
+    La serie se crea en su primer uso. Con `cantidad` > 1 los números reservados
+    van de `valor - cantidad + 1` a `valor` (una sola sentencia para todo el bloque).
+    """
+    valor = _incrementar(serie, cantidad)
+    if valor is None:
+        with transaction.atomic():
+            # Dos primeros usos simultáneos: uno inserta y el otro espera la fila
+            ContadorDocumento.objects.bulk_create([ContadorDocumento(serie=serie)], ignore_conflicts=True)
+            valor = _incrementar(serie, cantidad)
+    cache.set(_clave(serie), valor, TIEMPO_VISTA_PREVIA)
+    return valor
+
+
+def serie_documento(prefijo, anio=None):
+    return f'{prefijo}-{anio}' if anio else prefijo
+
+
+def numero_documento(prefijo, anio=None, digitos=4):
+    """Reserva el siguiente número con formato `PREFIJO[-AÑO]-0001`"""
+    serie = serie_documento(prefijo, anio)
+    return f'{serie}-{siguiente_valor(serie):0{digitos}d}'
+
+
+def numeros_documento(prefijo, cantidad, anio=None, digitos=4):
+    """Reserva `cantidad` números consecutivos (para documentos creados con `bulk_create`)"""
+    if cantidad <= 0:
+        return []
+    serie = serie_documento(prefijo, anio)
+    ultimo = siguiente_valor(serie, cantidad)
+    return [f'{serie}-{valor:0{digitos}d}' for valor in range(ultimo - cantidad + 1, ultimo + 1)]
+
+
+def vista_previa(prefijo, anio=None, digitos=4):
+    """Número que probablemente recibirá el próximo documento (no lo reserva).
+
+    Solo consulta la base si la serie no está en caché; con usuarios en paralelo
+    el número final puede ser otro.
+    """
+    serie = serie_documento(prefijo, anio)
+    ultimo = cache.get(_clave(serie))
+    if ultimo is None:
+        ultimo = ContadorDocumento.objects.filter(serie=serie).values_list('ultimo', flat=True).first() or 0
+        cache.set(_clave(serie), ultimo, TIEMPO_VISTA_PREVIA)
+    return f'{serie}-{ultimo + 1:0{digitos}d}'
@@ -0,0 +1,161 @@
+"""Pronóstico de la velocidad de consumo por producto y área.
+
+Una sola consulta agrupada trae el total diario de SALIDA de cada par
+(producto, área de origen) en el período analizado; el resultado se vuelca en
+una matriz NumPy `pares × días` y todas las métricas salen de operaciones
+vectorizadas sobre ella:
+
+- `promedio_movil`: media de las últimas `ventana` columnas (días sin salidas
+  cuentan como 0),
+- `consumo_diario`: suavizamiento exponencial simple con factor `alfa`, como
+  producto de la matriz por el vector de pesos `alfa·(1−alfa)^k` normalizado,
+- `dias_cobertura`: stock actual del área / `consumo_diario`.
+
+Los resultados reemplazan la tabla `PronosticoConsumo` con un INSERT ... ON
+CONFLICT en bloque; los pares que dejaron de tener salidas se borran.
+"""
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import Movimiento, PronosticoConsumo, Stock
+from .fechas import inicio_del_dia
+
+
+DIAS_HISTORIA = 365
+VENTANA = 28
+ALFA = 0.2
+TAMANO_LOTE = 1000
+CAMPOS_ACTUALIZADOS = [
+    'promedio_movil', 'consumo_diario', 'consumo_total', 'dias_con_consumo',
+    'stock_actual', 'dias_cobertura', 'fecha_calculo',
+]
+
+
+@dataclass
+class ResultadoPronostico:
+    pares: int
+    filas: int
+    eliminados: int
+    segundos: float
+
+
+def _salidas_diarias(desde, por_area):
+    """Filas `(producto_id, area_id, día, total)` de las salidas desde `desde`.
+
+    Sin `por_area` se suman todas las áreas y `area_id` viene en 0.
+    """
+    salidas = Movimiento.objects.filter(tipo='SALIDA', fecha__gte=inicio_del_dia(desde))
+    if por_area:
+        salidas = salidas.filter(area_origen__isnull=False).annotate(area=F('area_origen_id'))
+    else:
+        salidas = salidas.annotate(area=Value(0))
+    return list(
+        salidas.annotate(dia=TruncDate('fecha'))
+        .values('producto_id', 'area', 'dia')
+        .annotate(total=Sum('cantidad'))
+        .order_by()
+        .values_list('producto_id', 'area', 'dia', 'total')
+    )
+
+
+def matriz_consumo(dias=DIAS_HISTORIA, por_area=True, hoy=None):
+    """Salidas diarias de los últimos `dias` como matriz NumPy `pares × días`.
+
+    Devuelve `(producto_ids, area_ids, matriz, filas)`: los dos primeros son
+    arreglos con el par de cada fila de la matriz (áreas en 0 sin `por_area`),
+    la última columna es hoy y `filas` es cuántas filas trajo la consulta.
+    """
+    import numpy as np
+
+    hoy = hoy or timezone.localdate()
+    desde = hoy - timedelta(days=dias - 1)
+    filas = _salidas_diarias(desde, por_area)
+    n = len(filas)
+    productos = np.fromiter((f[0] for f in filas), dtype=np.int64, count=n)
+    areas = np.fromiter((f[1] for f in filas), dtype=np.int64, count=n)
+    columnas = np.fromiter((f[2].toordinal() for f in filas), dtype=np.int64, count=n) - desde.toordinal()
+    totales = np.fromiter((f[3] for f in filas), dtype=np.float64, count=n)
+
+    # Un índice de fila por par: la clave combinada se desarma después con divmod
+    base = int(areas.max()) + 1 if n else 1
+    claves, indice = np.unique(productos * base + areas, return_inverse=True)
+    matriz = np.zeros((len(claves), dias), dtype=np.float64)
+    np.add.at(matriz, (indice, np.clip(columnas, 0, dias - 1)), totales)
+    producto_ids, area_ids = np.divmod(claves, base)
+    return producto_ids, area_ids, matriz, n
+
+
+def pesos_exponenciales(dias, alfa=ALFA):
+    """Pesos del suavizamiento exponencial para `dias` columnas (el último día pesa más)"""
+    import numpy as np
+
+    pesos = alfa * (1 - alfa) ** np.arange(dias - 1, -1, -1, dtype=np.float64)
+    return pesos / pesos.sum()
+
+
+def calcular_matriz(matriz, ventana=VENTANA, alfa=ALFA):
+    """Métricas por fila de una matriz `pares × días` de consumo.
+
+    Devuelve `(promedio_movil, consumo_diario, consumo_total, dias_con_consumo)`
+    como arreglos de largo `pares`.
+    """
+    import numpy as np
+
+    ventana = min(ventana, matriz.shape[1])
+    promedio_movil = matriz[:, -ventana:].sum(axis=1) / ventana
+    consumo_diario = matriz @ pesos_exponenciales(matriz.shape[1], alfa)
+    return promedio_movil, consumo_diario, matriz.sum(axis=1), np.count_nonzero(matriz, axis=1)
+
+
+def _decimal(valor, formato):
+    return Decimal(format(valor, formato))
+
+
+def calcular_pronosticos(dias=DIAS_HISTORIA, ventana=VENTANA, alfa=ALFA):
+    """Recalcula la tabla `PronosticoConsumo` completa y devuelve un `ResultadoPronostico`"""
+    import numpy as np
+
+    inicio = time.perf_counter()
+    ahora = timezone.now()
+    producto_ids, area_ids, matriz, n = matriz_consumo(dias, hoy=timezone.localdate(ahora))
+    promedio_movil, consumo_diario, consumo_total, dias_con_consumo = calcular_matriz(matriz, ventana, alfa)
+
+    saldos = {(p, a): c for p, a, c in Stock.objects.values_list('producto_id', 'area_id', 'cantidad')}
+    stock = np.fromiter(
+        (saldos.get((p, a), 0) for p, a in zip(producto_ids.tolist(), area_ids.tolist())),
+        dtype=np.float64, count=len(producto_ids),
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(consumo_diario > 0, stock / consumo_diario, np.nan)
+
+    pronosticos = [
+        PronosticoConsumo(
+            producto_id=p, area_id=a,
+            promedio_movil=_decimal(pm, '.3f'), consumo_diario=_decimal(cd, '.3f'),
+            consumo_total=_decimal(ct, '.2f'), dias_con_consumo=dc,
+            stock_actual=_decimal(st, '.2f'),
+            dias_cobertura=None if np.isnan(cb) else _decimal(min(cb, 99999999.9), '.1f'),
+            fecha_calculo=ahora,
+        )
+        for p, a, pm, cd, ct, dc, st, cb in zip(
+            producto_ids.tolist(), area_ids.tolist(), promedio_movil.tolist(), consumo_diario.tolist(),
+            consumo_total.tolist(), dias_con_consumo.tolist(), stock.tolist(), cobertura.tolist(),
+        )
+    ]
+    with transaction.atomic():
+        PronosticoConsumo.objects.bulk_create(
+            pronosticos, batch_size=TAMANO_LOTE, update_conflicts=True,
+            unique_fields=['producto', 'area'], update_fields=CAMPOS_ACTUALIZADOS,
+        )
+        eliminados, _ = PronosticoConsumo.objects.filter(fecha_calculo__lt=ahora).delete()
+
+    return ResultadoPronostico(
+        pares=len(pronosticos), filas=n, eliminados=eliminados, segundos=time.perf_counter() - inicio,
+    )
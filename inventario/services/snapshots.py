@@ -0,0 +1,161 @@
+"""Fotos diarias del stock y consultas de stock a una fecha.
+
+`StockSnapshotDiario` guarda el saldo de cada `(producto, area)` al cierre de un
+día. `generar_snapshots` las escribe desde el libro de movimientos: parte del
+saldo al cierre del último día pedido (stock actual menos los movimientos
+posteriores, en una sola sentencia para que sea una lectura consistente) y
+retrocede día por día restando los movimientos de cada uno, así que también
+sirve para rellenar la historia.
+
+`as_of(dia)` lee la foto más cercana a `dia` y aplica solo los movimientos
+entre ambas fechas: el costo depende de un día de movimientos, no del libro
+completo. Sin fotos recurre al stock actual y recorre hacia atrás.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ..models import Movimiento, Stock, StockSnapshotDiario
+from .fechas import inicio_del_dia
+
+
+CERO = Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+TAMANO_LOTE = 2000
+
+
+@dataclass
+class ResultadoSnapshots:
+    dias: int
+    filas: int
+
+
+def cierre(dia):
+    """Instante en que termina `dia` (inicio del día siguiente)"""
+    return inicio_del_dia(dia + timedelta(days=1))
+
+
+def _filtrar(queryset, productos, areas, campo_area='area'):
+    if productos is not None:
+        queryset = queryset.filter(producto__in=productos)
+    if areas is not None:
+        queryset = queryset.filter(**{f'{campo_area}__in': areas})
+    return queryset
+
+
+def netos(desde=None, hasta=None, por_dia=False, productos=None, areas=None):
+    """Efecto neto de los movimientos con fecha en `[desde, hasta)` por `(producto, area)`.
+
+    Cada movimiento resta su cantidad en `area_origen` y la suma en `area_destino`,
+    igual que `apply_movements`. Con `por_dia` las claves son
+    `(producto, area, día)`. Dos consultas agrupadas, una por lado.
+    """
+    resultado = defaultdict(Decimal)
+    for campo, signo in (('area_destino', 1), ('area_origen', -1)):
+        movimientos = Movimiento.objects.filter(**{f'{campo}__isnull': False})
+        if desde is not None:
+            movimientos = movimientos.filter(fecha__gte=desde)
+        if hasta is not None:
+            movimientos = movimientos.filter(fecha__lt=hasta)
+        movimientos = _filtrar(movimientos, productos, areas, campo).annotate(area=F(f'{campo}_id'))
+        campos = ['producto_id', 'area']
+        if por_dia:
+            movimientos = movimientos.annotate(dia=TruncDate('fecha'))
+            campos.append('dia')
+        agrupados = movimientos.values(*campos).annotate(total=Sum('cantidad')).order_by()
+        for *clave, total in agrupados.values_list(*campos, 'total'):
+            resultado[tuple(clave)] += signo * total
+    return resultado
+
+
+def _posteriores(campo, corte):
+    """Subconsulta con lo movido desde `corte` en la fila de `Stock` externa por el lado `campo`"""
+    return Coalesce(
+        Subquery(
+            Movimiento.objects.filter(
+                producto=OuterRef('producto_id'), fecha__gte=corte, **{campo: OuterRef('area_id')}
+            ).order_by().values('producto').annotate(total=Sum('cantidad')).values('total')
+        ),
+        CERO,
+    )
+
+
+def saldos_al_cierre(dia, productos=None, areas=None):
+    """`{(producto, area): saldo}` al cierre de `dia` desde el stock actual (una sola sentencia)"""
+    corte = cierre(dia)
+    filas = _filtrar(Stock.objects.all(), productos, areas).annotate(
+        saldo=F('cantidad') - _posteriores('area_destino', corte) + _posteriores('area_origen', corte),
+    ).order_by().values_list('producto_id', 'area_id', 'saldo')
+    return {(producto_id, area_id): saldo for producto_id, area_id, saldo in filas}
+
+
+def generar_snapshots(desde, hasta=None):
+    """Escribe (o reescribe) las fotos de los días `desde`..`hasta` (por defecto ayer).
+
+    Devuelve un `ResultadoSnapshots`. Solo se admiten días ya cerrados.
+    """
+    hoy = timezone.localdate()
+    hasta = hasta or hoy - timedelta(days=1)
+    if hasta >= hoy:
+        raise ValueError('Solo se pueden fotografiar días cerrados (hasta ayer).')
+    if desde > hasta:
+        raise ValueError('La fecha inicial es posterior a la final.')
+
+    saldos = saldos_al_cierre(hasta)
+    por_dia = defaultdict(dict)
+    for (producto_id, area_id, dia), neto in netos(cierre(desde), cierre(hasta), por_dia=True).items():
+        por_dia[dia][(producto_id, area_id)] = neto
+
+    resultado = ResultadoSnapshots(dias=0, filas=0)
+    with transaction.atomic():
+        StockSnapshotDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+        dia = hasta
+        while dia >= desde:
+            fotos = [
+                StockSnapshotDiario(fecha=dia, producto_id=producto_id, area_id=area_id, cantidad=cantidad)
+                for (producto_id, area_id), cantidad in saldos.items() if cantidad
+            ]
+            StockSnapshotDiario.objects.bulk_create(fotos, batch_size=TAMANO_LOTE)
+            resultado.dias += 1
+            resultado.filas += len(fotos)
+            # Cierre del día anterior = cierre de `dia` menos los movimientos de `dia`
+            for clave, neto in por_dia.get(dia, {}).items():
+                saldos[clave] = saldos.get(clave, Decimal('0')) - neto
+            dia -= timedelta(days=1)
+    return resultado
+
+
+def _foto_mas_cercana(dia):
+    """Fecha de la foto más cercana a `dia` (la anterior gana los empates), o `None`"""
+    fechas = StockSnapshotDiario.objects.values_list('fecha', flat=True)
+    anterior = fechas.filter(fecha__lte=dia).order_by('-fecha').first()
+    if anterior == dia:
+        return anterior
+    siguiente = fechas.filter(fecha__gt=dia).order_by('fecha').first()
+    if anterior is None or (siguiente is not None and siguiente - dia < dia - anterior):
+        return siguiente
+    return anterior
+
+
+def as_of(dia, productos=None, areas=None):
+    """Stock por `(producto_id, area_id)` al cierre de `dia` (solo saldos distintos de 0).
+
+    `productos` y `areas` (listas de ids o querysets) acotan el resultado.
+    """
+    base = _foto_mas_cercana(dia)
+    if base is None:
+        saldos = saldos_al_cierre(dia, productos, areas)
+    else:
+        fotos = _filtrar(StockSnapshotDiario.objects.filter(fecha=base), productos, areas)
+        saldos = {(p, a): cantidad for p, a, cantidad in fotos.values_list('producto_id', 'area_id', 'cantidad')}
+        if base != dia:
+            # Hacia adelante se suman los movimientos intermedios; hacia atrás se restan
+            desde, hasta, signo = (base, dia, 1) if base < dia else (dia, base, -1)
+            for clave, neto in netos(cierre(desde), cierre(hasta), productos=productos, areas=areas).items():
+                saldos[clave] = saldos.get(clave, Decimal('0')) + signo * neto
+    return {clave: saldo for clave, saldo in saldos.items() if saldo}
@@ -0,0 +1,269 @@
+"""Servicio único de escritura de stock.
+
+Toda modificación de `Stock` debe pasar por este módulo para que los totales
+desnormalizados de `Producto` (`stock_total` y `valor_stock`) queden siempre
+sincronizados con la suma de sus stocks por área y las alertas de stock bajo de
+los productos tocados se reevalúen, todo en la misma transacción; la versión de
+datos del inventario (ver services/version.py) avanza al confirmarla.
+
+Los saldos se modifican con sentencias atómicas en la base de datos
+(`cantidad = cantidad ± x`) en lugar de leer, sumar en Python y guardar, de modo
+que dos recepciones o salidas simultáneas no pisan sus cambios.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from ..models import Movimiento, Producto, Stock
+from .alertas import evaluar_alertas, evaluar_alertas_generales, evaluar_alertas_por_area
+from .version import incrementar_version
+
+
+CERO = Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+CENTAVOS = Decimal('0.01')
+TAMANO_LOTE = 500  # filas por sentencia multi-fila
+
+
+class StockInsuficiente(ValueError):
+    """El área de origen no tiene stock suficiente para el movimiento"""
+
+    def __init__(self, producto, area):
+        self.producto = producto
+        self.area = area
+        super().__init__(f'El área {area.nombre} no tiene suficiente stock de {producto.nombre}.')
+
+
+def _valor(stock_expr):
+    """Expresión SQL para `stock × precio_unitario` (precio nulo cuenta como 0)"""
+    return ExpressionWrapper(
+        stock_expr * Coalesce(F('precio_unitario'), CERO),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _decimal(valor):
+    return Decimal(str(valor)).quantize(CENTAVOS)
+
+
+def _lotes(items, tamano=TAMANO_LOTE):
+    items = list(items)
+    for inicio in range(0, len(items), tamano):
+        yield items[inicio:inicio + tamano]
+
+
+def _columnas(modelo, *campos):
+    qn = connection.ops.quote_name
+    return [qn(modelo._meta.db_table)] + [qn(modelo._meta.get_field(c).column) for c in campos]
+
+
+def _bloquear(cursor, entradas, salidas, ahora):
+    """Bloquea todas las filas `(producto, area)` del lote en un único orden.
+
+    Las filas de destino que aún no existen se crean en cero y luego se toman los
+    bloqueos de entradas y salidas juntas, ordenadas por `(producto, area)`. Dos lotes
+    que tocan las mismas filas en sentidos opuestos (p. ej. transferencias cruzadas)
+    se esperan en vez de bloquearse mutuamente. En motores sin bloqueo por fila
+    (SQLite bloquea la base completa al escribir) no hace nada.
+    """
+    if not connection.features.has_select_for_update:
+        return
+    tabla, pk, producto, area, cantidad, fecha = _columnas(
+        Stock, 'id', 'producto', 'area', 'cantidad', 'fecha_actualizacion'
+    )
+    for lote in _lotes(sorted(entradas)):
+        valores = ', '.join(['(%s, %s, 0, %s)'] * len(lote))
+        params = [valor for producto_id, area_id in lote for valor in (producto_id, area_id, ahora)]
+        cursor.execute(
+            f'INSERT INTO {tabla} ({producto}, {area}, {cantidad}, {fecha}) VALUES {valores} '
+            f'ON CONFLICT ({producto}, {area}) DO NOTHING',
+            params,
+        )
+    for lote in _lotes(sorted(set(entradas) | set(salidas))):
+        valores = ', '.join(['(%s, %s)'] * len(lote))
+        cursor.execute(
+            f'SELECT {pk} FROM {tabla} WHERE ({producto}, {area}) IN (VALUES {valores}) '
+            f'ORDER BY {producto}, {area} FOR UPDATE',
+            [valor for clave in lote for valor in clave],
+        )
+
+
+def _sumar_en_bloque(cursor, entradas, ahora, saldos):
+    """Suma cantidades con un upsert multi-fila sobre `(producto, area)`.
+
+    `entradas` mapea `(producto_id, area_id)` al total a sumar; al venir ya agrupado
+    cada fila aparece una sola vez por sentencia, como exige ON CONFLICT.
+    """
+    tabla, producto, area, cantidad, fecha = _columnas(
+        Stock, 'producto', 'area', 'cantidad', 'fecha_actualizacion'
+    )
+    for lote in _lotes(sorted(entradas.items())):
+        valores = ', '.join(['(%s, %s, %s, %s)'] * len(lote))
+        params = []
+        for (producto_id, area_id), delta in lote:
+            params.extend([producto_id, area_id, delta, ahora])
+        cursor.execute(
+            f'INSERT INTO {tabla} ({producto}, {area}, {cantidad}, {fecha}) VALUES {valores} '
+            f'ON CONFLICT ({producto}, {area}) DO UPDATE SET '
+            f'{cantidad} = {tabla}.{cantidad} + EXCLUDED.{cantidad}, {fecha} = EXCLUDED.{fecha} '
+            f'RETURNING {producto}, {area}, {cantidad}',
+            params,
+        )
+        for producto_id, area_id, saldo in cursor.fetchall():
+            saldos[(producto_id, area_id)] = _decimal(saldo)
+
+
+def _restar(cursor, salidas, ahora, saldos, referencias):
+    """Descuenta cada `(producto, area)` solo si el saldo alcanza (UPDATE condicional)"""
+    tabla, producto, area, cantidad, fecha = _columnas(
+        Stock, 'producto', 'area', 'cantidad', 'fecha_actualizacion'
+    )
+    sql = (
+        f'UPDATE {tabla} SET {cantidad} = {cantidad} - %s, {fecha} = %s '
+        f'WHERE {producto} = %s AND {area} = %s AND {cantidad} >= %s '
+        f'RETURNING {cantidad}'
+    )
+    for (producto_id, area_id), delta in sorted(salidas.items()):
+        cursor.execute(sql, [delta, ahora, producto_id, area_id, delta])
+        fila = cursor.fetchone()
+        if fila is None:
+            raise StockInsuficiente(*referencias[(producto_id, area_id)])
+        saldos[(producto_id, area_id)] = _decimal(fila[0])
+
+
+def _actualizar_totales(cursor, productos, deltas):
+    """Suma el delta neto de cada producto a sus totales desnormalizados (una sentencia por lote)"""
+    tabla, total, valor, precio = _columnas(Producto, 'stock_total', 'valor_stock', 'precio_unitario')
+    pk = connection.ops.quote_name(Producto._meta.pk.column)
+    deltas = [(producto_id, delta) for producto_id, delta in sorted(deltas.items()) if delta]
+    for lote in _lotes(deltas):
+        valores = ', '.join(['(%s, CAST(%s AS NUMERIC))'] * len(lote))
+        params = [valor for fila in lote for valor in fila]
+        cursor.execute(
+            f'UPDATE {tabla} SET {total} = {total} + v.column2, '
+            f'{valor} = ({total} + v.column2) * COALESCE({precio}, 0) '
+            f'FROM (VALUES {valores}) AS v WHERE {tabla}.{pk} = v.column1 '
+            f'RETURNING {tabla}.{pk}, {tabla}.{total}, {tabla}.{valor}',
+            params,
+        )
+        for producto_id, nuevo_total, nuevo_valor in cursor.fetchall():
+            for producto in productos[producto_id]:
+                producto.stock_total = _decimal(nuevo_total)
+                producto.valor_stock = _decimal(nuevo_valor)
+
+
+def apply_movements(movimientos):
+    """Aplica una lista de movimientos (instancias de `Movimiento` sin guardar).
+
+    Cada movimiento descuenta `cantidad` de `area_origen` (si tiene) y la suma en
+    `area_destino` (si tiene). Las cantidades se agrupan por `(producto, area)` y
+    antes de modificar nada se bloquean todas esas filas en un único orden; luego
+    todas las entradas se aplican con un upsert multi-fila y cada salida con un
+    UPDATE condicional que solo descuenta si hay saldo suficiente. Si algún origen
+    no alcanza se lanza `StockInsuficiente` y no se aplica nada. Los totales de
+    producto se actualizan en una sola sentencia (también en las instancias de
+    `movimiento.producto`) y los movimientos se guardan con un único
+    `bulk_create`, quedando con `saldo_origen` / `saldo_destino` (saldo de la fila
+    tras aplicar el lote completo).
+    """
+    movimientos = list(movimientos)
+    if not movimientos:
+        return []
+
+    entradas = {}
+    salidas = {}
+    deltas = {}
+    productos = {}
+    referencias = {}
+    for movimiento in movimientos:
+        producto_id = movimiento.producto_id
+        productos.setdefault(producto_id, []).append(movimiento.producto)
+        deltas.setdefault(producto_id, Decimal('0'))
+        if movimiento.area_origen_id:
+            clave = (producto_id, movimiento.area_origen_id)
+            salidas[clave] = salidas.get(clave, Decimal('0')) + movimiento.cantidad
+            referencias[clave] = (movimiento.producto, movimiento.area_origen)
+            deltas[producto_id] -= movimiento.cantidad
+        if movimiento.area_destino_id:
+            clave = (producto_id, movimiento.area_destino_id)
+            entradas[clave] = entradas.get(clave, Decimal('0')) + movimiento.cantidad
+            deltas[producto_id] += movimiento.cantidad
+
+    ahora = connection.ops.adapt_datetimefield_value(timezone.now())
+    saldos = {}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            _bloquear(cursor, entradas, salidas, ahora)
+            # Entradas primero: un lote que recibe y despacha la misma fila no falla a medio camino
+            _sumar_en_bloque(cursor, entradas, ahora, saldos)
+            _restar(cursor, salidas, ahora, saldos, referencias)
+            _actualizar_totales(cursor, productos, deltas)
+        # Alertas generales solo de productos cuyo total cambió; por área, de todos los
+        # tocados (una transferencia mueve saldos sin cambiar el total)
+        evaluar_alertas_generales([producto_id for producto_id, delta in deltas.items() if delta])
+        evaluar_alertas_por_area(list(productos))
+
+        for movimiento in movimientos:
+            movimiento.saldo_origen = saldos.get((movimiento.producto_id, movimiento.area_origen_id))
+            movimiento.saldo_destino = saldos.get((movimiento.producto_id, movimiento.area_destino_id))
+        Movimiento.objects.bulk_create(movimientos)
+        incrementar_version()
+    return movimientos
+
+
+def apply_movement(**campos):
+    """Registra un único movimiento y aplica su efecto sobre el stock.
+
+    Recibe los mismos campos que `Movimiento` y devuelve la instancia guardada
+    con el saldo resultante en `saldo_origen` / `saldo_destino`.
+    """
+    return apply_movements([Movimiento(**campos)])[0]
+
+
+def recalcular_valor_stock(producto):
+    """Recalcula `valor_stock` tras un cambio de precio del producto"""
+    Producto.objects.filter(pk=producto.pk).update(valor_stock=_valor(F('stock_total')))
+
+
+def _total_real():
+    """Subconsulta con la suma de `Stock.cantidad` del producto externo"""
+    return Coalesce(
+        Subquery(
+            Stock.objects.filter(producto=OuterRef('pk')).order_by().values('producto').annotate(
+                total=Sum('cantidad')
+            ).values('total')[:1]
+        ),
+        CERO,
+    )
+
+
+def recalcular_totales(productos=None):
+    """Reconstruye en bloque los totales desnormalizados desde la tabla `Stock`.
+
+    `productos` puede ser un queryset o lista de ids; por defecto se recalculan
+    todos. Se resuelve con un único UPDATE y luego se reevalúan las alertas de esos
+    productos. Devuelve la cantidad de productos tocados.
+    """
+    queryset = Producto.objects.all()
+    if productos is not None:
+        queryset = queryset.filter(pk__in=productos)
+    actualizados = queryset.update(
+        stock_total=_total_real(),
+        valor_stock=_valor(_total_real()),
+    )
+    evaluar_alertas(productos)
+    incrementar_version()
+    return actualizados
+
+
+def productos_desincronizados():
+    """Productos cuyo `stock_total` o `valor_stock` guardado no coincide con la suma real de `Stock`"""
+    # El valor se compara en centavos: SQLite no redondea los decimales al guardarlos
+    return Producto.objects.annotate(
+        stock_total_real=_total_real(),
+        valor_stock_real=Round(_valor(F('stock_total_real')), 2),
+    ).filter(
+        ~Q(stock_total=F('stock_total_real')) | ~Q(valor_stock_real=Round('valor_stock', 2))
+    ).order_by('codigo')
@@ -0,0 +1,38 @@
+"""Versión de los datos del inventario.
+
+`VersionInventario` es una sola fila cuyo contador avanza con un UPDATE atómico
+que corre recién cuando confirma la transacción que modificó el inventario
+(`transaction.on_commit`). Así la fila del contador no queda bloqueada mientras
+dura cada escritura de stock: dos movimientos de productos o áreas distintos no
+se esperan entre sí por ella.
+
+Como el contador avanza después de que los cambios son visibles y los reportes
+leen la versión antes que los datos (ver reportes/services/cola.py), un reporte
+guardado con la versión N nunca contiene datos más viejos que N.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import VersionInventario
+
+
+def _incrementar():
+    actualizadas = VersionInventario.objects.filter(pk=1).update(
+        version=F('version') + 1, fecha_actualizacion=timezone.now()
+    )
+    if not actualizadas:
+        VersionInventario.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+def incrementar_version():
+    """Incrementa la versión al confirmar la transacción en curso (o de inmediato fuera de una).
+
+    Si la transacción se revierte no se incrementa. El UPDATE corre en su propia
+    transacción corta, así que solo bloquea la fila mientras se ejecuta.
+    """
+    transaction.on_commit(_incrementar)
+
+
+def version_actual():
+    return VersionInventario.objects.filter(pk=1).values_list('version', flat=True).first() or 0
@@ -1,3 +1,1176 @@
-from django.test import TestCase
+import base64
+import io
+import json
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .models import Area, Categoria, Movimiento, Producto, Stock
+from .paginacion import CursorInvalido
+from .services.listado import ListadoProductos
+from .services.stock import recalcular_totales
+
+
+class ServicioStockTests(TestCase):
+    """Los movimientos se aplican en bloque y un origen sin saldo revierte el lote completo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .services.stock import apply_movements
+
+        cls.usuario = User.objects.create_user('almacen', password='clave')
+        categoria = Categoria.objects.create(nombre='Conservas de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega conservas', tipo='BODEGA')
+        cls.cocina = Area.objects.create(nombre='Cocina conservas', tipo='COCINA')
+        cls.atun, cls.choclo = [
+            Producto.objects.create(
+                codigo=f'CON-{i:03d}', nombre=nombre, categoria=categoria,
+                unidad_medida='UN', stock_minimo=Decimal('1'), precio_unitario=Decimal('500'),
+            )
+            for i, nombre in enumerate(['Atún', 'Choclo'])
+        ]
+        apply_movements([
+            cls.movimiento(producto, 'ENTRADA', 'INICIAL', '10', destino=cls.bodega)
+            for producto in (cls.atun, cls.choclo)
+        ])
+
+    @classmethod
+    def movimiento(cls, producto, tipo, motivo, cantidad, origen=None, destino=None):
+        return Movimiento(
+            producto=producto, tipo=tipo, motivo=motivo, cantidad=Decimal(cantidad),
+            area_origen=origen, area_destino=destino, usuario=cls.usuario,
+        )
+
+    def foto(self):
+        return (
+            sorted(Stock.objects.values_list('producto_id', 'area_id', 'cantidad')),
+            sorted(Producto.objects.values_list('pk', 'stock_total', 'valor_stock')),
+            Movimiento.objects.count(),
+        )
+
+    def test_stock_insuficiente(self):
+        from .services.stock import StockInsuficiente, apply_movement
+
+        antes = self.foto()
+        with self.assertRaises(StockInsuficiente) as contexto:
+            apply_movement(
+                producto=self.atun, tipo='SALIDA', motivo='CONSUMO', cantidad=Decimal('10.01'),
+                area_origen=self.bodega, usuario=self.usuario,
+            )
+        self.assertEqual((contexto.exception.producto, contexto.exception.area), (self.atun, self.bodega))
+        self.assertEqual(self.foto(), antes)
+
+    def test_un_origen_sin_saldo_revierte_todo_el_lote(self):
+        from .services.stock import StockInsuficiente, apply_movements
+
+        antes = self.foto()
+        with self.assertRaises(StockInsuficiente) as contexto:
+            apply_movements([
+                self.movimiento(self.atun, 'TRANSFERENCIA', 'TRANSFERENCIA', '4', origen=self.bodega, destino=self.cocina),
+                self.movimiento(self.atun, 'ENTRADA', 'COMPRA', '5', destino=self.bodega),
+                self.movimiento(self.choclo, 'SALIDA', 'CONSUMO', '11', origen=self.bodega),
+            ])
+        self.assertEqual(contexto.exception.producto, self.choclo)
+        self.assertEqual(self.foto(), antes)
+        self.assertFalse(Stock.objects.filter(area=self.cocina).exists())
+
+    def test_lineas_del_mismo_par_se_agrupan(self):
+        from .services.stock import StockInsuficiente, apply_movements
+
+        # Las tres salidas de la bodega se descuentan juntas (3 + 4 + 3) en un solo UPDATE
+        movimientos = apply_movements([
+            self.movimiento(self.atun, 'SALIDA', 'CONSUMO', '3', origen=self.bodega),
+            self.movimiento(self.atun, 'TRANSFERENCIA', 'TRANSFERENCIA', '4', origen=self.bodega, destino=self.cocina),
+            self.movimiento(self.atun, 'SALIDA', 'CONSUMO', '3', origen=self.bodega),
+            self.movimiento(self.atun, 'ENTRADA', 'COMPRA', '2', destino=self.cocina),
+        ])
+        self.assertEqual(Stock.objects.get(producto=self.atun, area=self.bodega).cantidad, Decimal('0'))
+        self.assertEqual(Stock.objects.get(producto=self.atun, area=self.cocina).cantidad, Decimal('6'))
+        self.atun.refresh_from_db()
+        self.assertEqual((self.atun.stock_total, self.atun.valor_stock), (Decimal('6'), Decimal('3000')))
+        # Cada movimiento queda con el saldo de su fila tras el lote completo, no tras su línea
+        self.assertEqual([m.saldo_origen for m in movimientos], [Decimal('0')] * 3 + [None])
+        self.assertEqual(Movimiento.objects.filter(producto=self.atun).count(), 5)
+
+        # Cada salida alcanza por sí sola, pero su suma no
+        with self.assertRaises(StockInsuficiente):
+            apply_movements([
+                self.movimiento(self.atun, 'SALIDA', 'CONSUMO', '4', origen=self.cocina),
+                self.movimiento(self.atun, 'SALIDA', 'CONSUMO', '3', origen=self.cocina),
+            ])
+        self.assertEqual(Stock.objects.get(producto=self.atun, area=self.cocina).cantidad, Decimal('6'))
+
+    def test_totales_en_memoria(self):
+        from .services.stock import apply_movement
+
+        movimiento = apply_movement(
+            producto=self.atun, tipo='ENTRADA', motivo='COMPRA', cantidad=Decimal('2.5'),
+            area_destino=self.cocina, usuario=self.usuario,
+        )
+        self.assertEqual(
+            (movimiento.producto.stock_total, movimiento.producto.valor_stock), (Decimal('12.5'), Decimal('6250'))
+        )
+        self.atun.refresh_from_db()
+        self.assertEqual((self.atun.stock_total, self.atun.valor_stock), (Decimal('12.5'), Decimal('6250')))
+
+
+class ListadoProductosTests(TestCase):
+    """El listado de productos cuesta las mismas consultas sin importar el tamaño de la página"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('bodega', password='clave')
+        categoria = Categoria.objects.create(nombre='Bebidas de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega', tipo='BODEGA')
+        cls.bar = Area.objects.create(nombre='Bar', tipo='BAR')
+        stocks = []
+        for i in range(30):
+            producto = Producto.objects.create(
+                codigo=f'BEB-{i:03d}', nombre=f'Bebida {i}', categoria=categoria,
+                unidad_medida='BOT', stock_minimo=Decimal('5'), precio_unitario=Decimal('100'),
+            )
+            stocks.append(Stock(producto=producto, area=cls.bodega, cantidad=Decimal(i)))
+            stocks.append(Stock(producto=producto, area=cls.bar, cantidad=Decimal('2')))
+        Stock.objects.bulk_create(stocks)
+        recalcular_totales()
+
+    def test_consultas_fijas_por_pagina(self):
+        for por_pagina in (1, 10, 30):
+            listado = ListadoProductos(orden='codigo')
+            with self.assertNumQueries(3):
+                page_obj, filas = listado.pagina(1, por_pagina=por_pagina)
+                for fila in filas:
+                    [area.area.nombre for area in fila.areas]
+            self.assertEqual(len(filas), por_pagina)
+
+    def test_total_y_desglose_por_area(self):
+        _, filas = ListadoProductos(busqueda='BEB-000').pagina(1)
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0].stock_total, Decimal('2'))
+        self.assertEqual([a.area for a in filas[0].areas], [self.bar])
+        self.assertTrue(filas[0].stock_bajo)
+
+        _, filas = ListadoProductos(busqueda='BEB-010').pagina(1)
+        self.assertEqual(filas[0].stock_total, filas[0].producto.stock_total)
+        self.assertEqual([a.area for a in filas[0].areas], [self.bar, self.bodega])
+
+    def test_filtro_por_area_no_duplica(self):
+        page_obj, filas = ListadoProductos(area=self.bar.pk, orden='codigo').pagina(1, por_pagina=50)
+        self.assertEqual(page_obj.paginator.count, 30)
+        self.assertEqual(len({fila.producto.pk for fila in filas}), 30)
+
+    def test_cursor_recorre_todo_el_listado(self):
+        for orden in ListadoProductos.ORDENES:
+            listado = ListadoProductos(orden=orden)
+            esperado = [p.pk for p in listado.queryset()]
+            vistos, paginas, despues = [], [], None
+            while True:
+                with self.assertNumQueries(2):
+                    pagina, filas = listado.pagina_cursor(despues=despues, por_pagina=7, contar=False)
+                vistos.extend(fila.producto.pk for fila in filas)
+                paginas.append(pagina)
+                if not pagina.tiene_siguiente:
+                    break
+                despues = pagina.siguiente
+            self.assertEqual(vistos, esperado, orden)
+
+            # Volver hacia atrás desde la última página entrega las mismas páginas
+            anterior, filas = listado.pagina_cursor(antes=paginas[-1].anterior, por_pagina=7, contar=False)
+            self.assertEqual([f.producto.pk for f in filas], [p.pk for p in paginas[-2]])
+
+    def test_cursor_invalido(self):
+        with self.assertRaises(CursorInvalido):
+            ListadoProductos().pagina_cursor(despues='no-es-un-cursor')
+        # Bien formado pero con valores que no corresponden al tipo de cada columna
+        cursor = base64.urlsafe_b64encode(json.dumps(['a', 'b', 'zz']).encode()).decode()
+        with self.assertRaises(CursorInvalido):
+            ListadoProductos().pagina_cursor(despues=cursor)
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(reverse('inventario:productos'), {'despues': cursor}).status_code, 200)
+
+    def test_vista_consultas_fijas(self):
+        self.client.force_login(self.usuario)
+        url = reverse('inventario:productos')
+        cursor = ListadoProductos().pagina_cursor()[0].siguiente
+        consultas = []
+        for parametros in ({}, {'despues': cursor}, {'stock': 'bajo'}, {'area': self.bodega.pk, 'orden': '-stock_total'}):
+            with self.assertNumQueries(7) as contexto:
+                respuesta = self.client.get(url, parametros)
+            self.assertEqual(respuesta.status_code, 200)
+            consultas.append(len(contexto.captured_queries))
+        self.assertEqual(len(set(consultas)), 1)
+
+
+class ApiMovimientosTests(TestCase):
+    """El historial de movimientos pagina por cursor sobre (-fecha, -id)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('auditor', password='clave')
+        categoria = Categoria.objects.create(nombre='Limpieza de prueba')
+        cls.area = Area.objects.create(nombre='Bodega', tipo='BODEGA')
+        cls.producto = Producto.objects.create(
+            codigo='LIM-001', nombre='Detergente', categoria=categoria, unidad_medida='LT',
+            stock_minimo=Decimal('1'),
+        )
+        Movimiento.objects.bulk_create([
+            Movimiento(producto=cls.producto, area_destino=cls.area, tipo='ENTRADA', motivo='COMPRA',
+                       cantidad=Decimal(i + 1), usuario=cls.usuario)
+            for i in range(25)
+        ])
+
+    def test_recorre_paginas_sin_conteo(self):
+        self.client.force_login(self.usuario)
+        url = reverse('inventario:api_movimientos')
+        ids, parametros = [], {'producto': self.producto.pk, 'por_pagina': 10}
+        while True:
+            datos = self.client.get(url, parametros).json()
+            self.assertIsNone(datos['total'])
+            ids.extend(m['id'] for m in datos['resultados'])
+            if not datos['siguiente']:
+                break
+            parametros['despues'] = datos['siguiente']
+        self.assertEqual(ids, list(Movimiento.objects.order_by('-fecha', '-id').values_list('id', flat=True)))
+
+        datos = self.client.get(url, {'contar': '1', 'tipo': 'ENTRADA'}).json()
+        self.assertEqual(datos['total'], 25)
+        self.assertEqual(self.client.get(url, {'despues': 'xx'}).status_code, 400)
+        cursor = base64.urlsafe_b64encode(json.dumps(['nope', 'x']).encode()).decode()
+        self.assertEqual(self.client.get(url, {'despues': cursor}).status_code, 400)
+
+
+class BusquedaProductosTests(TestCase):
+    """Búsqueda de productos (en SQLite se usa el respaldo con icontains)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cocina', password='clave')
+        categoria = Categoria.objects.create(nombre='Despensa de prueba')
+        datos = [
+            ('ALM-010', 'Azúcar granulada 1kg', 'Bolsa de azúcar blanca'),
+            ('ALM-011', 'Harina sin polvos', 'Harina de trigo'),
+            ('AZU-001', 'Endulzante', 'Reemplazo de azúcar'),
+        ]
+        for codigo, nombre, descripcion in datos:
+            Producto.objects.create(
+                codigo=codigo, nombre=nombre, descripcion=descripcion, categoria=categoria,
+                unidad_medida='KG', stock_minimo=Decimal('1'),
+            )
+
+    def test_todos_los_terminos_deben_coincidir(self):
+        from .services.busqueda import buscar_productos
+
+        encontrados = buscar_productos(Producto.objects.all(), 'harina trigo')
+        self.assertEqual([p.codigo for p in encontrados], ['ALM-011'])
+        self.assertEqual(buscar_productos(Producto.objects.all(), '  ').count(), Producto.objects.count())
+
+    def test_autocompletado_prioriza_codigo(self):
+        self.client.force_login(self.usuario)
+        datos = self.client.get(reverse('inventario:api_buscar_productos'), {'q': 'azu'}).json()
+        self.assertEqual(datos['resultados'][0]['codigo'], 'AZU-001')
+        self.assertEqual(self.client.get(reverse('inventario:api_buscar_productos')).json(), {'resultados': []})
+
+
+class AlertasStockTests(TestCase):
+    """Las alertas se abren y resuelven con los movimientos; la página solo lee"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('alertas', password='clave')
+        categoria = Categoria.objects.create(nombre='Lácteos de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega lácteos', tipo='BODEGA')
+        cls.producto = Producto.objects.create(
+            codigo='LAC-001', nombre='Leche', categoria=categoria,
+            unidad_medida='LT', stock_minimo=Decimal('10'),
+        )
+
+    def _mover(self, tipo, cantidad):
+        from .services.stock import apply_movement
+
+        campos = {'area_destino': self.bodega} if tipo == 'ENTRADA' else {'area_origen': self.bodega}
+        apply_movement(
+            producto=self.producto, tipo=tipo, motivo='COMPRA' if tipo == 'ENTRADA' else 'CONSUMO',
+            cantidad=Decimal(cantidad), usuario=self.usuario, **campos,
+        )
+
+    def test_movimientos_abren_y_resuelven(self):
+        from .models import AlertaStock
+
+        # Un producto nuevo sin stock ya queda en alerta
+        self.assertEqual(AlertaStock.objects.get().estado, 'ACTIVA')
+        self._mover('ENTRADA', '20')
+        self.assertFalse(AlertaStock.objects.filter(estado='ACTIVA').exists())
+        self._mover('SALIDA', '15')
+        alerta = AlertaStock.objects.get(estado='ACTIVA')
+        self.assertEqual(alerta.stock_actual, Decimal('5'))
+        self._mover('SALIDA', '3')
+        alerta.refresh_from_db()
+        self.assertEqual(alerta.stock_actual, Decimal('2'))
+        self._mover('ENTRADA', '30')
+        alerta.refresh_from_db()
+        self.assertEqual(alerta.estado, 'RESUELTA')
+        self.assertEqual(AlertaStock.objects.count(), 2)
+
+    def test_pagina_de_alertas_no_escribe(self):
+        self._mover('ENTRADA', '1')
+        self.client.force_login(self.usuario)
+        with self.assertNumQueries(3):
+            respuesta = self.client.get(reverse('inventario:alertas'))
+        self.assertEqual(len(respuesta.context['alertas']), 1)
+        self.assertTrue(respuesta.context['alertas'][0]['critico'])  # 1 de 10: menos de la mitad
+
+        # Una alerta con mínimo 0 cuenta como crítica
+        from .models import AlertaStock
+
+        AlertaStock.objects.update(stock_minimo=Decimal('0'), stock_actual=Decimal('1'))
+        self.assertTrue(self.client.get(reverse('inventario:alertas')).context['alertas'][0]['critico'])
+
+    def test_alertas_por_area(self):
+        from .models import AlertaStock, MinimoArea
+
+        bar = Area.objects.create(nombre='Bar lácteos', tipo='BAR')
+        self._mover('ENTRADA', '50')
+        MinimoArea.objects.create(producto=self.producto, area=bar, stock_minimo=Decimal('4'))
+        # Sin fila de stock en el bar cuenta como saldo 0
+        alerta = AlertaStock.objects.get(estado='ACTIVA')
+        self.assertEqual((alerta.area, alerta.stock_actual), (bar, Decimal('0')))
+
+        from .services.stock import apply_movement
+
+        apply_movement(
+            producto=self.producto, area_origen=self.bodega, area_destino=bar, tipo='TRANSFERENCIA',
+            motivo='TRANSFERENCIA', cantidad=Decimal('6'), usuario=self.usuario,
+        )
+        alerta.refresh_from_db()
+        self.assertEqual((alerta.estado, alerta.stock_actual), ('RESUELTA', Decimal('6')))
+        self.assertFalse(AlertaStock.objects.filter(estado='ACTIVA').exists())
+
+
+class ReporteProductosStockTests(TestCase):
+    """Exportación del reporte de productos con stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('reportes', password='clave')
+        categoria = Categoria.objects.create(nombre='Limpieza de prueba')
+        bodega = Area.objects.create(nombre='Bodega limpieza', tipo='BODEGA')
+        bar = Area.objects.create(nombre='Bar limpieza', tipo='BAR')
+        stocks = []
+        for i in range(25):
+            producto = Producto.objects.create(
+                codigo=f'LIM-{i:03d}', nombre=f'Detergente {i}', categoria=categoria,
+                unidad_medida='UN', stock_minimo=Decimal('1'), precio_unitario=Decimal('1500'),
+            )
+            stocks.append(Stock(producto=producto, area=bodega, cantidad=Decimal(i)))
+            stocks.append(Stock(producto=producto, area=bar, cantidad=Decimal('1')))
+        Stock.objects.bulk_create(stocks)
+        recalcular_totales()
+
+    def test_csv_en_streaming_con_consultas_por_bloque(self):
+        from .services.exportacion import filas_productos_stock
+
+        # Una consulta de productos y una de stock por bloque de 10
+        with self.assertNumQueries(4):
+            filas = list(filas_productos_stock(tamano_bloque=10))
+        self.assertEqual(len(filas), 25)
+        self.assertEqual(filas[0][-1], 'Bar limpieza:1.00')
+        self.assertEqual(filas[1][-1], 'Bar limpieza:1.00; Bodega limpieza:1.00')
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('inventario:reporte_productos_stock'))
+        self.assertTrue(respuesta.streaming)
+        lineas = b''.join(respuesta.streaming_content).decode().splitlines()
+        self.assertEqual(len(lineas), 26)
+        self.assertTrue(lineas[1].startswith(f'{filas[0][0]},LIM-000,Detergente 0,'))
+
+    def test_excel_con_celdas_numericas(self):
+        import io
+
+        import openpyxl
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('inventario:reporte_productos_stock'), {'formato': 'excel'})
+        self.assertIn('productos_con_stock.xlsx', respuesta['Content-Disposition'])
+        hoja = openpyxl.load_workbook(io.BytesIO(b''.join(respuesta.streaming_content))).active
+        filas = list(hoja.iter_rows(values_only=True))
+        self.assertEqual(len(filas), 26)
+        self.assertEqual(filas[1][1:3], ('LIM-000', 'Detergente 0'))
+        self.assertEqual((filas[2][5], filas[2][6]), (2, 1500))
+
+
+class NumeracionEntradasTests(TestCase):
+    """Las entradas rápidas reservan su número del contador REC"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('recepcion', password='clave')
+        categoria = Categoria.objects.create(nombre='Lácteos de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega lácteos', tipo='BODEGA')
+        cls.producto = Producto.objects.create(
+            codigo='LAC-001', nombre='Leche', categoria=categoria,
+            unidad_medida='LT', stock_minimo=Decimal('1'), precio_unitario=Decimal('990'),
+        )
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_numeros_correlativos_y_vista_previa_sin_consultas(self):
+        from .models import ContadorDocumento, EntradaStock
+        from .services.numeracion import vista_previa
+
+        ContadorDocumento.objects.create(serie='REC', ultimo=7)
+        self.assertEqual(vista_previa('REC'), 'REC-0008')
+        datos = {'producto_id': self.producto.pk, 'area': self.bodega.pk, 'cantidad': '3'}
+        for _ in range(2):
+            self.client.post(reverse('inventario:entrada_stock'), datos)
+
+        numeros = list(EntradaStock.objects.order_by('pk').values_list('numero_entrada', flat=True))
+        self.assertEqual(numeros, ['REC-0008', 'REC-0009'])
+        with self.assertNumQueries(0):
+            self.assertEqual(vista_previa('REC'), 'REC-0010')
+
+
+class ImportacionEntradasTests(TestCase):
+    """La importación informa las filas inválidas sin detener el resto del archivo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('importador', password='clave')
+        categoria = Categoria.objects.create(nombre='Abarrotes de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega abarrotes', tipo='BODEGA')
+        cls.arroz = Producto.objects.create(
+            codigo='ABA-001', nombre='Arroz', categoria=categoria,
+            unidad_medida='KG', stock_minimo=Decimal('1'), precio_unitario=Decimal('1200'),
+        )
+        cls.azucar = Producto.objects.create(
+            codigo='ABA-002', nombre='Azúcar', categoria=categoria,
+            unidad_medida='KG', stock_minimo=Decimal('1'), precio_unitario=Decimal('900'),
+        )
+
+    def importar(self, contenido, **opciones):
+        import io
+
+        from .services.importacion import importar_entradas
+
+        return importar_entradas(io.BytesIO(contenido.encode()), self.usuario, nombre='archivo.csv', **opciones)
+
+    def test_facturas_validas(self):
+        resultado = self.importar(
+            'numero;codigo;area;cantidad;precio_unitario\n'
+            'F-1;ABA-001;Bodega abarrotes;10;1.150,50\n'
+            'F-1;ABA-002;Bodega abarrotes;5,5;\n'
+            'F-2;ABA-001;Bodega abarrotes;2;1100\n'
+        )
+        self.assertEqual(resultado.errores, [])
+        self.assertEqual((resultado.filas_importadas, resultado.documentos, resultado.movimientos), (3, 2, 3))
+        self.assertEqual(Stock.objects.get(producto=self.arroz, area=self.bodega).cantidad, Decimal('12'))
+        self.assertEqual(Stock.objects.get(producto=self.azucar, area=self.bodega).cantidad, Decimal('5.5'))
+
+    def test_numeros_invalidos_son_errores_de_fila(self):
+        resultado = self.importar(
+            'numero;codigo;area;cantidad;precio_unitario\n'
+            'F-1;ABA-001;Bodega abarrotes;NaN;\n'
+            'F-2;ABA-001;Bodega abarrotes;Infinity;\n'
+            'F-3;ABA-001;Bodega abarrotes;1e20;\n'
+            'F-4;ABA-001;Bodega abarrotes;1.005;\n'
+            'F-5;ABA-001;Bodega abarrotes;1;sNaN\n'
+            'F-6;ABA-001;Bodega abarrotes;1;123456789\n'
+            'F-7;ABA-002;Bodega abarrotes;4;\n'
+        )
+        self.assertEqual([fila for fila, mensaje in resultado.errores if 'omitida' not in mensaje], [2, 3, 4, 5, 6, 7])
+        self.assertEqual((resultado.filas_importadas, resultado.documentos), (1, 1))
+        self.assertEqual(Stock.objects.get(producto=self.azucar, area=self.bodega).cantidad, Decimal('4'))
+        self.assertFalse(Stock.objects.filter(producto=self.arroz).exists())
+
+    def test_conteo_ajusta_a_lo_contado(self):
+        self.importar('numero;codigo;area;cantidad\nF-1;ABA-001;Bodega abarrotes;10\nF-1;ABA-002;Bodega abarrotes;3\n')
+        resultado = self.importar(
+            'codigo;area;cantidad\nABA-001;Bodega abarrotes;7,5\nABA-002;Bodega abarrotes;nan\n',
+            modo='conteo', numero='CONTEO-1',
+        )
+        self.assertEqual([fila for fila, _ in resultado.errores], [3])
+        self.assertEqual((resultado.filas_importadas, resultado.movimientos), (1, 1))
+        self.assertEqual(Stock.objects.get(producto=self.arroz, area=self.bodega).cantidad, Decimal('7.5'))
+        self.assertEqual(Stock.objects.get(producto=self.azucar, area=self.bodega).cantidad, Decimal('3'))
+        ajuste = Movimiento.objects.get(tipo='AJUSTE')
+        self.assertEqual((ajuste.area_origen, ajuste.cantidad), (self.bodega, Decimal('2.5')))
+
+
+class RegistroEntradasTests(TestCase):
+    """Las facturas se registran con las mismas consultas sin importar cuántas líneas tengan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('recepcion', password='clave')
+        categoria = Categoria.objects.create(nombre='Verduras de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega verduras', tipo='BODEGA')
+        cls.cocina = Area.objects.create(nombre='Cocina verduras', tipo='COCINA')
+        cls.productos = [
+            Producto.objects.create(
+                codigo=f'VER-{i:03d}', nombre=f'Verdura {i}', categoria=categoria,
+                unidad_medida='KG', stock_minimo=Decimal('1'), precio_unitario=Decimal('800'),
+            )
+            for i in range(5)
+        ]
+
+    def registrar(self, numero, productos):
+        from datetime import date
+
+        from .models import DetalleEntradaStock, EntradaStock
+        from .services.entradas import registrar_entrada
+
+        entrada = EntradaStock(
+            numero_entrada=numero, tipo='COMPRA', fecha_compra=date.today(), registrado_por=self.usuario,
+        )
+        detalles = [
+            DetalleEntradaStock(
+                producto=producto, area_destino=(self.bodega, self.cocina)[i % 2],
+                cantidad=Decimal(i + 2), precio_unitario=Decimal('750'),
+            )
+            for i, producto in enumerate(productos)
+        ]
+        return entrada, registrar_entrada(entrada, detalles, self.usuario)
+
+    def test_consultas_fijas_por_linea(self):
+        # Cabecera, detalles, upsert de stock, totales, alertas y movimientos: 1 o 4 líneas cuestan lo mismo
+        # (más dos sentencias para bloquear las filas de stock donde hay bloqueo por fila)
+        consultas = 16 if connection.features.has_select_for_update else 14
+        with self.assertNumQueries(consultas):
+            self.registrar('F-1', self.productos[:1])
+        with self.assertNumQueries(consultas):
+            entrada, movimientos = self.registrar('F-2', self.productos[1:])
+
+        self.assertEqual(entrada.detalles.count(), 4)
+        self.assertEqual(
+            [(m.entrada_id, m.detalle_entrada.producto_id, m.saldo_destino) for m in movimientos],
+            [(entrada.pk, p.pk, Decimal(i + 2)) for i, p in enumerate(self.productos[1:])],
+        )
+        self.assertEqual(
+            set(Movimiento.objects.filter(entrada=entrada).values_list('detalle_entrada', flat=True)),
+            set(entrada.detalles.values_list('pk', flat=True)),
+        )
+        self.assertEqual(
+            sorted(Stock.objects.filter(producto__in=self.productos[1:]).values_list(
+                'producto__codigo', 'area', 'cantidad'
+            )),
+            [
+                ('VER-001', self.bodega.pk, Decimal('2')), ('VER-002', self.cocina.pk, Decimal('3')),
+                ('VER-003', self.bodega.pk, Decimal('4')), ('VER-004', self.cocina.pk, Decimal('5')),
+            ],
+        )
+        self.productos[4].refresh_from_db()
+        self.assertEqual(
+            (self.productos[4].stock_total, self.productos[4].valor_stock), (Decimal('5'), Decimal('4000'))
+        )
+
+    def test_vista_ingresar_factura(self):
+        from datetime import date
+
+        from .models import EntradaStock
+
+        lineas = [
+            (self.productos[0], self.bodega, '3'),
+            (self.productos[0], self.cocina, '2'),
+            (self.productos[1], self.bodega, '1.5'),
+        ]
+        datos = {
+            'numero_entrada': '', 'tipo': 'COMPRA', 'proveedor': '', 'fecha_compra': date.today().isoformat(),
+            'total_compra': '', 'observaciones': '',
+            'detalles-TOTAL_FORMS': str(len(lineas)), 'detalles-INITIAL_FORMS': '0',
+            'detalles-MIN_NUM_FORMS': '1', 'detalles-MAX_NUM_FORMS': '1000',
+        }
+        for i, (producto, area, cantidad) in enumerate(lineas):
+            datos.update({
+                f'detalles-{i}-producto': producto.pk, f'detalles-{i}-area_destino': area.pk,
+                f'detalles-{i}-cantidad': cantidad, f'detalles-{i}-precio_unitario': '700',
+            })
+        self.client.force_login(self.usuario)
+        respuesta = self.client.post(reverse('inventario:ingresar_factura'), datos)
+        self.assertRedirects(respuesta, reverse('inventario:productos'), fetch_redirect_response=False)
+
+        entrada = EntradaStock.objects.get()
+        self.assertTrue(entrada.numero_entrada.startswith('FAC'))
+        self.assertEqual(entrada.detalles.count(), 3)
+        movimientos = Movimiento.objects.filter(entrada=entrada).select_related('detalle_entrada')
+        self.assertEqual(len(movimientos), 3)
+        for movimiento in movimientos:
+            detalle = movimiento.detalle_entrada
+            self.assertEqual(
+                (movimiento.producto_id, movimiento.area_destino_id, movimiento.cantidad, detalle.entrada_id),
+                (detalle.producto_id, detalle.area_destino_id, detalle.cantidad, entrada.pk),
+            )
+            self.assertEqual(movimiento.observaciones, f'Entrada factura: {entrada.numero_entrada}')
+        self.assertEqual(Stock.objects.get(producto=self.productos[0], area=self.cocina).cantidad, Decimal('2'))
+        self.productos[0].refresh_from_db()
+        self.productos[1].refresh_from_db()
+        self.assertEqual(self.productos[0].stock_total, Decimal('5'))
+        self.assertEqual(self.productos[1].stock_total, Decimal('1.5'))
+
+
+class VersionInventarioTests(TestCase):
+    """La versión de datos avanza después de confirmar, fuera de la transacción que cambia el stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('versionado', password='clave')
+        categoria = Categoria.objects.create(nombre='Panadería de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega panadería', tipo='BODEGA')
+        cls.pan, cls.harina = [
+            Producto.objects.create(
+                codigo=f'PAN-{i:03d}', nombre=nombre, categoria=categoria,
+                unidad_medida='KG', stock_minimo=Decimal('1'),
+            )
+            for i, nombre in enumerate(['Pan', 'Harina'])
+        ]
+
+    def entrada(self, producto):
+        return Movimiento(
+            producto=producto, area_destino=self.bodega, tipo='ENTRADA', motivo='COMPRA',
+            cantidad=Decimal('5'), usuario=self.usuario,
+        )
+
+    def test_el_contador_no_se_toca_dentro_de_la_transaccion(self):
+        from django.db import connection, transaction
+        from django.test.utils import CaptureQueriesContext
+
+        from .models import VersionInventario
+        from .services.stock import apply_movements
+        from .services.version import version_actual
+
+        inicial = version_actual()
+        tabla = VersionInventario._meta.db_table
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with CaptureQueriesContext(connection) as consultas, transaction.atomic():
+                apply_movements([self.entrada(self.pan)])
+                apply_movements([self.entrada(self.harina)])
+                self.pan.save()
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if tabla in c['sql']])
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(version_actual(), inicial + 3)
+
+        # Una transacción revertida no avanza la versión
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                apply_movements([self.entrada(self.pan)])
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(version_actual(), inicial + 3)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Los bloqueos por fila solo se pueden observar en PostgreSQL')
+class VersionConcurrenteTests(TransactionTestCase):
+    """Dos lotes de movimientos de productos distintos no se esperan por la fila de la versión"""
+
+    def test_lotes_de_productos_distintos_no_se_bloquean(self):
+        import threading
+
+        from django.db import transaction
+
+        from .services.stock import apply_movements
+        from .services.version import version_actual
+
+        usuario = User.objects.create_user('concurrente', password='clave')
+        categoria = Categoria.objects.create(nombre='Concurrencia de prueba')
+        bodega = Area.objects.create(nombre='Bodega concurrente', tipo='BODEGA')
+        uno, dos = [
+            Producto.objects.create(
+                codigo=f'CNC-{i:03d}', nombre=f'Producto {i}', categoria=categoria,
+                unidad_medida='UN', stock_minimo=Decimal('1'),
+            )
+            for i in range(2)
+        ]
+        inicial = version_actual()
+
+        def entrada(producto):
+            return Movimiento(
+                producto=producto, area_destino=bodega, tipo='ENTRADA', motivo='COMPRA',
+                cantidad=Decimal('5'), usuario=usuario,
+            )
+
+        aplicado, terminar, errores = threading.Event(), threading.Event(), []
+
+        def primera_transaccion():
+            try:
+                with transaction.atomic():
+                    apply_movements([entrada(uno)])
+                    aplicado.set()
+                    # Se mantiene abierta mientras la otra transacción escribe
+                    terminar.wait(10)
+            except Exception as e:
+                errores.append(e)
+                aplicado.set()
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=primera_transaccion)
+        hilo.start()
+        try:
+            self.assertTrue(aplicado.wait(10))
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    # Si esperara el bloqueo de la primera transacción fallaría en vez de colgarse
+                    cursor.execute("SET LOCAL lock_timeout = '2s'")
+                apply_movements([entrada(dos)])
+        finally:
+            terminar.set()
+            hilo.join()
+        self.assertEqual(errores, [])
+        self.assertEqual(Stock.objects.filter(area=bodega).count(), 2)
+        self.assertEqual(version_actual(), inicial + 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Los bloqueos por fila solo se pueden observar en PostgreSQL')
+class BloqueoOrdenadoTests(TransactionTestCase):
+    """Un lote bloquea sus filas de stock en orden de (producto, área), entradas y salidas juntas"""
+
+    def test_transferencias_cruzadas_no_se_bloquean_mutuamente(self):
+        import threading
+        import time
+
+        from django.db import transaction
+
+        from .services.stock import apply_movements
+
+        usuario = User.objects.create_user('bloqueos', password='clave')
+        categoria = Categoria.objects.create(nombre='Bloqueos de prueba')
+        bodega = Area.objects.create(nombre='Bodega bloqueos', tipo='BODEGA')
+        cocina = Area.objects.create(nombre='Cocina bloqueos', tipo='COCINA')
+        producto = Producto.objects.create(
+            codigo='BLQ-000', nombre='Harina', categoria=categoria, unidad_medida='KG', stock_minimo=Decimal('1'),
+        )
+        apply_movements([
+            Movimiento(
+                producto=producto, area_destino=area, tipo='ENTRADA', motivo='COMPRA',
+                cantidad=Decimal('10'), usuario=usuario,
+            )
+            for area in (bodega, cocina)
+        ])
+
+        bloqueada, errores = threading.Event(), []
+
+        def otra_transaccion():
+            # Toma la bodega y, mientras el lote la espera, pide la cocina
+            try:
+                with transaction.atomic():
+                    Stock.objects.select_for_update().get(producto=producto, area=bodega)
+                    bloqueada.set()
+                    time.sleep(0.5)
+                    Stock.objects.select_for_update().get(producto=producto, area=cocina)
+            except Exception as e:
+                errores.append(e)
+                bloqueada.set()
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=otra_transaccion)
+        hilo.start()
+        try:
+            self.assertTrue(bloqueada.wait(10))
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '5s'")
+                # Si la cocina (destino) se bloqueara antes que la bodega (origen) habría un deadlock
+                apply_movements([Movimiento(
+                    producto=producto, area_origen=bodega, area_destino=cocina, tipo='TRANSFERENCIA',
+                    motivo='TRANSFERENCIA', cantidad=Decimal('4'), usuario=usuario,
+                )])
+        finally:
+            hilo.join()
+        self.assertEqual(errores, [])
+        self.assertEqual(
+            sorted(Stock.objects.filter(producto=producto).values_list('area__nombre', 'cantidad')),
+            [('Bodega bloqueos', Decimal('6')), ('Cocina bloqueos', Decimal('14'))],
+        )
+
+
+class PronosticoConsumoTests(TestCase):
+    """El pronóstico se calcula de las salidas diarias y reemplaza la tabla completa"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        cls.usuario = User.objects.create_user('planificador', password='clave')
+        categoria = Categoria.objects.create(nombre='Panadería de prueba')
+        cls.cocina = Area.objects.create(nombre='Cocina pan', tipo='COCINA')
+        cls.bar = Area.objects.create(nombre='Bar pan', tipo='BAR')
+        cls.producto = Producto.objects.create(
+            codigo='PAN-001', nombre='Harina', categoria=categoria,
+            unidad_medida='KG', stock_minimo=Decimal('5'), precio_unitario=Decimal('1200'),
+        )
+        Stock.objects.create(producto=cls.producto, area=cls.cocina, cantidad=Decimal('30'))
+        ahora = timezone.now()
+        for dias_atras in range(10):
+            movimiento = Movimiento.objects.create(
+                producto=cls.producto, area_origen=cls.cocina, tipo='SALIDA', motivo='CONSUMO',
+                cantidad=Decimal('2'), usuario=cls.usuario,
+            )
+            Movimiento.objects.filter(pk=movimiento.pk).update(fecha=ahora - timedelta(days=dias_atras))
+
+    def test_consumo_cobertura_y_reemplazo(self):
+        from django.utils import timezone
+
+        from .models import PronosticoConsumo
+        from .services.pronostico import calcular_pronosticos
+
+        obsoleto = PronosticoConsumo.objects.create(
+            producto=self.producto, area=self.bar, promedio_movil=1, consumo_diario=1,
+            consumo_total=1, fecha_calculo=timezone.now(),
+        )
+        resultado = calcular_pronosticos(dias=10, ventana=5)
+
+        self.assertEqual((resultado.pares, resultado.filas, resultado.eliminados), (1, 10, 1))
+        self.assertFalse(PronosticoConsumo.objects.filter(pk=obsoleto.pk).exists())
+        pronostico = PronosticoConsumo.objects.get(producto=self.producto, area=self.cocina)
+        self.assertEqual(pronostico.promedio_movil, Decimal('2.000'))
+        self.assertEqual(pronostico.consumo_diario, Decimal('2.000'))
+        self.assertEqual(pronostico.consumo_total, Decimal('20.00'))
+        self.assertEqual(pronostico.dias_con_consumo, 10)
+        self.assertEqual(pronostico.dias_cobertura, Decimal('15.0'))
+
+    def test_comando_falla_con_argumentos_invalidos(self):
+        from django.core.management import CommandError, call_command
+
+        for argumentos in (['--dias', '0'], ['--ventana', '-1'], ['--alfa', '1.5']):
+            with self.assertRaises(CommandError):
+                call_command('calcular_pronosticos', *argumentos)
+
+
+class SnapshotsStockTests(TestCase):
+    """Las fotos diarias se rellenan desde el libro y `as_of` parte de la más cercana"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from .services.fechas import inicio_del_dia
+        from .services.stock import apply_movement
+
+        cls.usuario = User.objects.create_user('contabilidad', password='clave')
+        categoria = Categoria.objects.create(nombre='Licores de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega licores', tipo='BODEGA')
+        cls.bar = Area.objects.create(nombre='Bar licores', tipo='BAR')
+        cls.producto = Producto.objects.create(
+            codigo='LIC-001', nombre='Pisco', categoria=categoria,
+            unidad_medida='BOT', stock_minimo=Decimal('1'), precio_unitario=Decimal('7990'),
+        )
+        cls.hoy = timezone.localdate()
+        cls.dia = {atras: cls.hoy - timedelta(days=atras) for atras in range(5)}
+        for atras, origen, destino, tipo, cantidad in (
+            (3, None, cls.bodega, 'ENTRADA', '10'),
+            (2, cls.bodega, cls.bar, 'TRANSFERENCIA', '4'),
+            (1, cls.bar, None, 'SALIDA', '1'),
+            (0, cls.bodega, None, 'SALIDA', '2'),
+        ):
+            movimiento = apply_movement(
+                producto=cls.producto, area_origen=origen, area_destino=destino, tipo=tipo,
+                motivo='AJUSTE_INVENTARIO', cantidad=Decimal(cantidad), usuario=cls.usuario,
+            )
+            if atras:
+                Movimiento.objects.filter(pk=movimiento.pk).update(
+                    fecha=inicio_del_dia(cls.dia[atras]) + timedelta(hours=12)
+                )
+
+    def saldos(self, bodega, bar):
+        esperado = {(self.producto.pk, self.bodega.pk): Decimal(bodega), (self.producto.pk, self.bar.pk): Decimal(bar)}
+        return {clave: valor for clave, valor in esperado.items() if valor}
+
+    def test_relleno_y_stock_a_una_fecha(self):
+        from .models import StockSnapshotDiario
+        from .services.snapshots import as_of, generar_snapshots
+
+        # Sin fotos se recorre el libro hacia atrás desde el stock actual
+        self.assertEqual(as_of(self.dia[2]), self.saldos('6', '4'))
+
+        resultado = generar_snapshots(self.dia[3], self.dia[1])
+        self.assertEqual((resultado.dias, resultado.filas), (3, 5))
+        self.assertEqual(StockSnapshotDiario.objects.filter(fecha=self.dia[3]).count(), 1)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(as_of(self.dia[2]), self.saldos('6', '4'))
+        # Antes de la primera foto se resta hacia atrás; después se suma hacia adelante
+        self.assertEqual(as_of(self.dia[4]), {})
+        self.assertEqual(as_of(self.hoy), self.saldos('4', '3'))
+        self.assertEqual(as_of(self.dia[1], areas=[self.bar.pk]), {(self.producto.pk, self.bar.pk): Decimal('3')})
+
+    def test_comando_falla_con_fechas_invalidas(self):
+        from django.core.management import CommandError, call_command
+
+        # Un día sin cerrar, o un rango invertido
+        for argumentos in (
+            ['--hasta', self.hoy.isoformat()],
+            ['--desde', self.dia[1].isoformat(), '--hasta', self.dia[2].isoformat()],
+        ):
+            with self.assertRaises(CommandError):
+                call_command('generar_snapshots', *argumentos)
+
+
+class LibroMovimientosTests(TestCase):
+    """El verificador reproduce el libro, informa las derivas y reconstruye el stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .services.stock import apply_movement
+
+        cls.usuario = User.objects.create_superuser('auditoria', password='clave')
+        categoria = Categoria.objects.create(nombre='Conservas de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega conservas', tipo='BODEGA')
+        cls.productos = [
+            Producto.objects.create(
+                codigo=f'CON-{i:03d}', nombre=f'Conserva {i}', categoria=categoria,
+                unidad_medida='UN', stock_minimo=Decimal('1'), precio_unitario=Decimal('1000'),
+            )
+            for i in range(4)
+        ]
+        cuadrado, sin_libro, editado, sin_stock = cls.productos
+        for producto in (cuadrado, editado):
+            apply_movement(
+                producto=producto, area_destino=cls.bodega, tipo='ENTRADA', motivo='COMPRA',
+                cantidad=Decimal('3'), usuario=cls.usuario,
+            )
+        # Derivas: stock escrito sin movimiento, stock editado por fuera y una salida sin stock
+        Stock.objects.create(producto=sin_libro, area=cls.bodega, cantidad=Decimal('5'))
+        Stock.objects.filter(producto=editado).update(cantidad=Decimal('7'))
+        Movimiento.objects.create(
+            producto=sin_stock, area_origen=cls.bodega, tipo='SALIDA', motivo='CONSUMO',
+            cantidad=Decimal('2'), usuario=cls.usuario,
+        )
+
+    def test_verifica_y_reconstruye(self):
+        from .services.libro import verificar_libro
+
+        resultado = verificar_libro()
+        self.assertEqual((resultado.movimientos, resultado.derivas, resultado.negativos), (3, 3, 1))
+        self.assertEqual(resultado.corregidos, 0)
+        self.assertEqual(
+            {(d.producto_id, d.libro, d.stock) for d in resultado.ejemplos},
+            {
+                (self.productos[1].pk, Decimal('0'), Decimal('5')),
+                (self.productos[2].pk, Decimal('3'), Decimal('7')),
+                (self.productos[3].pk, Decimal('-2'), Decimal('0')),
+            },
+        )
+
+        self.assertEqual(verificar_libro(reconstruir=True).corregidos, 2)
+        cantidades = dict(Stock.objects.values_list('producto_id', 'cantidad'))
+        self.assertEqual(cantidades[self.productos[1].pk], Decimal('0'))
+        self.assertEqual(cantidades[self.productos[2].pk], Decimal('3'))
+        self.productos[2].refresh_from_db()
+        self.assertEqual(self.productos[2].stock_total, Decimal('3'))
+        # Solo queda el saldo negativo, que no se reconstruye
+        self.assertEqual(verificar_libro().derivas, 1)
+
+    def test_edicion_en_el_admin_queda_en_el_libro(self):
+        from .services.libro import verificar_libro
+
+        stock = Stock.objects.get(producto=self.productos[0])
+        self.client.force_login(self.usuario)
+        self.client.post(reverse('admin:inventario_stock_change', args=[stock.pk]), {'cantidad': '1'})
+
+        stock.refresh_from_db()
+        self.assertEqual(stock.cantidad, Decimal('1'))
+        ajuste = Movimiento.objects.get(producto=self.productos[0], tipo='AJUSTE')
+        self.assertEqual((ajuste.area_origen, ajuste.cantidad), (self.bodega, Decimal('2')))
+        self.assertNotIn(self.productos[0].pk, {d.producto_id for d in verificar_libro().ejemplos})
+
+
+class DashboardTests(TestCase):
+    """El dashboard y su API cuestan las mismas consultas con 1 o N productos y áreas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .services.stock import apply_movements
+
+        cls.usuario = User.objects.create_user('gerencia', password='clave')
+        # Solo cuentan las categorías de la prueba, no las que siembran las migraciones
+        Categoria.objects.update(activo=False)
+        cls.lacteos = Categoria.objects.create(nombre='Lácteos de prueba')
+        cls.aseo = Categoria.objects.create(nombre='Aseo de prueba')
+        Categoria.objects.create(nombre='Categoría retirada', activo=False)
+        cls.bodega = Area.objects.create(nombre='Bodega central', tipo='BODEGA')
+        cls.cocina = Area.objects.create(nombre='Cocina central', tipo='COCINA')
+        cls.leche, cls.queso, cls.yogur = [
+            Producto.objects.create(
+                codigo=f'LAC-{i:03d}', nombre=nombre, categoria=cls.lacteos, unidad_medida='UN',
+                stock_minimo=Decimal(minimo), precio_unitario=Decimal(precio),
+            )
+            for i, (nombre, minimo, precio) in enumerate([
+                ('Leche', '10', '1000'), ('Queso', '5', '2000'), ('Yogur', '2', '300'),
+            ])
+        ]
+        cls.cloro = Producto.objects.create(
+            codigo='ASE-000', nombre='Cloro', categoria=cls.aseo, unidad_medida='UN',
+            stock_minimo=Decimal('1'), precio_unitario=Decimal('500'),
+        )
+        # Leche 8 + 4 = 12 (sobre el mínimo), queso 3 + 2 = 5 (justo en el mínimo),
+        # yogur sin stock y cloro 6, todo repartido entre la bodega y la cocina
+        apply_movements([
+            cls.movimiento(cls.leche, 'ENTRADA', '12', destino=cls.bodega),
+            cls.movimiento(cls.leche, 'TRANSFERENCIA', '4', origen=cls.bodega, destino=cls.cocina),
+            cls.movimiento(cls.queso, 'ENTRADA', '3', destino=cls.bodega),
+            cls.movimiento(cls.queso, 'ENTRADA', '2', destino=cls.cocina),
+            cls.movimiento(cls.cloro, 'ENTRADA', '6', destino=cls.cocina),
+        ])
+
+    @classmethod
+    def movimiento(cls, producto, tipo, cantidad, origen=None, destino=None):
+        return Movimiento(
+            producto=producto, tipo=tipo, motivo='COMPRA' if tipo == 'ENTRADA' else tipo,
+            cantidad=Decimal(cantidad), area_origen=origen, area_destino=destino, usuario=cls.usuario,
+        )
+
+    def test_valores(self):
+        from .services.dashboard import calcular_estadisticas_dashboard, stock_por_categoria
+
+        estadisticas = calcular_estadisticas_dashboard()
+        self.assertEqual(estadisticas.resumen(), {
+            'total_productos': 4,
+            'productos_bajo_stock': 2,
+            'movimientos_hoy': 5,
+            'valor_inventario': Decimal('25000'),
+        })
+        self.assertEqual(estadisticas.total_categorias, 2)
+        # Primero el agotado, después el que quedó justo en el mínimo
+        self.assertEqual(estadisticas.productos_bajo_stock, [self.yogur, self.queso])
+        self.assertEqual(
+            [(c.nombre, c.total, c.porcentaje) for c in estadisticas.productos_por_categoria],
+            [('Lácteos de prueba', 3, 75), ('Aseo de prueba', 1, 25)],
+        )
+        # Los totales por categoría suman las dos áreas
+        self.assertEqual(stock_por_categoria(), [
+            {'categoria': 'Aseo de prueba', 'total': 6.0},
+            {'categoria': 'Lácteos de prueba', 'total': 17.0},
+        ])
+
+        self.client.force_login(self.usuario)
+        datos = self.client.get(reverse('inventario:api_stats')).json()
+        self.assertEqual(datos['resumen']['valor_inventario'], 25000.0)
+        self.assertEqual(datos['resumen']['productos_bajo_stock'], 2)
+        self.assertEqual(len(datos['movimientos_recientes']), 5)
+
+    def test_consultas_fijas(self):
+        from django.test.utils import CaptureQueriesContext
+
+        from .services.dashboard import calcular_estadisticas_dashboard
+        from .services.stock import apply_movements
+
+        self.client.force_login(self.usuario)
+        urls = [reverse('inventario:dashboard'), reverse('inventario:api_stats')]
+        consultas = []
+        for url in urls:
+            with CaptureQueriesContext(connection) as contexto:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            consultas.append(len(contexto))
+
+        # Diez productos más repartidos en cinco áreas nuevas, la mitad bajo el mínimo
+        areas = [Area.objects.create(nombre=f'Bar {i}', tipo='BAR') for i in range(5)]
+        productos = [
+            Producto.objects.create(
+                codigo=f'ASE-{i:03d}', nombre=f'Detergente {i}', categoria=self.aseo, unidad_medida='UN',
+                stock_minimo=Decimal('3'), precio_unitario=Decimal('100'),
+            )
+            for i in range(1, 11)
+        ]
+        apply_movements([
+            self.movimiento(producto, 'ENTRADA', str(i % 2 * 4 + 1), destino=areas[i % 5])
+            for i, producto in enumerate(productos)
+        ])
+        self.assertEqual(calcular_estadisticas_dashboard().total_bajo_stock, 7)
+
+        for url, esperadas in zip(urls, consultas):
+            with self.assertNumQueries(esperadas):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class RecalculoTotalesTests(TestCase):
+    """recompute_stock_totals detecta y corrige `stock_total` y `valor_stock` desfasados"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .services.stock import apply_movement
+
+        usuario = User.objects.create_user('contabilidad', password='clave')
+        categoria = Categoria.objects.create(nombre='Abarrotes de prueba')
+        bodega = Area.objects.create(nombre='Bodega abarrotes', tipo='BODEGA')
+        cls.productos = [
+            Producto.objects.create(
+                codigo=f'ABA-{i:03d}', nombre=f'Abarrote {i}', categoria=categoria,
+                unidad_medida='KG', stock_minimo=Decimal('1'), precio_unitario=Decimal('333.33'),
+            )
+            for i in range(3)
+        ]
+        for producto in cls.productos:
+            apply_movement(
+                producto=producto, area_destino=bodega, tipo='ENTRADA', motivo='COMPRA',
+                cantidad=Decimal('1.25'), usuario=usuario,
+            )
+        # 1.25 × 333.33 = 416.6625, guardado en centavos
+        cls.correcto = (Decimal('1.25'), Decimal('416.66'))
+
+    def totales(self):
+        return list(Producto.objects.order_by('codigo').values_list('stock_total', 'valor_stock'))
+
+    def test_verifica_y_repara_ambas_columnas(self):
+        from django.core.management import CommandError, call_command
+
+        self.assertEqual(self.totales(), [self.correcto] * 3)
+        Producto.objects.filter(pk=self.productos[0].pk).update(stock_total=Decimal('9'))
+        Producto.objects.filter(pk=self.productos[1].pk).update(valor_stock=Decimal('1'))
+        desfasados = self.totales()
+
+        salida = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '2 producto(s) desincronizado(s)'):
+            call_command('recompute_stock_totals', '--solo-verificar', stdout=salida)
+        self.assertIn('ABA-000', salida.getvalue())
+        self.assertIn('ABA-001', salida.getvalue())
+        self.assertNotIn('ABA-002', salida.getvalue())
+        self.assertEqual(self.totales(), desfasados)
+
+        salida = io.StringIO()
+        call_command('recompute_stock_totals', stdout=salida)
+        self.assertIn('corregidos 2', salida.getvalue())
+        self.assertEqual(self.totales(), [self.correcto] * 3)
+        call_command('recompute_stock_totals', '--solo-verificar', stdout=io.StringIO())
+
+
+class VerificarIndicesTests(TestCase):
+    """verificar_indices corre EXPLAIN sobre las consultas frecuentes y falla con mensajes claros"""
+
+    def test_sin_productos(self):
+        from django.core.management import CommandError, call_command
+
+        with self.assertRaisesMessage(CommandError, 'No hay productos'):
+            call_command('verificar_indices', stdout=io.StringIO())
+
+    def test_motor_no_soportado(self):
+        from unittest import mock
+
+        from django.core.management import CommandError
+
+        from .management.commands.verificar_indices import recorre_tabla_completa
+
+        with mock.patch('inventario.management.commands.verificar_indices.connection') as conexion:
+            conexion.vendor = 'oracle'
+            with self.assertRaisesMessage(CommandError, 'Motor de base de datos no soportado: oracle'):
+                recorre_tabla_completa(Movimiento.objects.order_by('-fecha', '-id')[:50])
+
+    def test_consultas_frecuentes_usan_indices(self):
+        from django.core.management import call_command
+
+        salida = io.StringIO()
+        call_command('verificar_indices', '--sembrar', '1000', stdout=salida)
+        self.assertIn('Todas las consultas frecuentes usan índices.', salida.getvalue())
+        self.assertEqual(salida.getvalue().count('usa índice'), 8)
+        # Lo sembrado se revierte al terminar
+        self.assertFalse(Producto.objects.exists())
@@ -24,6 +24,7 @@ urlpatterns = [
     path('ingresar-factura/', views.ingresar_factura, name='ingresar_factura'),
     path('entrada-stock-completa/', views.entrada_stock, name='entrada_stock_completa'),
     path('entrada-stock/', views.entrada_stock_simple, name='entrada_stock'),
+    path('importar-entradas/', views.importar_entradas, name='importar_entradas'),
     path('ajax/agregar-stock/', views.agregar_stock_ajax, name='agregar_stock_ajax'),
     path('api/proveedores-sugeridos/', views.proveedores_sugeridos, name='proveedores_sugeridos'),
     
@@ -38,6 +39,8 @@ urlpatterns = [
     
     # APIs
     path('api/stats/', views.api_stats, name='api_stats'),
+    path('api/movimientos/', views.api_movimientos, name='api_movimientos'),
+    path('api/productos/buscar/', views.api_buscar_productos, name='api_buscar_productos'),
     path('api/entities/', views.api_entities, name='api_entities'),
     path('api/entities/create/', views.api_create_entity, name='api_create_entity'),
     path('api/entities/delete/', views.api_delete_entity, name='api_delete_entity'),
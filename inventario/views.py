@@ -1,7 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import ensure_csrf_cookie
-from django.db.models import Sum, Count, Q
+from django.db.models import Q
 from django.http import JsonResponse
 from django.contrib import messages
 from django.db import transaction
@@ -11,11 +11,19 @@ from django.utils.http import urlencode
 from decimal import Decimal
 from datetime import date
 from .models import Producto, Stock, Movimiento, AlertaStock, Area, Categoria, Proveedor, EntradaStock, DetalleEntradaStock
-from .forms import AgregarProductoForm, EntradaStockForm, DetalleEntradaFormSet, ProveedorForm
+from .forms import AgregarProductoForm, EntradaStockForm, DetalleEntradaFormSet, ProveedorForm, ImportarEntradasForm
+from .services.dashboard import calcular_estadisticas_dashboard, stock_por_categoria
+from .services.stock import apply_movement, StockInsuficiente
+from .services.entradas import registrar_entrada
+from .services.listado import ListadoProductos
+from .services.busqueda import buscar_productos, sugerir_productos
+from .services.fechas import inicio_del_dia, rango_del_dia
+from .paginacion import CursorInvalido, PaginadorCursor
+from .services.importacion import ArchivoInvalido, importar_entradas as importar_archivo_entradas
+from .services.numeracion import numero_documento, vista_previa
 import json
 import uuid
-from django.http import HttpResponse
-import csv
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 
 
 def home(request):
@@ -35,20 +43,10 @@ def dashboard(request):
     """Vista principal del dashboard"""
     from django.utils import timezone
     from datetime import timedelta
-    
-    # Estadísticas generales
-    total_productos = Producto.objects.filter(activo=True).count()
-    total_categorias = Categoria.objects.filter(activo=True).count()
-    
-    # Calcular productos con stock bajo
-    productos_bajo_stock = []
-    productos_con_stock = Producto.objects.filter(activo=True).prefetch_related('stocks')
-    
-    for producto in productos_con_stock:
-        stock_total = producto.stock_total()
-        if stock_total <= producto.stock_minimo:
-            productos_bajo_stock.append(producto)
-    
+
+    # Estadísticas generales (número fijo de consultas agregadas)
+    estadisticas = calcular_estadisticas_dashboard()
+
     # Movimientos recientes (últimos 7 días o últimos 10)
     fecha_limite = timezone.now() - timedelta(days=7)
     movimientos_recientes = Movimiento.objects.select_related(
@@ -62,159 +60,55 @@ def dashboard(request):
         movimientos_recientes = Movimiento.objects.select_related(
             'producto', 'usuario'
         ).order_by('-fecha')[:10]
-    
-    # Movimientos del día de hoy
-    hoy = timezone.now().date()
-    movimientos_hoy = Movimiento.objects.filter(
-        fecha__date=hoy
-    ).count()
-    
-    # Productos por categoría
-    productos_por_categoria = Categoria.objects.filter(activo=True).annotate(
-        total=Count('productos', filter=Q(productos__activo=True))
-    ).order_by('-total')[:5]
-    
-    # Calcular porcentajes para las categorías
-    for categoria in productos_por_categoria:
-        if total_productos > 0:
-            categoria.porcentaje = (categoria.total * 100) / total_productos
-        else:
-            categoria.porcentaje = 0
-    
-    # Valor total del inventario (solo productos con precio)
-    valor_inventario = Decimal('0')
-    for producto in productos_con_stock:
-        if producto.precio_unitario:
-            valor_inventario += producto.stock_total() * producto.precio_unitario
-    
-    # Preparar estadísticas para el template
-    stats = {
-        'total_productos': total_productos,
-        'productos_bajo_stock': len(productos_bajo_stock),
-        'movimientos_hoy': movimientos_hoy,
-        'valor_inventario': valor_inventario,
-    }
 
     context = {
-        'stats': stats,
-        'productos_bajo_stock': productos_bajo_stock[:10],  # Solo mostrar 10
+        'stats': estadisticas.resumen(),
+        'productos_bajo_stock': estadisticas.productos_bajo_stock,
         'movimientos_recientes': movimientos_recientes,
-        'productos_por_categoria': productos_por_categoria,
-        'total_productos': total_productos,
-        'total_categorias': total_categorias,
+        'productos_por_categoria': estadisticas.productos_por_categoria,
+        'total_productos': estadisticas.total_productos,
+        'total_categorias': estadisticas.total_categorias,
     }
 
     return render(request, 'inventario/dashboard.html', context)
 
 
+def _parametros_sin_cursor(request):
+    """Query string de los filtros actuales sin los parámetros de paginación"""
+    return urlencode([
+        (clave, valor) for clave, valor in request.GET.items()
+        if clave not in ('despues', 'antes', 'page') and valor
+    ])
+
+
 @login_required
 def lista_productos(request):
     """Vista para listar productos con filtros avanzados"""
-    from django.db.models import Sum, Prefetch, F
-    
-    # Query base con optimizaciones
-    productos = Producto.objects.select_related('categoria').prefetch_related(
-        Prefetch('stocks', queryset=Stock.objects.select_related('area'))
-    ).filter(activo=True)
-    
-    # Agregar stock total y áreas con stock
-    productos = productos.annotate(
-        stock_total=Sum('stocks__cantidad'),
-    )
-
-    # FILTROS
-    
-    # 1. Filtro por búsqueda (nombre o código)
-    busqueda = request.GET.get('q', '').strip()
-    if busqueda:
-        productos = productos.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(codigo__icontains=busqueda) |
-            Q(descripcion__icontains=busqueda)
+    listado = ListadoProductos.desde_parametros(request.GET)
+    try:
+        pagina, filas = listado.pagina_cursor(
+            despues=request.GET.get('despues'), antes=request.GET.get('antes')
         )
-
-    # 2. Filtro por categoría
-    categoria_param = request.GET.get('categoria')
-    categoria_seleccionada = None
-    if categoria_param:
-        try:
-            categoria_id = int(categoria_param)
-            productos = productos.filter(categoria_id=categoria_id)
-            categoria_seleccionada = categoria_id
-        except ValueError:
-            pass
-
-    # 3. Filtro por área
-    area_param = request.GET.get('area')
-    area_seleccionada = None
-    if area_param:
-        try:
-            area_id = int(area_param)
-            productos = productos.filter(stocks__area_id=area_id).distinct()
-            area_seleccionada = area_id
-        except ValueError:
-            pass
-
-    # 4. Filtro por estado de stock
-    stock_filtro = request.GET.get('stock')
-    if stock_filtro:
-        if stock_filtro == 'agotado':
-            productos = productos.filter(stock_total__lte=0)
-        elif stock_filtro == 'bajo':
-            productos = productos.filter(stock_total__lte=F('stock_minimo'), stock_total__gt=0)
-        elif stock_filtro == 'disponible':
-            productos = productos.filter(stock_total__gt=0)
-
-    # ORDENAMIENTO
-    orden = request.GET.get('orden', 'categoria__nombre')
-    orden_valido = [
-        'nombre', '-nombre', 'categoria__nombre', 'codigo', 
-        '-fecha_creacion', 'stock_total', '-stock_total'
-    ]
-    
-    if orden in orden_valido:
-        productos = productos.order_by(orden, 'nombre')
-    else:
-        productos = productos.order_by('categoria__nombre', 'nombre')
-
-    # Paginación
-    from django.core.paginator import Paginator
-    
-    paginator = Paginator(productos, 12)  # 12 productos por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Agregar información de áreas con stock y recalcular stock total para evitar valores desactualizados
-    productos_con_areas = []
-    for producto in page_obj:
-        # Recalcular el stock total desde la base de datos (evita depender solo de la anotación)
-        try:
-            producto.stock_total = producto.stock_total()
-        except TypeError:
-            # Si existe colisión de nombre entre método y anotación, garantizamos el valor correcto
-            producto.stock_total = producto.__class__.objects.filter(id=producto.id).aggregate(
-                total=Sum('stocks__cantidad')
-            )['total'] or 0
-
-        areas_con_stock = producto.stocks.filter(cantidad__gt=0).values('area__nombre', 'cantidad')
-        producto.areas_con_stock = areas_con_stock
-        productos_con_areas.append(producto)
+    except CursorInvalido:
+        # Cursor de otro orden o manipulado: volver al inicio del listado
+        pagina, filas = listado.pagina_cursor()
 
     # Datos para el template
     areas = Area.objects.filter(activo=True).order_by('nombre')
     categorias = Categoria.objects.filter(activo=True).order_by('nombre')
 
     context = {
-        'productos': productos_con_areas,
-        'page_obj': page_obj,
+        'filas': filas,
+        'pagina': pagina,
+        'parametros': _parametros_sin_cursor(request),
         'areas': areas,
         'categorias': categorias,
-        'area_seleccionada': area_seleccionada,
-        'categoria_seleccionada': categoria_seleccionada,
-        'busqueda': busqueda,
-        'stock_filtro': stock_filtro,
-        'orden_actual': orden,
-        'total_productos': paginator.count,
+        'area_seleccionada': listado.area,
+        'categoria_seleccionada': listado.categoria,
+        'busqueda': listado.busqueda,
+        'stock_filtro': listado.stock,
+        'orden_actual': listado.orden,
+        'total_productos': pagina.total,
     }
 
     return render(request, 'inventario/productos_con_guia.html', context)
@@ -242,7 +136,7 @@ def detalle_producto(request, producto_id):
         'producto': producto,
         'stocks': stocks,
         'movimientos': movimientos,
-        'stock_total': producto.stock_total(),
+        'stock_total': producto.stock_total,
         'tiene_stock_bajo': producto.tiene_stock_bajo(),
         'ultimo_proveedor': ultimo_proveedor,
         'ultimo_movimiento_fecha': ultimo_movimiento_fecha,
@@ -254,62 +148,29 @@ def detalle_producto(request, producto_id):
 
 @login_required
 def alertas_stock(request):
-    """Vista para mostrar alertas de stock"""
-    from django.utils import timezone
-
-    # Sincronizar alertas en base al stock real para evitar inconsistencias
-    productos = Producto.objects.filter(activo=True).annotate(
-        stock_total_actual=Sum('stocks__cantidad')
-    )
-    alertas_activas = {
-        alerta.producto_id: alerta
-        for alerta in AlertaStock.objects.filter(estado='ACTIVA', area__isnull=True)
-    }
+    """Vista para mostrar alertas de stock (solo lectura: las mantiene services/alertas.py)"""
+    from django.db.models import BooleanField, Case, F, Value, When
+
+    alertas_queryset = AlertaStock.objects.select_related(
+        'producto__categoria', 'area'
+    ).filter(estado='ACTIVA').annotate(
+        critico=Case(
+            # Sin mínimo el porcentaje cuenta como 0 %: también es crítico
+            When(Q(stock_minimo__lte=0) | Q(stock_actual__lt=F('stock_minimo') / 2), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    ).order_by('-critico', '-fecha_creacion')
 
-    for producto in productos:
-        stock_actual = producto.stock_total_actual or Decimal('0')
-        stock_minimo = producto.stock_minimo or Decimal('0')
-        alerta_activa = alertas_activas.get(producto.id)
-
-        if stock_actual <= stock_minimo:
-            if alerta_activa:
-                campos_actualizados = []
-                if alerta_activa.stock_actual != stock_actual:
-                    alerta_activa.stock_actual = stock_actual
-                    campos_actualizados.append('stock_actual')
-                if alerta_activa.stock_minimo != stock_minimo:
-                    alerta_activa.stock_minimo = stock_minimo
-                    campos_actualizados.append('stock_minimo')
-                if campos_actualizados:
-                    alerta_activa.save(update_fields=campos_actualizados)
-            else:
-                alerta_activa = AlertaStock.objects.create(
-                    producto=producto,
-                    stock_actual=stock_actual,
-                    stock_minimo=stock_minimo,
-                    estado='ACTIVA'
-                )
-                alertas_activas[producto.id] = alerta_activa
-        else:
-            if alerta_activa:
-                alerta_activa.estado = 'RESUELTA'
-                alerta_activa.fecha_resolucion = timezone.now()
-                alerta_activa.stock_actual = stock_actual
-                alerta_activa.save(update_fields=['estado', 'fecha_resolucion', 'stock_actual'])
-                alertas_activas.pop(producto.id, None)
-
-    alertas_queryset = AlertaStock.objects.select_related('producto', 'area').filter(estado='ACTIVA')
+    # Críticos (menos del 50% del mínimo) primero, luego por fecha descendente
     alertas_list = []
     for alerta in alertas_queryset:
         porcentaje = (alerta.stock_actual / alerta.stock_minimo * 100) if alerta.stock_minimo > 0 else 0
-        critico = porcentaje < 50
         alertas_list.append({
             'alerta': alerta,
             'porcentaje': porcentaje,
-            'critico': critico,
+            'critico': alerta.critico,
         })
-    # Ordenar: críticos primero, luego por fecha descendente
-    alertas_list = sorted(alertas_list, key=lambda x: (0 if x['critico'] else 1, x['alerta'].fecha_creacion), reverse=True)
 
     context = {
         'alertas': alertas_list,
@@ -327,17 +188,8 @@ def ayuda(request):
 def api_stats(request):
     """API para estadísticas del dashboard"""
     # Datos para gráficos
-    stock_por_categoria = []
-    for categoria in Categoria.objects.filter(activo=True):
-        total_stock = Stock.objects.filter(
-            producto__categoria=categoria
-        ).aggregate(total=Sum('cantidad'))['total'] or 0
-        
-        stock_por_categoria.append({
-            'categoria': categoria.nombre,
-            'total': float(total_stock)
-        })
-    
+    estadisticas = calcular_estadisticas_dashboard()
+
     movimientos_recientes = []
     for movimiento in Movimiento.objects.order_by('-fecha')[:7]:
         movimientos_recientes.append({
@@ -346,8 +198,12 @@ def api_stats(request):
             'tipo': movimiento.tipo
         })
     
+    resumen = estadisticas.resumen()
+    resumen['valor_inventario'] = float(resumen['valor_inventario'])
+
     return JsonResponse({
-        'stock_por_categoria': stock_por_categoria,
+        'resumen': resumen,
+        'stock_por_categoria': stock_por_categoria(),
         'movimientos_recientes': movimientos_recientes
     })
 
@@ -393,15 +249,8 @@ def agregar_producto(request):
                             area_destino=area_inicial
                         )
                         
-                        # Crear stock
-                        Stock.objects.create(
-                            producto=producto,
-                            area=area_inicial,
-                            cantidad=cantidad_inicial
-                        )
-                        
-                        # Crear movimiento
-                        Movimiento.objects.create(
+                        # Crear stock y movimiento
+                        apply_movement(
                             producto=producto,
                             area_destino=area_inicial,
                             tipo='ENTRADA',
@@ -450,36 +299,14 @@ def agregar_stock(request, producto_id):
                     # Crear la entrada
                     entrada = entrada_form.save(commit=False)
                     entrada.registrado_por = request.user
-                    entrada.save()
                     
-                    # Procesar los detalles
-                    for detalle_form in detalle_formset:
-                        if detalle_form.cleaned_data and not detalle_form.cleaned_data.get('DELETE'):
-                            detalle = detalle_form.save(commit=False)
-                            detalle.entrada = entrada
-                            detalle.save()
-                            
-                            # Actualizar o crear stock
-                            stock, created = Stock.objects.get_or_create(
-                                producto=detalle.producto,
-                                area=detalle.area_destino,
-                                defaults={'cantidad': detalle.cantidad}
-                            )
-                            if not created:
-                                stock.cantidad += detalle.cantidad
-                                stock.save()
-                            
-                            # Crear movimiento (entrada por compra)
-                            Movimiento.objects.create(
-                                producto=detalle.producto,
-                                area_destino=detalle.area_destino,
-                                tipo='ENTRADA',
-                                motivo='COMPRA',
-                                cantidad=detalle.cantidad,
-                                precio_unitario=detalle.precio_unitario,
-                                usuario=request.user,
-                                observaciones=f'Entrada: {entrada.numero_entrada}'
-                            )
+                    # Procesar los detalles en bloque (detalles, stock y movimientos por compra)
+                    detalles = [
+                        detalle_form.save(commit=False)
+                        for detalle_form in detalle_formset
+                        if detalle_form.cleaned_data and not detalle_form.cleaned_data.get('DELETE')
+                    ]
+                    registrar_entrada(entrada, detalles, request.user)
                     
                     messages.success(request, f'¡Stock agregado exitosamente! Entrada registrada: {entrada.numero_entrada}')
                     return redirect('inventario:productos')
@@ -529,18 +356,7 @@ def agregar_proveedor(request):
 @ensure_csrf_cookie
 def ingresar_factura(request):
     """Registrar una factura/boleta con uno o más productos (detalle múltiple)."""
-    from datetime import date, datetime
-
-    # Autogenerar número si el usuario lo deja vacío (opcional)
-    def generar_numero():
-        ultima = EntradaStock.objects.order_by('-id').first()
-        if ultima and ultima.numero_entrada and ultima.numero_entrada.startswith('FAC-'):
-            try:
-                n = int(ultima.numero_entrada.split('-')[-1])
-                return f"FAC-{n+1:04d}"
-            except Exception:
-                pass
-        return f"FAC-{datetime.now().strftime('%m%d%H%M')}"
+    from datetime import date
 
     if request.method == 'POST':
         entrada_form = EntradaStockForm(request.POST, request.FILES)
@@ -550,46 +366,24 @@ def ingresar_factura(request):
             try:
                 with transaction.atomic():
                     entrada: EntradaStock = entrada_form.save(commit=False)
-                    # Si no viene número, autogenerar
+                    # Si no viene número, se reserva el siguiente de la serie FAC
                     if not entrada.numero_entrada:
-                        entrada.numero_entrada = generar_numero()
+                        entrada.numero_entrada = numero_documento('FAC')
                     entrada.registrado_por = request.user
-                    entrada.save()
-
-                    # Procesar detalles
-                    for form in detalle_formset:
-                        if form.cleaned_data and not form.cleaned_data.get('DELETE'):
-                            detalle = form.save(commit=False)
-                            detalle.entrada = entrada
-                            detalle.save()
-
-                            # Actualizar o crear stock
-                            stock, created = Stock.objects.get_or_create(
-                                producto=detalle.producto,
-                                area=detalle.area_destino,
-                                defaults={'cantidad': detalle.cantidad}
-                            )
-                            if not created:
-                                stock.cantidad += detalle.cantidad
-                                stock.save()
-
-                            # Crear movimiento enlazado a la factura
-                            mov = Movimiento.objects.create(
-                                producto=detalle.producto,
-                                area_destino=detalle.area_destino,
-                                tipo='ENTRADA',
-                                motivo='COMPRA',
-                                cantidad=detalle.cantidad,
-                                precio_unitario=detalle.precio_unitario,
-                                usuario=request.user,
-                                observaciones=f'Entrada factura: {entrada.numero_entrada}'
-                            )
-                            # Enlaces de trazabilidad
-                            mov.entrada = entrada
-                            mov.detalle_entrada = detalle
-                            mov.save(update_fields=['entrada', 'detalle_entrada'])
-
-                    messages.success(request, f"Factura registrada: {entrada.numero_entrada} con {detalle_formset.total_form_count()} producto(s).")
+
+                    # Procesar todos los detalles en bloque: bulk_create de detalles y
+                    # movimientos enlazados a la factura + upsert agrupado de stock
+                    detalles = [
+                        form.save(commit=False)
+                        for form in detalle_formset
+                        if form.cleaned_data and not form.cleaned_data.get('DELETE')
+                    ]
+                    registrar_entrada(
+                        entrada, detalles, request.user,
+                        observaciones='Entrada factura: {numero}',
+                    )
+
+                    messages.success(request, f"Factura registrada: {entrada.numero_entrada} con {len(detalles)} producto(s).")
                     return redirect('inventario:productos')
             except Exception as e:
                 messages.error(request, f'Error al registrar la factura: {str(e)}')
@@ -597,6 +391,7 @@ def ingresar_factura(request):
             messages.error(request, 'Corrige los errores en el formulario.')
     else:
         entrada_form = EntradaStockForm(initial={'tipo': 'COMPRA', 'fecha_compra': date.today()})
+        entrada_form.fields['numero_entrada'].widget.attrs['placeholder'] = f"{vista_previa('FAC')} (automático si se deja vacío)"
         detalle_formset = DetalleEntradaFormSet(prefix='detalles')
 
     context = {
@@ -609,6 +404,49 @@ def ingresar_factura(request):
     return render(request, 'inventario/ingresar_factura.html', context)
 
 
+@login_required
+def importar_entradas(request):
+    """Importar facturas o conteos físicos desde un archivo CSV/XLSX"""
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarEntradasForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            try:
+                resultado = importar_archivo_entradas(
+                    archivo,
+                    request.user,
+                    modo=form.cleaned_data['modo'],
+                    nombre=archivo.name,
+                    numero=form.cleaned_data['numero'],
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+                resumen = (
+                    f'{resultado.filas_importadas} de {resultado.filas_leidas} fila(s), '
+                    f'{resultado.documentos} documento(s), {resultado.movimientos} movimiento(s)'
+                )
+                if resultado.dry_run:
+                    messages.info(request, f'Simulación completada sin guardar cambios: {resumen}.')
+                elif resultado.errores:
+                    messages.warning(request, f'Importación con {len(resultado.errores)} error(es): {resumen}.')
+                else:
+                    messages.success(request, f'Importación completada: {resumen}.')
+            except ArchivoInvalido as e:
+                messages.error(request, str(e))
+            except Exception as e:
+                messages.error(request, f'Error al importar el archivo: {str(e)}')
+        else:
+            messages.error(request, 'Corrige los errores en el formulario.')
+    else:
+        form = ImportarEntradasForm()
+
+    context = {
+        'form': form,
+        'resultado': resultado,
+    }
+    return render(request, 'inventario/importar_entradas.html', context)
+
+
 @login_required
 def proveedores_sugeridos(request):
     """Devuelve proveedores sugeridos para un producto (+/- área) según historial."""
@@ -662,14 +500,108 @@ def trazabilidad(request):
     producto_sel = None
     if producto_id:
         producto_sel = get_object_or_404(Producto, id=producto_id)
-        movimientos = Movimiento.objects.select_related('area_origen','area_destino','usuario','entrada','detalle_entrada').filter(
-            producto=producto_sel
-        ).order_by('-fecha')[:200]
+        paginador = PaginadorCursor(
+            Movimiento.objects.select_related(
+                'area_origen', 'area_destino', 'usuario', 'entrada__proveedor', 'detalle_entrada'
+            ).filter(producto=producto_sel),
+            orden=('-fecha', '-id'),
+            por_pagina=100,
+        )
+        try:
+            movimientos = paginador.pagina(despues=request.GET.get('despues'), antes=request.GET.get('antes'))
+        except CursorInvalido:
+            movimientos = paginador.pagina()
 
     return render(request, 'inventario/trazabilidad.html', {
         'productos': Producto.objects.filter(activo=True).order_by('nombre'),
         'producto_sel': producto_sel,
         'movimientos': movimientos,
+        'parametros': _parametros_sin_cursor(request),
+    })
+
+
+@login_required
+def api_buscar_productos(request):
+    """API: autocompletado de productos activos por código, nombre o descripción"""
+    texto = request.GET.get('q', '').strip()
+    productos = sugerir_productos(
+        Producto.objects.filter(activo=True).only(
+            'id', 'codigo', 'nombre', 'unidad_medida', 'stock_total', 'stock_minimo'
+        ),
+        texto,
+    )
+    return JsonResponse({
+        'resultados': [
+            {
+                'id': p.id,
+                'codigo': p.codigo,
+                'nombre': p.nombre,
+                'unidad_medida': p.unidad_medida,
+                'stock_total': str(p.stock_total),
+                'stock_bajo': p.stock_total <= p.stock_minimo,
+            }
+            for p in productos
+        ]
+    })
+
+
+@login_required
+def api_movimientos(request):
+    """API: historial de movimientos paginado por cursor (más recientes primero).
+
+    Filtros opcionales: producto, area (origen o destino), tipo, desde/hasta
+    (AAAA-MM-DD). `contar=1` agrega el total exacto, que en tablas grandes cuesta
+    más que la página.
+    """
+    from datetime import datetime
+
+    movimientos = Movimiento.objects.select_related('producto', 'area_origen', 'area_destino', 'usuario')
+    try:
+        if request.GET.get('producto'):
+            movimientos = movimientos.filter(producto_id=int(request.GET['producto']))
+        if request.GET.get('area'):
+            area_id = int(request.GET['area'])
+            movimientos = movimientos.filter(Q(area_origen_id=area_id) | Q(area_destino_id=area_id))
+        if request.GET.get('desde'):
+            desde = datetime.strptime(request.GET['desde'], '%Y-%m-%d').date()
+            movimientos = movimientos.filter(fecha__gte=inicio_del_dia(desde))
+        if request.GET.get('hasta'):
+            hasta = datetime.strptime(request.GET['hasta'], '%Y-%m-%d').date()
+            movimientos = movimientos.filter(fecha__lt=rango_del_dia(hasta)[1])
+        por_pagina = min(max(int(request.GET.get('por_pagina', 50)), 1), 200)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+    if request.GET.get('tipo'):
+        movimientos = movimientos.filter(tipo=request.GET['tipo'])
+
+    paginador = PaginadorCursor(
+        movimientos, orden=('-fecha', '-id'), por_pagina=por_pagina,
+        contar=request.GET.get('contar') == '1',
+    )
+    try:
+        pagina = paginador.pagina(despues=request.GET.get('despues'), antes=request.GET.get('antes'))
+    except CursorInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'resultados': [
+            {
+                'id': m.id,
+                'fecha': m.fecha.isoformat(),
+                'tipo': m.tipo,
+                'motivo': m.motivo,
+                'producto': {'id': m.producto_id, 'codigo': m.producto.codigo, 'nombre': m.producto.nombre},
+                'area_origen': m.area_origen.nombre if m.area_origen else None,
+                'area_destino': m.area_destino.nombre if m.area_destino else None,
+                'cantidad': str(m.cantidad),
+                'usuario': m.usuario.username,
+                'observaciones': m.observaciones,
+            }
+            for m in pagina
+        ],
+        'siguiente': pagina.siguiente,
+        'anterior': pagina.anterior,
+        'total': pagina.total,
     })
 
 
@@ -685,35 +617,15 @@ def entrada_stock(request):
     area_id = request.GET.get('area', '')
     producto_param = request.GET.get('producto')
     
-    # Generar próximo número de entrada automáticamente
-    ultima_entrada_num = EntradaStock.objects.all().order_by('-id').first()
-    if ultima_entrada_num:
-        try:
-            # Extraer número de la última entrada si tiene formato numérico
-            ultimo_num = int(ultima_entrada_num.numero_entrada.split('-')[-1])
-            proximo_numero = f"ENT-{ultimo_num + 1:04d}"
-        except:
-            # Si no se puede extraer número, usar timestamp
-            from datetime import datetime
-            proximo_numero = f"ENT-{datetime.now().strftime('%m%d%H%M')}"
-    else:
-        proximo_numero = "ENT-0001"
-    
+    # Número sugerido (no reservado): si el campo queda vacío se asigna al guardar
+    proximo_numero = vista_previa('ENT')
+
     # Construir queryset con filtros
     productos_query = Producto.objects.filter(activo=True).select_related('categoria')
     
-    # Anotar con stock total
-    productos_query = productos_query.annotate(
-        stock_total=Sum('stocks__cantidad')
-    )
-    
     # Filtrar por búsqueda
     if busqueda:
-        productos_query = productos_query.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(codigo__icontains=busqueda) |
-            Q(descripcion__icontains=busqueda)
-        )
+        productos_query = buscar_productos(productos_query, busqueda).order_by('-relevancia', 'nombre')
     
     # Filtrar por categoría
     if categoria_id:
@@ -782,7 +694,7 @@ def entrada_stock(request):
                 with transaction.atomic():
                     # Crear la entrada
                     entrada = EntradaStock.objects.create(
-                        numero_entrada=numero_entrada or '',
+                        numero_entrada=numero_entrada or numero_documento('ENT'),
                         fecha_compra=fecha_compra,
                         proveedor_id=proveedor_id if proveedor_id else None,
                         total_compra=Decimal(total_compra) if total_compra else None,
@@ -806,18 +718,8 @@ def entrada_stock(request):
                         area_destino=area
                     )
                     
-                    # Actualizar o crear stock
-                    stock, created = Stock.objects.get_or_create(
-                        producto=producto,
-                        area=area,
-                        defaults={'cantidad': cantidad_decimal}
-                    )
-                    if not created:
-                        stock.cantidad += cantidad_decimal
-                        stock.save()
-                    
-                    # Crear movimiento (entrada por compra)
-                    Movimiento.objects.create(
+                    # Actualizar o crear stock y registrar el movimiento (entrada por compra)
+                    apply_movement(
                         producto=producto,
                         area_destino=area,
                         tipo='ENTRADA',
@@ -825,7 +727,9 @@ def entrada_stock(request):
                         cantidad=cantidad_decimal,
                         precio_unitario=precio_decimal,
                         usuario=request.user,
-                        observaciones=f'Entrada: {entrada.numero_entrada}'
+                        observaciones=f'Entrada: {entrada.numero_entrada}',
+                        entrada=entrada,
+                        detalle_entrada=detalle,
                     )
                     
                     messages.success(request, f'¡Stock agregado exitosamente! Entrada registrada: {entrada.numero_entrada}')
@@ -865,188 +769,49 @@ def entrada_stock(request):
 
 @login_required
 def reporte_productos_stock(request):
-    """Genera un reporte de productos con stock en formato CSV o PDF."""
-    from django.db.models import Sum
-    import openpyxl
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib.units import inch
-    from io import BytesIO
-
+    """Reporte de productos con stock: CSV y Excel se descargan al momento; el PDF se encola."""
     formato = request.GET.get('formato', 'csv').lower()
 
-    productos = Producto.objects.filter(activo=True).annotate(stock_total=Sum('stocks__cantidad')).filter(stock_total__gt=0)
-
     if formato == 'pdf':
-        # Generar PDF con formato optimizado para legibilidad
-        from reportlab.lib.pagesizes import letter, A4, landscape
-        from reportlab.platypus import PageBreak, LongTable
-        from reportlab.lib.styles import ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-
-        buffer = BytesIO()
-        # Usar landscape para mejor ajuste
-        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-        elements = []
-
-        styles = getSampleStyleSheet()
-
-        # Título con mejor formato
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Title'],
-            fontSize=16,
-            spaceAfter=20,
-            alignment=TA_CENTER
-        )
-        title = Paragraph("Reporte de Productos con Stock", title_style)
-        elements.append(title)
-
-        # Información del reporte
-        info_style = ParagraphStyle(
-            'InfoStyle',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.grey,
-            alignment=TA_CENTER,
-            spaceAfter=20
+        # El PDF se genera en segundo plano (comando procesar_reportes): se encola y se
+        # redirige a la lista de reportes, donde se ve el avance
+        from reportes.models import TipoReporte
+        from reportes.services.cache import pedir_reporte
+
+        tipo, _ = TipoReporte.objects.get_or_create(
+            nombre='Productos con Stock',
+            defaults={
+                'descripcion': 'Productos activos con stock y su desglose por área',
+                'template_nombre': 'reportes/productos_stock.html',
+            },
         )
-        info_text = f"Total de productos: {productos.count()} | Generado el {date.today().strftime('%d/%m/%Y')}"
-        elements.append(Paragraph(info_text, info_style))
-
-        # Datos para la tabla optimizada
-        data = [['ID', 'Código', 'Nombre del Producto', 'Categoría', 'Unidad', 'Stock', 'Precio', 'Áreas']]
-
-        for p in productos:
-            areas = Stock.objects.filter(producto=p, cantidad__gt=0).select_related('area')
-            areas_info = ', '.join([f"{a.area.nombre}({a.cantidad})" for a in areas])
-
-            # Limitar longitudes para mejor ajuste
-            nombre_corto = p.nombre[:25] + '...' if len(p.nombre) > 25 else p.nombre
-            categoria_corta = (p.categoria.nombre if p.categoria else 'Sin cat.')[:15] + '...' if p.categoria and len(p.categoria.nombre) > 15 else (p.categoria.nombre if p.categoria else 'Sin cat.')
-            areas_corto = areas_info[:35] + '...' if len(areas_info) > 35 else areas_info
-
-            data.append([
-                str(p.id),
-                p.codigo or '-',
-                nombre_corto,
-                categoria_corta,
-                p.get_unidad_medida_display() if hasattr(p, 'get_unidad_medida_display') else str(p.unidad_medida or '-'),
-                str(p.stock_total or 0),
-                f"${p.precio_unitario:.2f}" if p.precio_unitario else '-',
-                areas_corto
-            ])
-
-        # Anchos de columna optimizados para landscape
-        col_widths = [25, 50, 120, 70, 45, 40, 55, 120]  # Más compacto
-
-        # Usar LongTable para múltiples páginas si es necesario
-        table = LongTable(data, colWidths=col_widths, repeatRows=1)
-
-        # Estilos optimizados para mejor legibilidad
-        table.setStyle(TableStyle([
-            # Encabezado
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-            ('TOPPADDING', (0, 0), (-1, 0), 6),
-
-            # Cuerpo de la tabla
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 3),
-            ('TOPPADDING', (0, 1), (-1, -1), 3),
-
-            # Alineación específica por columna
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),  # ID centrado
-            ('ALIGN', (1, 0), (1, -1), 'CENTER'),  # Código centrado
-            ('ALIGN', (4, 0), (4, -1), 'CENTER'),  # Unidad centrada
-            ('ALIGN', (5, 0), (5, -1), 'CENTER'),  # Stock centrado
-            ('ALIGN', (6, 0), (6, -1), 'RIGHT'),   # Precio alineado a la derecha
-
-            # Bordes sutiles
-            ('GRID', (0, 0), (-1, -1), 0.3, colors.black),
-            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-
-            # Filas alternas para mejor legibilidad (más sutil)
-            ('BACKGROUND', (0, 2), (-1, 2), colors.lightgrey),
-            ('BACKGROUND', (0, 4), (-1, 4), colors.lightgrey),
-            ('BACKGROUND', (0, 6), (-1, 6), colors.lightgrey),
-            ('BACKGROUND', (0, 8), (-1, 8), colors.lightgrey),
-        ]))
-
-        elements.append(table)
-
-        doc.build(elements)
-
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="productos_con_stock.pdf"'
-        return response
+        reporte, origen = pedir_reporte(tipo, request.user, formato='PDF')
+        if origen == 'cache':
+            # Sin cambios de inventario desde la última generación: se sirve el archivo guardado
+            return redirect('reportes:descargar', reporte_id=reporte.pk)
+        if origen == 'cola':
+            messages.info(request, f'El reporte "{reporte.nombre}" ya se está generando.')
+        else:
+            messages.success(request, f'Reporte "{reporte.nombre}" en cola. Estará disponible en unos momentos.')
+        return redirect('reportes:lista')
 
     elif formato == 'excel':
-        # Generar Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Productos con Stock"
-
-        # Encabezados
-        headers = ['ID', 'Código', 'Nombre', 'Categoría', 'Unidad', 'Stock Total', 'Precio Unitario', 'Áreas (nombre:cantidad)']
-        for col_num, header in enumerate(headers, 1):
-            ws.cell(row=1, column=col_num, value=header)
-
-        # Datos
-        for row_num, p in enumerate(productos, 2):
-            areas = Stock.objects.filter(producto=p, cantidad__gt=0).select_related('area')
-            areas_info = '; '.join([f"{a.area.nombre}:{a.cantidad}" for a in areas])
-
-            ws.cell(row=row_num, column=1, value=p.id)
-            ws.cell(row=row_num, column=2, value=p.codigo)
-            ws.cell(row=row_num, column=3, value=p.nombre)
-            ws.cell(row=row_num, column=4, value=p.categoria.nombre if p.categoria else '')
-            ws.cell(row=row_num, column=5, value=p.get_unidad_medida_display() if hasattr(p, 'get_unidad_medida_display') else p.unidad_medida)
-            ws.cell(row=row_num, column=6, value=p.stock_total or 0)
-            ws.cell(row=row_num, column=7, value=str(p.precio_unitario or ''))
-            ws.cell(row=row_num, column=8, value=areas_info)
-
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="productos_con_stock.xlsx"'
-        return response
+        # Hoja write_only sobre archivo temporal, entregada por bloques
+        from .services.exportacion import excel_temporal, filas_productos_stock
+
+        return FileResponse(
+            excel_temporal(filas_productos_stock()),
+            as_attachment=True,
+            filename='productos_con_stock.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
 
     else:
-        # Generar CSV (por defecto)
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="productos_con_stock.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Código', 'Nombre', 'Categoría', 'Unidad', 'Stock Total', 'Precio Unitario', 'Áreas (nombre:cantidad)'])
-
-        for p in productos:
-            areas = Stock.objects.filter(producto=p, cantidad__gt=0).select_related('area')
-            areas_info = '; '.join([f"{a.area.nombre}:{a.cantidad}" for a in areas])
-            writer.writerow([
-                p.id,
-                p.codigo,
-                p.nombre,
-                p.categoria.nombre if p.categoria else '',
-                p.get_unidad_medida_display() if hasattr(p, 'get_unidad_medida_display') else p.unidad_medida,
-                str(p.stock_total or 0),
-                str(p.precio_unitario or ''),
-                areas_info
-            ])
+        # CSV (por defecto): se transmite a medida que se recorre el cursor
+        from .services.exportacion import filas_productos_stock, lineas_csv
 
+        response = StreamingHttpResponse(lineas_csv(filas_productos_stock()), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="productos_con_stock.csv"'
         return response
 
 
@@ -1066,18 +831,12 @@ def salida_stock(request):
     # Construir queryset con filtros y solo productos con stock
     productos_query = Producto.objects.filter(activo=True).select_related('categoria')
 
-    # Anotar con stock total y filtrar solo productos con stock > 0
-    productos_query = productos_query.annotate(
-        stock_total=Sum('stocks__cantidad')
-    ).filter(stock_total__gt=0)
+    # Solo productos con stock > 0
+    productos_query = productos_query.filter(stock_total__gt=0)
 
     # Filtrar por búsqueda
     if busqueda:
-        productos_query = productos_query.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(codigo__icontains=busqueda) |
-            Q(descripcion__icontains=busqueda)
-        )
+        productos_query = buscar_productos(productos_query, busqueda).order_by('-relevancia', 'nombre')
 
     # Filtrar por categoría
     if categoria_id:
@@ -1126,26 +885,18 @@ def salida_stock(request):
                 messages.error(request, 'Cantidad debe ser mayor a 0.')
                 return redirect('inventario:salida_stock')
 
-            stock = Stock.objects.filter(producto=producto, area=area).first()
-            if not stock or stock.cantidad < cantidad_dec:
-                messages.error(request, 'No hay suficiente stock en el área seleccionada.')
-                return redirect('inventario:salida_stock')
-
-            with transaction.atomic():
-                stock.cantidad -= cantidad_dec
-                stock.save()
-
-                Movimiento.objects.create(
-                    producto=producto,
-                    area_origen=area,
-                    area_destino=None,
-                    tipo='SALIDA',
-                    motivo=motivo,
-                    cantidad=cantidad_dec,
-                    precio_unitario=None,
-                    usuario=request.user,
-                    observaciones=f'Salida por {motivo}'
-                )
+            # El descuento es condicional en la base de datos: falla si no hay saldo suficiente
+            apply_movement(
+                producto=producto,
+                area_origen=area,
+                area_destino=None,
+                tipo='SALIDA',
+                motivo=motivo,
+                cantidad=cantidad_dec,
+                precio_unitario=None,
+                usuario=request.user,
+                observaciones=f'Salida por {motivo}'
+            )
 
             messages.success(request, f'Salida registrada: -{cantidad_dec} {producto.unidad_medida} de {producto.nombre} en {area.nombre}.')
             return redirect('inventario:detalle_producto', producto_id=producto.id)
@@ -1156,6 +907,9 @@ def salida_stock(request):
         except Area.DoesNotExist:
             messages.error(request, 'Área no encontrada.')
             return redirect('inventario:salida_stock')
+        except StockInsuficiente:
+            messages.error(request, 'No hay suficiente stock en el área seleccionada.')
+            return redirect('inventario:salida_stock')
         except Exception as e:
             messages.error(request, f'Error interno: {str(e)}')
             return redirect('inventario:salida_stock')
@@ -1205,41 +959,26 @@ def transferir_stock(request, producto_id):
                 return redirect('inventario:transferir_stock', producto_id=producto.id)
 
             try:
-                with transaction.atomic():
-                    stock_origen = Stock.objects.select_for_update().get(producto=producto, area_id=area_origen_id)
-                    if stock_origen.cantidad < cantidad_dec:
-                        messages.error(request, f'El área {stock_origen.area.nombre} no tiene suficiente stock disponible.')
-                        return redirect('inventario:transferir_stock', producto_id=producto.id)
-
-                    stock_destino = Stock.objects.select_for_update().filter(producto=producto, area_id=area_destino_id).first()
-                    if stock_destino is None:
-                        area_destino = Area.objects.get(id=area_destino_id)
-                        stock_destino = Stock.objects.create(producto=producto, area=area_destino, cantidad=Decimal('0'))
-                    else:
-                        area_destino = stock_destino.area
-
-                    stock_origen.cantidad -= cantidad_dec
-                    stock_origen.save()
+                area_origen = Area.objects.get(id=area_origen_id)
+                area_destino = Area.objects.get(id=area_destino_id)
 
-                    stock_destino.cantidad += cantidad_dec
-                    stock_destino.save()
-
-                    Movimiento.objects.create(
-                        producto=producto,
-                        area_origen=stock_origen.area,
-                        area_destino=area_destino,
-                        tipo='TRANSFERENCIA',
-                        motivo='TRANSFERENCIA',
-                        cantidad=cantidad_dec,
-                        usuario=request.user,
-                        observaciones=observaciones or f'Transferencia interna {stock_origen.area.nombre} ➜ {area_destino.nombre}'
-                    )
+                # Descuento condicional en origen + upsert en destino dentro de una transacción
+                apply_movement(
+                    producto=producto,
+                    area_origen=area_origen,
+                    area_destino=area_destino,
+                    tipo='TRANSFERENCIA',
+                    motivo='TRANSFERENCIA',
+                    cantidad=cantidad_dec,
+                    usuario=request.user,
+                    observaciones=observaciones or f'Transferencia interna {area_origen.nombre} ➜ {area_destino.nombre}'
+                )
 
-                messages.success(request, f'Se movieron {cantidad_dec} {producto.unidad_medida} desde {stock_origen.area.nombre} hacia {area_destino.nombre}.')
+                messages.success(request, f'Se movieron {cantidad_dec} {producto.unidad_medida} desde {area_origen.nombre} hacia {area_destino.nombre}.')
                 return redirect('inventario:detalle_producto', producto_id=producto.id)
 
-            except Stock.DoesNotExist:
-                messages.error(request, 'No encontramos stock en el área de origen seleccionada.')
+            except StockInsuficiente as e:
+                messages.error(request, f'El área {e.area.nombre} no tiene suficiente stock disponible.')
             except Area.DoesNotExist:
                 messages.error(request, 'El área destino seleccionada no existe.')
             except Exception as e:
@@ -1250,7 +989,7 @@ def transferir_stock(request, producto_id):
         'stocks': stocks,
         'areas_origen': areas_origen,
         'areas_destino': areas,
-        'stock_total': producto.stock_total(),
+        'stock_total': producto.stock_total,
         'area_tipos': Area.TIPOS_AREA,
     }
     return render(request, 'inventario/transferir_stock.html', context)
@@ -1265,18 +1004,9 @@ def entrada_stock_simple(request):
     producto_param = request.GET.get('producto')
     producto_preseleccionado = None
 
-    # Generar próximo número de entrada automáticamente
-    ultima_entrada_num = EntradaStock.objects.all().order_by('-id').first()
-    if ultima_entrada_num:
-        try:
-            ultimo_num = int(ultima_entrada_num.numero_entrada.split('-')[-1])
-            proximo_numero = f"REC-{ultimo_num + 1:04d}"
-        except:
-            from datetime import datetime
-            proximo_numero = f"REC-{datetime.now().strftime('%m%d%H%M')}"
-    else:
-        proximo_numero = "REC-0001"
-    
+    # Número sugerido (no reservado): el definitivo se reserva al registrar
+    proximo_numero = vista_previa('REC')
+
     # Manejo del POST: crear entrada de stock simple
     if request.method == 'POST':
         try:
@@ -1292,18 +1022,6 @@ def entrada_stock_simple(request):
                     messages.error(request, 'Faltan datos obligatorios: producto, cantidad y área.')
                     return redirect('inventario:entrada_stock')
 
-                # Generar número de recibo/entrada
-                ultima_entrada_num = EntradaStock.objects.all().order_by('-id').first()
-                if ultima_entrada_num:
-                    try:
-                        ultimo_num = int(ultima_entrada_num.numero_entrada.split('-')[-1])
-                        numero_generado = f"REC-{ultimo_num + 1:04d}"
-                    except Exception:
-                        from datetime import datetime
-                        numero_generado = f"REC-{datetime.now().strftime('%m%d%H%M%S')}"
-                else:
-                    numero_generado = "REC-0001"
-
                 # Objetos base
                 producto = Producto.objects.get(id=producto_id)
                 area = Area.objects.get(id=area_id)
@@ -1313,9 +1031,9 @@ def entrada_stock_simple(request):
                     return redirect('inventario:entrada_stock')
                 precio_dec = Decimal(str(precio)) if precio else None
 
-                # Crear entrada y detalle
+                # Crear entrada y detalle (el número se reserva solo si los datos son válidos)
                 entrada = EntradaStock.objects.create(
-                    numero_entrada=numero_generado,
+                    numero_entrada=numero_documento('REC'),
                     tipo='COMPRA',
                     proveedor_id=proveedor_id if proveedor_id else None,
                     fecha_compra=fecha_compra,
@@ -1332,18 +1050,8 @@ def entrada_stock_simple(request):
                     area_destino=area
                 )
 
-                # Actualizar/crear stock
-                stock, created = Stock.objects.get_or_create(
-                    producto=producto,
-                    area=area,
-                    defaults={'cantidad': cantidad_dec}
-                )
-                if not created:
-                    stock.cantidad += cantidad_dec
-                    stock.save()
-
-                # Registrar movimiento
-                Movimiento.objects.create(
+                # Actualizar/crear stock y registrar movimiento
+                apply_movement(
                     producto=producto,
                     area_destino=area,
                     tipo='ENTRADA',
@@ -1361,9 +1069,7 @@ def entrada_stock_simple(request):
             return redirect('inventario:entrada_stock')
 
     # Obtener productos con stock actual
-    productos = Producto.objects.filter(activo=True).select_related('categoria').annotate(
-        stock_total=Sum('stocks__cantidad')
-    ).order_by('categoria__nombre', 'nombre')
+    productos = Producto.objects.filter(activo=True).select_related('categoria').order_by('categoria__nombre', 'nombre')
     
     # Agregar información de última entrada para auto-completar
     productos_con_info = []
@@ -1433,7 +1139,7 @@ def agregar_stock_ajax(request):
                 
                 # Crear entrada de stock
                 entrada = EntradaStock.objects.create(
-                    numero_entrada=numero_recibo,
+                    numero_entrada=numero_recibo or numero_documento('REC'),
                     fecha_compra=date.today(),
                     proveedor=proveedor,
                     total_compra=cantidad * (Decimal(str(precio_unitario)) if precio_unitario else 0),
@@ -1450,18 +1156,8 @@ def agregar_stock_ajax(request):
                     area_destino=area
                 )
                 
-                # Actualizar stock
-                stock, created = Stock.objects.get_or_create(
-                    producto=producto,
-                    area=area,
-                    defaults={'cantidad': cantidad}
-                )
-                if not created:
-                    stock.cantidad += cantidad
-                    stock.save()
-                
-                # Crear movimiento
-                Movimiento.objects.create(
+                # Actualizar stock y crear movimiento
+                apply_movement(
                     producto=producto,
                     area_destino=area,
                     tipo='ENTRADA',
@@ -1472,15 +1168,11 @@ def agregar_stock_ajax(request):
                     observaciones=f'Entrada: {entrada.numero_entrada}'
                 )
                 
-                # Calcular nuevo stock total
-                nuevo_stock_total = Stock.objects.filter(producto=producto).aggregate(
-                    total=Sum('cantidad')
-                )['total'] or 0
-                
+                # El servicio de stock deja el nuevo total en el producto
                 return JsonResponse({
                     'success': True,
                     'message': f'Stock agregado exitosamente',
-                    'nuevo_stock': str(nuevo_stock_total),
+                    'nuevo_stock': str(producto.stock_total),
                     'recibo': entrada.numero_entrada
                 })
                 
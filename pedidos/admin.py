@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Proveedor, Pedido, DetallePedido, RecepcionPedido, DetalleRecepcion
+from .models import Proveedor, Pedido, DetallePedido, RecepcionPedido, DetalleRecepcion, PropuestaMinimo
 
 
 @admin.register(Proveedor)
@@ -102,3 +102,10 @@ class RecepcionPedidoAdmin(admin.ModelAdmin):
         if not change:
             obj.recibido_por = request.user
         super().save_model(request, obj, form, change)
+
+
+@admin.register(PropuestaMinimo)
+class PropuestaMinimoAdmin(admin.ModelAdmin):
+    list_display = ['producto', 'minimo_actual', 'minimo_sugerido', 'consumo_diario', 'dias_entrega', 'fecha_calculo']
+    search_fields = ['producto__codigo', 'producto__nombre']
+    list_select_related = ['producto']
@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+from django import forms
+from inventario.models import Area, Producto
+from .models import Pedido, DetallePedido, Proveedor
+
+
+class PedidoForm(forms.ModelForm):
+    """Cabecera de un pedido a proveedor"""
+
+    class Meta:
+        model = Pedido
+        fields = ['proveedor', 'fecha_entrega_estimada', 'observaciones']
+        widgets = {
+            'proveedor': forms.Select(attrs={
+                'class': 'form-select'
+            }),
+            'fecha_entrega_estimada': forms.DateInput(attrs={
+                'class': 'form-control',
+                'type': 'date'
+            }),
+            'observaciones': forms.Textarea(attrs={
+                'class': 'form-control',
+                'rows': 2,
+                'placeholder': 'Condiciones, contacto, notas para el proveedor'
+            })
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['proveedor'].queryset = Proveedor.objects.filter(activo=True)
+
+
+class PedidoAlertaForm(PedidoForm):
+    """Pedido de un solo producto armado desde su alerta de stock"""
+    cantidad = forms.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        min_value=Decimal('0.01'),
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '0.01',
+            'step': '0.01'
+        })
+    )
+    precio_unitario = forms.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        min_value=Decimal('0'),
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '0',
+            'step': '0.01'
+        })
+    )
+
+
+class DetallePedidoForm(forms.ModelForm):
+    """Línea de producto de un pedido"""
+
+    class Meta:
+        model = DetallePedido
+        fields = ['producto', 'cantidad_pedida', 'precio_unitario']
+        widgets = {
+            'producto': forms.Select(attrs={
+                'class': 'form-select'
+            }),
+            'cantidad_pedida': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0.01',
+                'step': '0.01',
+                'placeholder': '0.00'
+            }),
+            'precio_unitario': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0',
+                'step': '0.01',
+                'placeholder': '0.00'
+            })
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['producto'].queryset = Producto.objects.filter(activo=True)
+
+
+# Formset para las líneas del pedido
+DetallePedidoFormSet = forms.inlineformset_factory(
+    Pedido,
+    DetallePedido,
+    form=DetallePedidoForm,
+    extra=1,
+    min_num=1,
+    validate_min=True,
+    can_delete=True
+)
+
+
+class RecepcionForm(forms.Form):
+    """Datos generales de una recepción; las cantidades van por línea en la tabla"""
+    area_destino = forms.ModelChoiceField(
+        queryset=Area.objects.filter(activo=True),
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        help_text="Área donde ingresa la mercadería (se puede cambiar por línea)"
+    )
+    observaciones = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={
+            'class': 'form-control',
+            'rows': 2,
+            'placeholder': 'Guía de despacho, estado de la mercadería, faltantes...'
+        })
+    )
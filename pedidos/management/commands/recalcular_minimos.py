@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos.services.minimos import DIAS_HISTORIA, NIVEL_SERVICIO_Z, calcular_minimos
+
+
+class Command(BaseCommand):
+    help = (
+        'Propone el stock mínimo de cada producto como punto de reorden según la variabilidad '
+        'del consumo y los plazos de entrega observados. Las propuestas se revisan y aplican '
+        'desde la pantalla de mínimos sugeridos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_HISTORIA, help='Días de historia a analizar')
+        parser.add_argument(
+            '--z', type=float, default=NIVEL_SERVICIO_Z,
+            help='Factor del nivel de servicio (1.28 ≈ 90 %%, 1.65 ≈ 95 %%, 2.33 ≈ 99 %%)',
+        )
+
+    def handle(self, *args, **options):
+        if options['dias'] < 2 or options['z'] < 0:
+            raise CommandError('--dias debe ser al menos 2 y --z no puede ser negativo.')
+
+        resultado = calcular_minimos(options['dias'], options['z'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.propuestas} propuesta(s) de mínimo entre {resultado.productos} producto(s) con consumo '
+            f'({resultado.segundos:.2f} s).'
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:58
+
+import re
+
+from django.db import migrations
+
+
+def sembrar_contadores(apps, schema_editor):
+    """Arranca cada serie PED-<año> en el mayor número ya emitido"""
+    Pedido = apps.get_model('pedidos', 'Pedido')
+    ContadorDocumento = apps.get_model('inventario', 'ContadorDocumento')
+    patron = re.compile(r'^(PED-\d{4})-(\d+)$')
+
+    ultimos = {}
+    for numero in Pedido.objects.values_list('numero_pedido', flat=True).iterator():
+        coincidencia = patron.match(numero or '')
+        if coincidencia:
+            serie, valor = coincidencia.group(1), int(coincidencia.group(2))
+            ultimos[serie] = max(ultimos.get(serie, 0), valor)
+    for serie, ultimo in ultimos.items():
+        ContadorDocumento.objects.update_or_create(serie=serie, defaults={'ultimo': ultimo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0001_initial'),
+        ('inventario', '0012_contador_documentos'),
+    ]
+
+    operations = [
+        migrations.RunPython(sembrar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0014_pronostico_consumo'),
+        ('pedidos', '0002_numeracion_pedidos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropuestaMinimo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minimo_actual', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('minimo_sugerido', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('consumo_diario', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('desviacion_diaria', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('dias_entrega', models.DecimalField(decimal_places=1, help_text='Plazo de entrega promedio de los pedidos completados', max_digits=6)),
+                ('pedidos_observados', models.PositiveIntegerField(default=0, help_text='Pedidos con fecha de entrega real usados para el plazo (0 = plazo por defecto)')),
+                ('fecha_calculo', models.DateTimeField()),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='propuesta_minimo', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Propuesta de Stock Mínimo',
+                'verbose_name_plural': 'Propuestas de Stock Mínimo',
+                'ordering': ['producto__nombre'],
+            },
+        ),
+    ]
@@ -57,18 +57,17 @@ class Pedido(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.numero_pedido:
-            # Generar número de pedido automático
+            # Número correlativo por año desde el contador de la serie (sin count())
+            from inventario.services.numeracion import numero_documento
             fecha_referencia = self.fecha_pedido or timezone.now()
-            year = fecha_referencia.year
-            count = Pedido.objects.filter(fecha_pedido__year=year).count() + 1
-            self.numero_pedido = f"PED-{year}-{count:04d}"
+            self.numero_pedido = numero_documento('PED', anio=fecha_referencia.year)
         super().save(*args, **kwargs)
     
     def total_pedido(self):
         """Calcula el total del pedido"""
         return self.detalles.aggregate(
             total=models.Sum(
-                models.F('cantidad') * models.F('precio_unitario'),
+                models.F('cantidad_pedida') * models.F('precio_unitario'),
                 output_field=models.DecimalField(max_digits=12, decimal_places=2)
             )
         )['total'] or Decimal('0')
@@ -156,3 +155,35 @@ class DetalleRecepcion(models.Model):
     
     def __str__(self):
         return f"{self.detalle_pedido.producto.nombre} - {self.cantidad_recibida}"
+
+
+class PropuestaMinimo(models.Model):
+    """Punto de reorden sugerido para un producto (ver services/minimos.py).
+
+    Las genera el comando `recalcular_minimos` y se revisan en la pantalla de
+    mínimos sugeridos; al aplicarlas pasan a `Producto.stock_minimo` y se borran.
+    """
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='propuesta_minimo')
+    minimo_actual = models.DecimalField(max_digits=10, decimal_places=2)
+    minimo_sugerido = models.DecimalField(max_digits=10, decimal_places=2)
+    consumo_diario = models.DecimalField(max_digits=12, decimal_places=3)
+    desviacion_diaria = models.DecimalField(max_digits=12, decimal_places=3)
+    dias_entrega = models.DecimalField(
+        max_digits=6, decimal_places=1, help_text="Plazo de entrega promedio de los pedidos completados"
+    )
+    pedidos_observados = models.PositiveIntegerField(
+        default=0, help_text="Pedidos con fecha de entrega real usados para el plazo (0 = plazo por defecto)"
+    )
+    fecha_calculo = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Propuesta de Stock Mínimo"
+        verbose_name_plural = "Propuestas de Stock Mínimo"
+        ordering = ['producto__nombre']
+
+    def __str__(self):
+        return f"{self.producto.nombre}: {self.minimo_actual} → {self.minimo_sugerido}"
+
+    @property
+    def diferencia(self):
+        return self.minimo_sugerido - self.minimo_actual
@@ -0,0 +1 @@
+"""Servicios de pedidos a proveedores (recepción de mercadería)."""
@@ -0,0 +1,158 @@
+"""Stock mínimo sugerido como punto de reorden.
+
+Para cada producto con salidas en el período analizado:
+
+    mínimo = d·L + z·√(L·σd² + d²·σL²)
+
+donde `d` y `σd` son la media y la desviación del consumo diario (todas las
+áreas, días sin salidas incluidos), `L` y `σL` la media y la desviación del
+plazo de entrega observado (`fecha_pedido` → `fecha_entrega_real` de los pedidos
+completados que lo incluyeron) y `z` el factor del nivel de servicio. Sin
+historial de entregas se usa la mediana de todos los plazos observados, o
+`DIAS_ENTREGA_DEFECTO` si no hay ninguno.
+
+El cálculo lee la historia en dos consultas (salidas diarias agrupadas y plazos
+por producto) y opera sobre arreglos NumPy; las propuestas se escriben en bloque
+en `PropuestaMinimo` para revisarlas antes de aplicarlas.
+"""
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import ROUND_CEILING, Decimal
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from inventario.models import Producto
+from inventario.services.alertas import evaluar_alertas_generales
+from inventario.services.pronostico import matriz_consumo
+from inventario.services.version import incrementar_version
+
+from ..models import DetallePedido, PropuestaMinimo
+
+
+DIAS_HISTORIA = 180
+NIVEL_SERVICIO_Z = 1.65  # ~95 % de ciclos sin quiebre
+DIAS_ENTREGA_DEFECTO = 7
+TAMANO_LOTE = 1000
+
+
+@dataclass
+class ResultadoMinimos:
+    productos: int
+    propuestas: int
+    segundos: float
+
+
+def plazos_entrega(desde):
+    """Plazos de entrega observados desde `desde`, en días.
+
+    Devuelve `(por_producto, mediana)`: `{producto_id: (media, desviación, pedidos)}`
+    y la mediana de todos los plazos (`None` si no hay entregas).
+    """
+    import numpy as np
+
+    filas = list(
+        DetallePedido.objects.filter(
+            pedido__estado='COMPLETADO', pedido__fecha_entrega_real__isnull=False, pedido__fecha_pedido__gte=desde,
+        ).values_list('producto_id', 'pedido__fecha_pedido', 'pedido__fecha_entrega_real').order_by()
+    )
+    if not filas:
+        return {}, None
+
+    productos = np.fromiter((f[0] for f in filas), dtype=np.int64, count=len(filas))
+    plazos = np.fromiter(
+        (max((f[2] - timezone.localdate(f[1])).days, 0) for f in filas), dtype=np.float64, count=len(filas),
+    )
+    ids, indice, conteos = np.unique(productos, return_inverse=True, return_counts=True)
+    medias = np.bincount(indice, weights=plazos) / conteos
+    varianzas = np.bincount(indice, weights=(plazos - medias[indice]) ** 2) / np.maximum(conteos - 1, 1)
+    por_producto = {
+        pid: (media, desviacion, pedidos)
+        for pid, media, desviacion, pedidos in zip(
+            ids.tolist(), medias.tolist(), np.sqrt(varianzas).tolist(), conteos.tolist()
+        )
+    }
+    return por_producto, float(np.median(plazos))
+
+
+def calcular_minimos(dias=DIAS_HISTORIA, z=NIVEL_SERVICIO_Z, productos=None):
+    """Reemplaza las propuestas de mínimo y devuelve un `ResultadoMinimos`.
+
+    Solo se proponen productos activos cuyo mínimo redondeado cambia; el resto
+    de las propuestas previas se borra.
+    """
+    import numpy as np
+
+    inicio = time.perf_counter()
+    ahora = timezone.now()
+    hoy = timezone.localdate(ahora)
+    producto_ids, _, matriz, _ = matriz_consumo(dias, por_area=False, hoy=hoy)
+    consumo = matriz.mean(axis=1)
+    desviacion = matriz.std(axis=1, ddof=1) if dias > 1 else np.zeros(len(producto_ids))
+
+    plazos, mediana = plazos_entrega(ahora - timedelta(days=dias))
+    defecto = (mediana if mediana is not None else DIAS_ENTREGA_DEFECTO, 0.0, 0)
+    por_producto = np.array([plazos.get(pid, defecto) for pid in producto_ids.tolist()], dtype=np.float64)
+    plazo, desviacion_plazo, pedidos = por_producto.reshape(-1, 3).T
+    seguridad = z * np.sqrt(plazo * desviacion ** 2 + consumo ** 2 * desviacion_plazo ** 2)
+    sugeridos = consumo * plazo + seguridad
+
+    activos = Producto.objects.filter(activo=True)
+    if productos is not None:
+        activos = activos.filter(pk__in=productos)
+    minimos = dict(activos.values_list('pk', 'stock_minimo'))
+
+    propuestas = []
+    for pid, sugerido, d, sd, lt, n in zip(
+        producto_ids.tolist(), sugeridos.tolist(), consumo.tolist(), desviacion.tolist(),
+        plazo.tolist(), pedidos.tolist(),
+    ):
+        if pid not in minimos:
+            continue
+        # Mínimos en unidades enteras, redondeando hacia arriba como la reposición
+        minimo = Decimal(format(sugerido, '.3f')).quantize(Decimal('1'), rounding=ROUND_CEILING)
+        if minimo == minimos[pid]:
+            continue
+        propuestas.append(PropuestaMinimo(
+            producto_id=pid, minimo_actual=minimos[pid], minimo_sugerido=minimo,
+            consumo_diario=Decimal(format(d, '.3f')), desviacion_diaria=Decimal(format(sd, '.3f')),
+            dias_entrega=Decimal(format(lt, '.1f')), pedidos_observados=int(n), fecha_calculo=ahora,
+        ))
+
+    with transaction.atomic():
+        anteriores = PropuestaMinimo.objects.all()
+        if productos is not None:
+            anteriores = anteriores.filter(producto__in=productos)
+        anteriores.delete()
+        PropuestaMinimo.objects.bulk_create(propuestas, batch_size=TAMANO_LOTE)
+
+    return ResultadoMinimos(
+        productos=len(producto_ids), propuestas=len(propuestas), segundos=time.perf_counter() - inicio,
+    )
+
+
+def aplicar_propuestas(productos=None):
+    """Copia las propuestas (todas, o las de `productos`) a `Producto.stock_minimo`.
+
+    Un solo UPDATE con subconsulta; después se reevalúan las alertas generales de
+    esos productos, se avanza la versión del inventario y se borran las
+    propuestas aplicadas. Devuelve cuántos productos cambiaron.
+    """
+    with transaction.atomic():
+        propuestas = PropuestaMinimo.objects.all()
+        if productos is not None:
+            propuestas = propuestas.filter(producto__in=productos)
+        afectados = propuestas.values('producto_id')
+        actualizados = Producto.objects.filter(pk__in=afectados).update(
+            stock_minimo=Subquery(
+                PropuestaMinimo.objects.filter(producto=OuterRef('pk')).values('minimo_sugerido')[:1]
+            ),
+        )
+        if actualizados:
+            # El UPDATE no pasa por Producto.save ni por sus señales
+            evaluar_alertas_generales(afectados)
+            incrementar_version()
+            propuestas.delete()
+    return actualizados
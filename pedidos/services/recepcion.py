@@ -0,0 +1,151 @@
+"""Recepción de pedidos a proveedores.
+
+`registrar_recepcion` guarda una `RecepcionPedido` completa en una transacción y
+con un número fijo de consultas, sin importar cuántas líneas traiga:
+
+- los `DetalleRecepcion` se insertan con `bulk_create`;
+- `DetallePedido.cantidad_recibida` se suma con un solo UPDATE (`F` + CASE por
+  línea), sin leer y guardar cada detalle;
+- el stock entra como una `EntradaStock` de la serie REC por el servicio de
+  entradas, que inserta detalles y movimientos en bloque y aplica los saldos
+  agrupados (totales, alertas y versión de datos incluidos);
+- el nuevo estado del pedido (PARCIAL o COMPLETADO) sale de un único agregado
+  sobre sus líneas.
+
+El pedido se bloquea con `select_for_update` mientras dura la recepción: dos
+personas recibiendo el mismo pedido a la vez no pueden pasarse de lo pedido.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from inventario.models import Area, DetalleEntradaStock, EntradaStock
+from inventario.services.entradas import registrar_entrada
+from inventario.services.numeracion import numero_documento
+
+from ..models import DetallePedido, DetalleRecepcion, Pedido, RecepcionPedido
+
+
+ESTADOS_RECIBIBLES = ('ENVIADO', 'CONFIRMADO', 'PARCIAL')
+
+
+class RecepcionInvalida(ValueError):
+    """La recepción no se puede registrar (estado del pedido o cantidades)"""
+
+
+@dataclass
+class LineaRecepcion:
+    detalle_id: int
+    cantidad: Decimal
+    area_id: int
+    observaciones: str = ''
+
+
+@dataclass
+class ResultadoRecepcion:
+    recepcion: RecepcionPedido
+    entrada: EntradaStock
+    estado: str
+    lineas: int
+
+
+def _validar(pedido, lineas, detalles, areas):
+    errores = []
+    vistas = set()
+    for linea in lineas:
+        detalle = detalles.get(linea.detalle_id)
+        if detalle is None:
+            errores.append(f'La línea {linea.detalle_id} no pertenece al pedido {pedido.numero_pedido}.')
+            continue
+        nombre = detalle.producto.nombre
+        if linea.detalle_id in vistas:
+            errores.append(f'{nombre}: aparece más de una vez.')
+        vistas.add(linea.detalle_id)
+        if not linea.cantidad.is_finite() or linea.cantidad.normalize().as_tuple().exponent < -2:
+            errores.append(f'{nombre}: cantidad no válida (máximo 2 decimales).')
+        elif linea.cantidad <= 0:
+            errores.append(f'{nombre}: la cantidad debe ser mayor a 0.')
+        elif linea.cantidad > detalle.cantidad_pendiente():
+            errores.append(f'{nombre}: se reciben {linea.cantidad} y quedan {detalle.cantidad_pendiente()} pendientes.')
+        if linea.area_id not in areas:
+            errores.append(f'{nombre}: falta un área de destino válida.')
+    return errores
+
+
+def registrar_recepcion(pedido, lineas, usuario, observaciones=''):
+    """Registra la recepción de `lineas` (`LineaRecepcion`) del pedido e ingresa el stock.
+
+    Las líneas con cantidad 0 se ignoran. Lanza `RecepcionInvalida` sin escribir
+    nada si el pedido no admite recepciones o alguna línea no es válida.
+    Devuelve un `ResultadoRecepcion`.
+    """
+    lineas = [linea for linea in lineas if linea.cantidad]
+    if not lineas:
+        raise RecepcionInvalida('Indica la cantidad recibida de al menos un producto.')
+
+    with transaction.atomic():
+        pedido = Pedido.objects.select_for_update().select_related('proveedor').get(pk=pedido.pk)
+        if pedido.estado not in ESTADOS_RECIBIBLES:
+            raise RecepcionInvalida(
+                f'El pedido {pedido.numero_pedido} está {pedido.get_estado_display().lower()}: no admite recepciones.'
+            )
+        detalles = DetallePedido.objects.filter(pedido=pedido).select_related('producto').in_bulk(
+            [linea.detalle_id for linea in lineas]
+        )
+        areas = Area.objects.filter(activo=True).in_bulk({linea.area_id for linea in lineas if linea.area_id})
+        errores = _validar(pedido, lineas, detalles, areas)
+        if errores:
+            raise RecepcionInvalida(' '.join(errores))
+
+        recepcion = RecepcionPedido.objects.create(
+            pedido=pedido, recibido_por=usuario, observaciones=observaciones or None,
+        )
+        DetalleRecepcion.objects.bulk_create([
+            DetalleRecepcion(
+                recepcion=recepcion, detalle_pedido=detalles[linea.detalle_id],
+                cantidad_recibida=linea.cantidad, observaciones=linea.observaciones or None,
+            )
+            for linea in lineas
+        ])
+        DetallePedido.objects.filter(pk__in=detalles).update(
+            cantidad_recibida=F('cantidad_recibida') + Case(
+                *[When(pk=linea.detalle_id, then=Value(linea.cantidad)) for linea in lineas],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+        entrada = EntradaStock(
+            numero_entrada=numero_documento('REC'),
+            tipo='COMPRA',
+            fecha_compra=timezone.localdate(),
+            total_compra=sum(linea.cantidad * detalles[linea.detalle_id].precio_unitario for linea in lineas),
+            observaciones=f'Recepción del pedido {pedido.numero_pedido} ({pedido.proveedor.razon_social})',
+            registrado_por=usuario,
+        )
+        registrar_entrada(
+            entrada,
+            [
+                DetalleEntradaStock(
+                    producto=detalles[linea.detalle_id].producto,
+                    area_destino=areas[linea.area_id],
+                    cantidad=linea.cantidad,
+                    precio_unitario=detalles[linea.detalle_id].precio_unitario,
+                )
+                for linea in lineas
+            ],
+            usuario,
+            observaciones=f'Recepción pedido {pedido.numero_pedido}: {{numero}}',
+        )
+
+        pendientes = DetallePedido.objects.filter(pedido=pedido).aggregate(
+            pendientes=Count('pk', filter=Q(cantidad_recibida__lt=F('cantidad_pedida')))
+        )['pendientes']
+        cambios = {'estado': 'PARCIAL' if pendientes else 'COMPLETADO', 'fecha_actualizacion': timezone.now()}
+        if not pendientes:
+            cambios['fecha_entrega_real'] = timezone.localdate()
+        Pedido.objects.filter(pk=pedido.pk).update(**cambios)
+
+    return ResultadoRecepcion(recepcion=recepcion, entrada=entrada, estado=cambios['estado'], lineas=len(lineas))
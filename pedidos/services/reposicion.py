@@ -0,0 +1,216 @@
+"""Sugerencias de reposición a partir de las alertas de stock.
+
+En una pasada sobre las alertas generales activas calcula cuánto pedir de cada
+producto:
+
+    sugerido = stock_minimo × factor de cobertura − stock_total − en camino
+
+donde "en camino" es lo pendiente de recibir en pedidos abiertos (incluidos los
+borradores, para que correr el planificador dos veces no duplique pedidos).
+Cada línea se asigna al proveedor al que más se le ha comprado el producto (el
+más reciente en caso de empate) con el último precio pactado con él, y
+`generar_borradores` crea un pedido BORRADOR por proveedor con `bulk_create`.
+El historial sale de los pedidos; los productos que nunca se pidieron por este
+módulo usan las compras registradas como entradas de stock, cuyo proveedor (el
+`Proveedor` de inventario) se cruza con el de pedidos por nombre.
+
+El costo es un número fijo de consultas sin importar cuántas alertas haya: una
+para productos en falta con lo que tienen en camino, dos para el historial de
+pedidos y de entradas, una para los proveedores de pedidos, una para reservar el
+bloque de números de pedido y los INSERT en bloque. La generación se serializa
+con el contador de pedidos del año.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import ROUND_CEILING, Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, Exists, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventario.models import AlertaStock, DetalleEntradaStock, Producto
+from inventario.services.numeracion import numeros_documento, serie_documento, siguiente_valor
+
+from ..models import DetallePedido, Pedido, Proveedor
+
+
+FACTOR_COBERTURA = Decimal('2')
+ESTADOS_ABIERTOS = ('BORRADOR', 'ENVIADO', 'CONFIRMADO', 'PARCIAL')
+CERO = Decimal('0')
+TAMANO_LOTE = 500
+
+
+@dataclass
+class Sugerencia:
+    producto: Producto
+    cantidad: Decimal
+    en_camino: Decimal
+    proveedor_id: int | None = None
+    precio_unitario: Decimal | None = None
+
+
+@dataclass
+class Plan:
+    por_proveedor: dict = field(default_factory=dict)  # {Proveedor: [Sugerencia, ...]}
+    sin_proveedor: list = field(default_factory=list)
+
+    @property
+    def lineas(self):
+        return sum(len(sugerencias) for sugerencias in self.por_proveedor.values())
+
+
+@dataclass
+class ResultadoReposicion:
+    pedidos: list
+    lineas: int
+    sin_proveedor: list
+
+
+def _en_camino():
+    """Subconsulta con lo pendiente de recibir del producto externo en pedidos abiertos"""
+    pendientes = DetallePedido.objects.filter(
+        producto=OuterRef('pk'), pedido__estado__in=ESTADOS_ABIERTOS
+    ).order_by().values('producto').annotate(
+        total=Sum(F('cantidad_pedida') - F('cantidad_recibida'))
+    ).values('total')
+    return Coalesce(Subquery(pendientes), CERO, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def productos_a_reponer(productos=None):
+    """Productos activos con alerta general activa, anotados con `en_camino`"""
+    en_falta = Producto.objects.filter(activo=True).filter(
+        Exists(AlertaStock.objects.filter(producto=OuterRef('pk'), estado='ACTIVA', area__isnull=True))
+    )
+    if productos is not None:
+        en_falta = en_falta.filter(pk__in=productos)
+    return en_falta.annotate(en_camino=_en_camino()).order_by('nombre')
+
+
+def mejores_proveedores(productos):
+    """`{producto_id: (proveedor_id, último precio)}` según el historial de pedidos no cancelados.
+
+    `productos` puede ser un queryset: el historial se filtra con una subconsulta,
+    sin listas de ids en la sentencia.
+    """
+    ultimo_precio = DetallePedido.objects.filter(
+        producto_id=OuterRef('producto_id'), pedido__proveedor_id=OuterRef('pedido__proveedor_id'),
+    ).exclude(pedido__estado='CANCELADO').order_by('-pedido__fecha_pedido').values('precio_unitario')[:1]
+    historial = DetallePedido.objects.filter(
+        producto__in=productos, pedido__proveedor__activo=True,
+    ).exclude(pedido__estado='CANCELADO').values('producto_id', 'pedido__proveedor_id').annotate(
+        veces=Count('pk'), ultima=Max('pedido__fecha_pedido'), precio=Subquery(ultimo_precio),
+    ).order_by()
+
+    mejores = {}
+    for fila in historial:
+        actual = mejores.get(fila['producto_id'])
+        if actual is None or (fila['veces'], fila['ultima']) > (actual['veces'], actual['ultima']):
+            mejores[fila['producto_id']] = fila
+    return {pid: (fila['pedido__proveedor_id'], fila['precio']) for pid, fila in mejores.items()}
+
+
+def _nombre(texto):
+    return ' '.join((texto or '').split()).lower()
+
+
+def proveedores_por_entradas(productos):
+    """`{producto_id: (proveedor_id, último precio)}` desde las compras registradas como entradas de stock.
+
+    Las entradas apuntan al `Proveedor` de inventario; se traduce al de pedidos
+    por nombre (`razon_social`, sin distinguir mayúsculas ni espacios). Las
+    compras a proveedores sin equivalente activo en pedidos se ignoran.
+    """
+    ultimo_precio = DetalleEntradaStock.objects.filter(
+        producto_id=OuterRef('producto_id'), entrada__proveedor_id=OuterRef('entrada__proveedor_id'),
+        entrada__tipo='COMPRA', precio_unitario__isnull=False,
+    ).order_by('-entrada__fecha_compra', '-pk').values('precio_unitario')[:1]
+    historial = DetalleEntradaStock.objects.filter(
+        producto__in=productos, entrada__tipo='COMPRA', entrada__proveedor__isnull=False,
+    ).values('producto_id', 'entrada__proveedor_id', 'entrada__proveedor__nombre').annotate(
+        veces=Count('pk'), ultima=Max('entrada__fecha_compra'), precio=Subquery(ultimo_precio),
+    ).order_by()
+
+    equivalentes = {
+        _nombre(razon_social): pk
+        for pk, razon_social in Proveedor.objects.filter(activo=True).order_by('-pk').values_list('pk', 'razon_social')
+    }
+    mejores = {}
+    for fila in historial:
+        proveedor_id = equivalentes.get(_nombre(fila['entrada__proveedor__nombre']))
+        if proveedor_id is None:
+            continue
+        actual = mejores.get(fila['producto_id'])
+        if actual is None or (fila['veces'], fila['ultima']) > (actual['veces'], actual['ultima']):
+            mejores[fila['producto_id']] = {**fila, 'proveedor_id': proveedor_id}
+    return {pid: (fila['proveedor_id'], fila['precio']) for pid, fila in mejores.items()}
+
+
+def planificar(factor=FACTOR_COBERTURA, productos=None):
+    """Calcula las líneas sugeridas agrupadas por proveedor (no escribe nada)"""
+    factor = Decimal(str(factor))
+    candidatos = productos_a_reponer(productos)
+    proveedores_por_producto = {
+        # El historial de pedidos manda; las entradas cubren lo que nunca se pidió por este módulo
+        **proveedores_por_entradas(candidatos.values('pk')),
+        **mejores_proveedores(candidatos.values('pk')),
+    }
+
+    plan = Plan()
+    agrupadas = defaultdict(list)
+    for producto in candidatos:
+        cantidad = producto.stock_minimo * factor - producto.stock_total - producto.en_camino
+        if cantidad <= 0:
+            continue
+        sugerencia = Sugerencia(
+            producto=producto,
+            # Se pide en unidades enteras, redondeando hacia arriba
+            cantidad=cantidad.quantize(Decimal('1'), rounding=ROUND_CEILING),
+            en_camino=producto.en_camino,
+        )
+        if producto.pk in proveedores_por_producto:
+            sugerencia.proveedor_id, precio = proveedores_por_producto[producto.pk]
+            sugerencia.precio_unitario = precio if precio is not None else producto.precio_unitario
+            agrupadas[sugerencia.proveedor_id].append(sugerencia)
+        else:
+            plan.sin_proveedor.append(sugerencia)
+
+    proveedores = Proveedor.objects.in_bulk(list(agrupadas))
+    plan.por_proveedor = {proveedores[pid]: lineas for pid, lineas in agrupadas.items()}
+    return plan
+
+
+def generar_borradores(usuario, factor=FACTOR_COBERTURA, productos=None, observaciones=None):
+    """Crea un pedido BORRADOR por proveedor con las líneas sugeridas.
+
+    Devuelve un `ResultadoReposicion`; los productos sin historial de compras
+    quedan en `sin_proveedor` para pedirlos a mano.
+    """
+    anio = timezone.now().year
+    with transaction.atomic():
+        # El UPDATE del contador de pedidos deja su fila bloqueada hasta confirmar: dos
+        # planificaciones simultáneas se serializan y la segunda ve los borradores de la primera
+        siguiente_valor(serie_documento('PED', anio), 0)
+        plan = planificar(factor, productos)
+        if not plan.por_proveedor:
+            return ResultadoReposicion(pedidos=[], lineas=0, sin_proveedor=plan.sin_proveedor)
+
+        numeros = numeros_documento('PED', len(plan.por_proveedor), anio=anio)
+        pedidos = [
+            Pedido(
+                numero_pedido=numero, proveedor=proveedor, estado='BORRADOR', creado_por=usuario,
+                observaciones=observaciones or f'Sugerido por reposición automática (cobertura ×{factor}).',
+            )
+            for numero, proveedor in zip(numeros, plan.por_proveedor)
+        ]
+        Pedido.objects.bulk_create(pedidos, batch_size=TAMANO_LOTE)
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido, producto=sugerencia.producto,
+                cantidad_pedida=sugerencia.cantidad, precio_unitario=sugerencia.precio_unitario or CERO,
+            )
+            for pedido, sugerencias in zip(pedidos, plan.por_proveedor.values())
+            for sugerencia in sugerencias
+        ], batch_size=TAMANO_LOTE)
+
+    return ResultadoReposicion(pedidos=pedidos, lineas=plan.lineas, sin_proveedor=plan.sin_proveedor)
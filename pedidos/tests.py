@@ -1,3 +1,294 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from inventario.models import Area, Categoria, ContadorDocumento, Movimiento, Producto, Stock
+
+from .models import DetallePedido, Pedido, Proveedor
+
+
+class NumeracionPedidosTests(TestCase):
+    """Los números de pedido salen del contador de la serie del año"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('compras', password='clave')
+        cls.proveedor = Proveedor.objects.create(razon_social='Distribuidora de prueba')
+
+    def test_correlativo_por_anio_sin_contar(self):
+        anio = timezone.now().year
+        # Serie sembrada (p. ej. por la migración) con pedidos ya emitidos
+        ContadorDocumento.objects.create(serie=f'PED-{anio}', ultimo=41)
+
+        with self.assertNumQueries(2):
+            # UPDATE ... RETURNING del contador + INSERT del pedido
+            primero = Pedido.objects.create(proveedor=self.proveedor, creado_por=self.usuario)
+        segundo = Pedido.objects.create(proveedor=self.proveedor, creado_por=self.usuario)
+
+        self.assertEqual(primero.numero_pedido, f'PED-{anio}-0042')
+        self.assertEqual(segundo.numero_pedido, f'PED-{anio}-0043')
+        self.assertEqual(ContadorDocumento.objects.get(serie=f'PED-{anio}').ultimo, 43)
+
+
+class RecepcionPedidosTests(TestCase):
+    """Una recepción registra todas sus líneas y el stock en bloque"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('bodeguero', password='clave')
+        proveedor = Proveedor.objects.create(razon_social='Frutas del Valle')
+        categoria = Categoria.objects.create(nombre='Frutas de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega frutas', tipo='BODEGA')
+        cls.cocina = Area.objects.create(nombre='Cocina frutas', tipo='COCINA')
+        cls.pedido = Pedido.objects.create(proveedor=proveedor, creado_por=cls.usuario, estado='ENVIADO')
+        cls.detalles = []
+        for i, nombre in enumerate(['Manzana', 'Pera', 'Plátano']):
+            producto = Producto.objects.create(
+                codigo=f'FRU-{i:03d}', nombre=nombre, categoria=categoria,
+                unidad_medida='KG', stock_minimo=Decimal('0'), precio_unitario=Decimal('1200'),
+            )
+            cls.detalles.append(DetallePedido.objects.create(
+                pedido=cls.pedido, producto=producto,
+                cantidad_pedida=Decimal('10'), precio_unitario=Decimal('1000'),
+            ))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _recibir(self, **campos):
+        datos = {'area_destino': self.bodega.pk, **campos}
+        return self.client.post(reverse('pedidos:recibir', args=[self.pedido.pk]), datos)
+
+    def test_recepcion_parcial_y_completa(self):
+        manzana, pera, platano = self.detalles
+        self._recibir(**{
+            f'cantidad_{manzana.pk}': '10', f'cantidad_{pera.pk}': '4',
+            f'area_{pera.pk}': self.cocina.pk,
+        })
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado, 'PARCIAL')
+        pera.refresh_from_db()
+        self.assertEqual(pera.cantidad_recibida, Decimal('4'))
+        self.assertEqual(Stock.objects.get(producto=pera.producto, area=self.cocina).cantidad, Decimal('4'))
+        self.assertEqual(Movimiento.objects.filter(entrada__isnull=False).count(), 2)
+
+        self._recibir(**{f'cantidad_{pera.pk}': '6', f'cantidad_{platano.pk}': '10'})
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado, 'COMPLETADO')
+        self.assertIsNotNone(self.pedido.fecha_entrega_real)
+        self.assertEqual(self.pedido.recepciones.count(), 2)
+        self.assertEqual(Producto.objects.get(pk=pera.producto_id).stock_total, Decimal('10'))
+
+    def test_no_permite_recibir_de_mas(self):
+        manzana = self.detalles[0]
+        respuesta = self._recibir(**{f'cantidad_{manzana.pk}': '11'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(self.pedido.recepciones.exists())
+        self.assertFalse(Stock.objects.filter(producto=manzana.producto).exists())
+
+    def test_filtro_de_proveedor_no_numerico_se_ignora(self):
+        url = reverse('pedidos:lista')
+        self.assertEqual(len(self.client.get(url, {'proveedor': 'abc'}).context['pedidos']), 1)
+        respuesta = self.client.get(url, {'proveedor': self.pedido.proveedor_id})
+        self.assertEqual(list(respuesta.context['pedidos']), [self.pedido])
+
+    def test_cantidades_no_finitas_o_con_mas_de_dos_decimales(self):
+        manzana, pera, _ = self.detalles
+        for valor in ('NaN', 'sNaN', 'Infinity', '1.005'):
+            respuesta = self._recibir(**{f'cantidad_{manzana.pk}': valor, f'cantidad_{pera.pk}': '2'})
+            self.assertEqual(respuesta.status_code, 200, valor)
+            self.assertContains(respuesta, 'Manzana: ')
+        self.assertFalse(self.pedido.recepciones.exists())
+        self.assertFalse(Stock.objects.exists())
+
+
+class ReposicionTests(TestCase):
+    """El planificador arma borradores por proveedor desde las alertas activas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('comprador', password='clave')
+        cls.habitual = Proveedor.objects.create(razon_social='Proveedor habitual')
+        cls.ocasional = Proveedor.objects.create(razon_social='Proveedor ocasional')
+        categoria = Categoria.objects.create(nombre='Abarrotes de prueba')
+        cls.productos = [
+            Producto.objects.create(
+                codigo=f'ABA-{i:03d}', nombre=f'Abarrote {i}', categoria=categoria,
+                unidad_medida='UN', stock_minimo=Decimal('5'), precio_unitario=Decimal('100'),
+            )
+            for i in range(3)
+        ]
+        arroz, azucar, _ = cls.productos
+        # Historial: arroz se compra más al habitual; el azúcar solo al ocasional y aún viene en camino
+        for proveedor, producto, precio, estado in (
+            (cls.habitual, arroz, '90', 'COMPLETADO'),
+            (cls.habitual, arroz, '95', 'COMPLETADO'),
+            (cls.ocasional, arroz, '80', 'COMPLETADO'),
+            (cls.ocasional, azucar, '120', 'ENVIADO'),
+        ):
+            pedido = Pedido.objects.create(proveedor=proveedor, creado_por=cls.usuario, estado=estado)
+            DetallePedido.objects.create(
+                pedido=pedido, producto=producto, cantidad_pedida=Decimal('3'), precio_unitario=Decimal(precio),
+                cantidad_recibida=Decimal('3') if estado == 'COMPLETADO' else Decimal('0'),
+            )
+
+    def test_genera_borradores_una_vez(self):
+        from .services.reposicion import generar_borradores
+
+        with self.assertNumQueries(11):
+            resultado = generar_borradores(self.usuario, factor=2)
+
+        arroz, azucar, sin_historial = self.productos
+        self.assertEqual([s.producto for s in resultado.sin_proveedor], [sin_historial])
+        lineas = DetallePedido.objects.filter(pedido__in=resultado.pedidos)
+        self.assertEqual(
+            {(l.producto_id, l.pedido.proveedor_id, l.cantidad_pedida, l.precio_unitario) for l in lineas},
+            {
+                # 5 × 2 − 0 de stock, al último precio del proveedor habitual
+                (arroz.pk, self.habitual.pk, Decimal('10'), Decimal('95')),
+                # 10 − 3 que ya vienen en camino
+                (azucar.pk, self.ocasional.pk, Decimal('7'), Decimal('120')),
+            },
+        )
+        self.assertTrue(all(p.estado == 'BORRADOR' and p.numero_pedido for p in resultado.pedidos))
+
+        # Los borradores cuentan como en camino: una segunda pasada no duplica
+        self.assertEqual(generar_borradores(self.usuario, factor=2).pedidos, [])
+
+    def test_proveedor_desde_las_entradas_de_stock(self):
+        from datetime import date
+
+        from inventario.models import DetalleEntradaStock, EntradaStock, Proveedor as ProveedorInventario
+
+        from .services.reposicion import planificar
+
+        arroz, _, sin_pedidos = self.productos
+        bodega = Area.objects.create(nombre='Bodega abarrotes', tipo='BODEGA')
+        # Mismo proveedor registrado en inventario con otro formato de nombre
+        habitual = ProveedorInventario.objects.create(nombre='PROVEEDOR  Habitual', rut='76.111.111-1')
+        desconocido = ProveedorInventario.objects.create(nombre='Sin equivalente', rut='76.222.222-2')
+        for proveedor, producto, precio, fecha in (
+            (habitual, sin_pedidos, '130', date(2026, 3, 1)),
+            (habitual, sin_pedidos, '135', date(2026, 4, 1)),
+            (desconocido, sin_pedidos, '50', date(2026, 5, 1)),
+            (desconocido, sin_pedidos, '50', date(2026, 5, 2)),
+            (desconocido, sin_pedidos, '50', date(2026, 5, 3)),
+            # El historial de pedidos tiene prioridad sobre las entradas
+            (habitual, arroz, '10', date(2026, 5, 1)),
+        ):
+            entrada = EntradaStock.objects.create(
+                proveedor=proveedor, fecha_compra=fecha, registrado_por=self.usuario,
+            )
+            DetalleEntradaStock.objects.create(
+                entrada=entrada, producto=producto, area_destino=bodega,
+                cantidad=Decimal('1'), precio_unitario=Decimal(precio),
+            )
+
+        plan = planificar(factor=2)
+        self.assertEqual(plan.sin_proveedor, [])
+        lineas = {s.producto: s for s in plan.por_proveedor[self.habitual]}
+        self.assertEqual(lineas[sin_pedidos].precio_unitario, Decimal('135'))
+        self.assertEqual(lineas[arroz].precio_unitario, Decimal('95'))
+
+    def test_pantalla_de_sugerencias(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('pedidos:reposicion'), {'factor': '3'})
+        self.assertContains(respuesta, 'Proveedor habitual')
+        self.assertContains(respuesta, 'Abarrote 2')  # sin historial
+        self.assertFalse(Pedido.objects.filter(estado='BORRADOR').exists())
+        for factor in ('nan', 'sNaN', 'Infinity'):
+            respuesta = self.client.get(reverse('pedidos:reposicion'), {'factor': factor})
+            self.assertEqual(respuesta.context['factor'], Decimal('2'), factor)
+
+    def test_pedido_desde_una_alerta(self):
+        arroz = self.productos[0]
+        self.client.force_login(self.usuario)
+        url = reverse('pedidos:desde_alerta', args=[arroz.pk])
+        inicial = self.client.get(url).context['form'].initial
+        self.assertEqual(
+            (inicial['proveedor'], inicial['cantidad'], inicial['precio_unitario']),
+            (self.habitual.pk, Decimal('10'), Decimal('95')),
+        )
+
+        respuesta = self.client.post(url, {'proveedor': self.habitual.pk, 'cantidad': '12', 'precio_unitario': '95'})
+        linea = DetallePedido.objects.get(pedido__estado='BORRADOR')
+        self.assertRedirects(respuesta, reverse('pedidos:detalle', args=[linea.pedido_id]))
+        self.assertEqual((linea.producto, linea.cantidad_pedida), (arroz, Decimal('12')))
+
+
+class MinimosSugeridosTests(TestCase):
+    """Los mínimos se proponen desde el consumo y el plazo de entrega, y se aplican en bloque"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import timedelta
+
+        cls.usuario = User.objects.create_user('planificacion', password='clave')
+        proveedor = Proveedor.objects.create(razon_social='Proveedor de aceite')
+        categoria = Categoria.objects.create(nombre='Aceites de prueba')
+        cocina = Area.objects.create(nombre='Cocina aceites', tipo='COCINA')
+        cls.producto = Producto.objects.create(
+            codigo='ACE-001', nombre='Aceite', categoria=categoria,
+            unidad_medida='LT', stock_minimo=Decimal('5'), precio_unitario=Decimal('2500'),
+        )
+        ahora = timezone.now()
+        for dias_atras in range(10):
+            movimiento = Movimiento.objects.create(
+                producto=cls.producto, area_origen=cocina, tipo='SALIDA', motivo='CONSUMO',
+                cantidad=Decimal('2'), usuario=cls.usuario,
+            )
+            Movimiento.objects.filter(pk=movimiento.pk).update(fecha=ahora - timedelta(days=dias_atras))
+        # Un pedido completado que tardó 4 días en llegar
+        pedido = Pedido.objects.create(proveedor=proveedor, creado_por=cls.usuario, estado='COMPLETADO')
+        Pedido.objects.filter(pk=pedido.pk).update(
+            fecha_pedido=ahora - timedelta(days=4), fecha_entrega_real=timezone.localdate(ahora),
+        )
+        DetallePedido.objects.create(
+            pedido=pedido, producto=cls.producto, cantidad_pedida=Decimal('10'),
+            cantidad_recibida=Decimal('10'), precio_unitario=Decimal('2400'),
+        )
+
+    def test_propone_y_aplica_todas(self):
+        from inventario.models import AlertaStock
+
+        from .models import PropuestaMinimo
+        from .services.minimos import calcular_minimos
+
+        resultado = calcular_minimos(dias=10)
+
+        self.assertEqual((resultado.productos, resultado.propuestas), (1, 1))
+        propuesta = PropuestaMinimo.objects.get(producto=self.producto)
+        # 2 por día, sin variación, durante 4 días de plazo
+        self.assertEqual(propuesta.minimo_sugerido, Decimal('8'))
+        self.assertEqual((propuesta.dias_entrega, propuesta.pedidos_observados), (Decimal('4.0'), 1))
+
+        self.client.force_login(self.usuario)
+        self.assertContains(self.client.get(reverse('pedidos:minimos')), 'ACE-001')
+        self.client.post(reverse('pedidos:minimos'), {'accion': 'aplicar_todas'})
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_minimo, Decimal('8'))
+        self.assertFalse(PropuestaMinimo.objects.exists())
+        alerta = AlertaStock.objects.get(producto=self.producto, estado='ACTIVA', area__isnull=True)
+        self.assertEqual(alerta.stock_minimo, Decimal('8'))
+
+    def test_comando(self):
+        from io import StringIO
+
+        from django.core.management import CommandError, call_command
+
+        from .models import PropuestaMinimo
+
+        for argumentos in (['--dias', '1'], ['--z', '-0.5']):
+            with self.assertRaises(CommandError):
+                call_command('recalcular_minimos', *argumentos, stdout=StringIO())
+        self.assertFalse(PropuestaMinimo.objects.exists())
 
-# Create your tests here.
+        salida = StringIO()
+        call_command('recalcular_minimos', '--dias', '10', '--z', '0', stdout=salida)
+        self.assertIn('1 propuesta(s)', salida.getvalue())
+        # Con z = 0 no hay stock de seguridad: 2 por día durante 4 días de plazo
+        self.assertEqual(PropuestaMinimo.objects.get(producto=self.producto).minimo_sugerido, Decimal('8'))
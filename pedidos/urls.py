@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+app_name = 'pedidos'
+
+urlpatterns = [
+    path('', views.lista_pedidos, name='lista'),
+    path('nuevo/', views.crear_pedido, name='crear'),
+    path('reposicion/', views.reposicion, name='reposicion'),
+    path('minimos/', views.minimos_sugeridos, name='minimos'),
+    path('alerta/<int:producto_id>/', views.pedido_desde_alerta, name='desde_alerta'),
+    path('<int:pedido_id>/', views.detalle_pedido, name='detalle'),
+    path('<int:pedido_id>/estado/', views.cambiar_estado, name='cambiar_estado'),
+    path('<int:pedido_id>/recibir/', views.recibir_pedido, name='recibir'),
+]
@@ -1,3 +1,297 @@
-from django.shortcuts import render
+from decimal import Decimal, InvalidOperation
+from itertools import chain
 
-# Create your views here.
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+from inventario.models import Area, Producto
+from .forms import DetallePedidoFormSet, PedidoAlertaForm, PedidoForm, RecepcionForm
+from .models import DetallePedido, Pedido, PropuestaMinimo, Proveedor
+from .services.minimos import aplicar_propuestas
+from .services.recepcion import ESTADOS_RECIBIBLES, LineaRecepcion, RecepcionInvalida, registrar_recepcion
+from .services.reposicion import FACTOR_COBERTURA, generar_borradores, planificar
+
+
+# acción: (estados desde los que se permite, estado resultante)
+TRANSICIONES = {
+    'enviar': (('BORRADOR',), 'ENVIADO'),
+    'confirmar': (('ENVIADO',), 'CONFIRMADO'),
+    'cancelar': (('BORRADOR', 'ENVIADO', 'CONFIRMADO'), 'CANCELADO'),
+}
+
+# Filas de la pantalla de mínimos sugeridos; "aplicar todas" no tiene este tope
+LIMITE_PROPUESTAS = 500
+
+
+@login_required
+def lista_pedidos(request):
+    """Pedidos a proveedores con filtros por estado, proveedor y número"""
+    estado = request.GET.get('estado', '')
+    proveedor_id = request.GET.get('proveedor', '')
+    proveedor_seleccionado = int(proveedor_id) if proveedor_id.isdigit() else None
+    busqueda = request.GET.get('q', '').strip()
+
+    pedidos = Pedido.objects.select_related('proveedor', 'creado_por').annotate(
+        # Totales en la misma consulta (sin una consulta por fila)
+        items=Count('detalles'),
+        total=Sum(
+            F('detalles__cantidad_pedida') * F('detalles__precio_unitario'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+    if estado:
+        pedidos = pedidos.filter(estado=estado)
+    if proveedor_seleccionado is not None:
+        pedidos = pedidos.filter(proveedor_id=proveedor_seleccionado)
+    if busqueda:
+        pedidos = pedidos.filter(Q(numero_pedido__icontains=busqueda) | Q(proveedor__razon_social__icontains=busqueda))
+
+    return render(request, 'pedidos/lista.html', {
+        'pedidos': pedidos.order_by('-fecha_pedido')[:100],
+        'estados': Pedido.ESTADOS,
+        'estado_seleccionado': estado,
+        'proveedores': Proveedor.objects.filter(activo=True),
+        'proveedor_seleccionado': proveedor_seleccionado,
+        'busqueda': busqueda,
+    })
+
+
+@login_required
+def crear_pedido(request):
+    """Crear un pedido en borrador con una o más líneas"""
+    if request.method == 'POST':
+        form = PedidoForm(request.POST)
+        detalle_formset = DetallePedidoFormSet(request.POST, prefix='detalles')
+        if form.is_valid() and detalle_formset.is_valid():
+            with transaction.atomic():
+                pedido = form.save(commit=False)
+                pedido.creado_por = request.user
+                pedido.save()
+                detalle_formset.instance = pedido
+                detalle_formset.save()
+            messages.success(request, f'Pedido {pedido.numero_pedido} creado en borrador.')
+            return redirect('pedidos:detalle', pedido_id=pedido.pk)
+        messages.error(request, 'Corrige los errores en el formulario.')
+    else:
+        form = PedidoForm()
+        detalle_formset = DetallePedidoFormSet(prefix='detalles')
+
+    return render(request, 'pedidos/crear.html', {
+        'form': form,
+        'detalle_formset': detalle_formset,
+    })
+
+
+@login_required
+def detalle_pedido(request, pedido_id):
+    """Detalle de un pedido con sus líneas y recepciones"""
+    pedido = get_object_or_404(Pedido.objects.select_related('proveedor', 'creado_por'), pk=pedido_id)
+    detalles = list(pedido.detalles.select_related('producto'))
+    recepciones = pedido.recepciones.select_related('recibido_por').prefetch_related(
+        'detalles__detalle_pedido__producto'
+    )
+    return render(request, 'pedidos/detalle.html', {
+        'pedido': pedido,
+        'detalles': detalles,
+        'total': sum((d.subtotal() for d in detalles), Decimal('0')),
+        'recepciones': recepciones,
+        'acciones': [accion for accion, (desde, _) in TRANSICIONES.items() if pedido.estado in desde],
+        'puede_recibir': pedido.estado in ESTADOS_RECIBIBLES,
+    })
+
+
+@login_required
+@require_POST
+def cambiar_estado(request, pedido_id):
+    """Enviar, confirmar o cancelar un pedido"""
+    accion = request.POST.get('accion')
+    if accion not in TRANSICIONES:
+        messages.error(request, 'Acción no válida.')
+        return redirect('pedidos:detalle', pedido_id=pedido_id)
+
+    desde, hacia = TRANSICIONES[accion]
+    # UPDATE condicionado al estado actual: dos clics simultáneos no aplican la transición dos veces
+    if Pedido.objects.filter(pk=pedido_id, estado__in=desde).update(estado=hacia):
+        messages.success(request, f'Pedido {dict(Pedido.ESTADOS)[hacia].lower()}.')
+    else:
+        get_object_or_404(Pedido, pk=pedido_id)
+        messages.error(request, 'El pedido cambió de estado y ya no admite esa acción.')
+    return redirect('pedidos:detalle', pedido_id=pedido_id)
+
+
+def _lineas_recepcion(post, detalles, area_general):
+    """Arma las líneas desde los campos `cantidad_<id>` / `area_<id>` del formulario"""
+    lineas = []
+    errores = []
+    for detalle in detalles:
+        texto = (post.get(f'cantidad_{detalle.pk}') or '').strip().replace(',', '.')
+        if not texto:
+            continue
+        try:
+            cantidad = Decimal(texto)
+        except InvalidOperation:
+            cantidad = None
+        if cantidad is None or not cantidad.is_finite():
+            errores.append(f'{detalle.producto.nombre}: cantidad no válida.')
+            continue
+        if cantidad.normalize().as_tuple().exponent < -2:
+            errores.append(f'{detalle.producto.nombre}: la cantidad admite como máximo 2 decimales.')
+            continue
+        area = post.get(f'area_{detalle.pk}')
+        lineas.append(LineaRecepcion(
+            detalle_id=detalle.pk,
+            cantidad=cantidad,
+            area_id=int(area) if area and area.isdigit() else area_general.pk,
+        ))
+    return lineas, errores
+
+
+@login_required
+def recibir_pedido(request, pedido_id):
+    """Registrar la llegada (total o parcial) de un pedido: todas las líneas en una sola recepción"""
+    pedido = get_object_or_404(Pedido.objects.select_related('proveedor'), pk=pedido_id)
+    if pedido.estado not in ESTADOS_RECIBIBLES:
+        messages.error(request, f'El pedido {pedido.numero_pedido} está {pedido.get_estado_display().lower()}: no admite recepciones.')
+        return redirect('pedidos:detalle', pedido_id=pedido.pk)
+
+    detalles = [d for d in pedido.detalles.select_related('producto') if not d.esta_completo()]
+    for detalle in detalles:
+        # Si el POST vuelve con errores se conserva lo ingresado
+        detalle.valor_recibido = request.POST.get(f'cantidad_{detalle.pk}', '')
+        detalle.area_elegida = request.POST.get(f'area_{detalle.pk}', '')
+
+    if request.method == 'POST':
+        form = RecepcionForm(request.POST)
+        if form.is_valid():
+            lineas, errores = _lineas_recepcion(request.POST, detalles, form.cleaned_data['area_destino'])
+            try:
+                if errores:
+                    raise RecepcionInvalida(' '.join(errores))
+                resultado = registrar_recepcion(
+                    pedido, lineas, request.user, observaciones=form.cleaned_data['observaciones'],
+                )
+            except RecepcionInvalida as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(
+                    request,
+                    f'Recepción registrada ({resultado.lineas} producto(s), entrada {resultado.entrada.numero_entrada}). '
+                    f'Pedido {dict(Pedido.ESTADOS)[resultado.estado].lower()}.'
+                )
+                return redirect('pedidos:detalle', pedido_id=pedido.pk)
+    else:
+        form = RecepcionForm(initial={'area_destino': Area.objects.filter(activo=True, tipo='BODEGA').first()})
+
+    return render(request, 'pedidos/recibir.html', {
+        'pedido': pedido,
+        'detalles': detalles,
+        'form': form,
+        'areas': Area.objects.filter(activo=True),
+    })
+
+
+def _factor_cobertura(datos):
+    try:
+        factor = Decimal(datos.get('factor') or FACTOR_COBERTURA)
+    except InvalidOperation:
+        return FACTOR_COBERTURA
+    if not factor.is_finite():
+        return FACTOR_COBERTURA
+    return factor if Decimal('1') <= factor <= Decimal('12') else FACTOR_COBERTURA
+
+
+@login_required
+def reposicion(request):
+    """Sugerencias de reposición desde las alertas activas; al confirmar crea los borradores"""
+    if request.method == 'POST':
+        factor = _factor_cobertura(request.POST)
+        resultado = generar_borradores(request.user, factor=factor)
+        if resultado.pedidos:
+            messages.success(
+                request,
+                f'Se crearon {len(resultado.pedidos)} pedido(s) en borrador con {resultado.lineas} producto(s). '
+                'Revísalos antes de enviarlos.'
+            )
+        else:
+            messages.info(request, 'No hay productos por reponer con proveedor conocido.')
+        if resultado.sin_proveedor:
+            messages.warning(
+                request,
+                f'{len(resultado.sin_proveedor)} producto(s) sin historial de compras quedaron fuera: pídelos a mano.'
+            )
+        return redirect(f"{reverse('pedidos:lista')}?estado=BORRADOR")
+
+    factor = _factor_cobertura(request.GET)
+    return render(request, 'pedidos/reposicion.html', {
+        'plan': planificar(factor),
+        'factor': factor,
+    })
+
+
+@login_required
+def pedido_desde_alerta(request, producto_id):
+    """Pedido en borrador de un producto en alerta, prellenado con la sugerencia del planificador"""
+    producto = get_object_or_404(Producto.objects.select_related('categoria'), pk=producto_id, activo=True)
+    if request.method == 'POST':
+        form = PedidoAlertaForm(request.POST)
+        if form.is_valid():
+            with transaction.atomic():
+                pedido = form.save(commit=False)
+                pedido.creado_por = request.user
+                pedido.save()
+                DetallePedido.objects.create(
+                    pedido=pedido, producto=producto,
+                    cantidad_pedida=form.cleaned_data['cantidad'],
+                    precio_unitario=form.cleaned_data['precio_unitario'],
+                )
+            messages.success(request, f'Pedido {pedido.numero_pedido} creado en borrador.')
+            return redirect('pedidos:detalle', pedido_id=pedido.pk)
+        messages.error(request, 'Corrige los errores en el formulario.')
+    else:
+        plan = planificar(productos=[producto.pk])
+        sugerencia = next(chain(*plan.por_proveedor.values(), plan.sin_proveedor), None)
+        inicial = {'precio_unitario': producto.precio_unitario}
+        if sugerencia is not None:
+            inicial['cantidad'] = sugerencia.cantidad
+            inicial['proveedor'] = sugerencia.proveedor_id
+            if sugerencia.precio_unitario is not None:
+                inicial['precio_unitario'] = sugerencia.precio_unitario
+        form = PedidoAlertaForm(initial=inicial)
+
+    return render(request, 'inventario/crear_pedido_alerta.html', {
+        'producto': producto,
+        'form': form,
+        'stock_total': producto.stock_total,
+        'faltante': max(producto.stock_minimo - producto.stock_total, Decimal('0')),
+    })
+
+
+@login_required
+def minimos_sugeridos(request):
+    """Revisión de las propuestas de `recalcular_minimos`: aplicar seleccionadas o todas, o descartarlas"""
+    if request.method == 'POST':
+        accion = request.POST.get('accion')
+        seleccion = None if accion == 'aplicar_todas' else [
+            int(pid) for pid in request.POST.getlist('producto') if pid.isdigit()
+        ]
+        if seleccion == []:
+            messages.warning(request, 'No seleccionaste ningún producto.')
+        elif accion == 'descartar':
+            eliminadas, _ = PropuestaMinimo.objects.filter(producto__in=seleccion).delete()
+            messages.info(request, f'{eliminadas} propuesta(s) descartada(s).')
+        else:
+            actualizados = aplicar_propuestas(seleccion)
+            messages.success(request, f'Stock mínimo actualizado en {actualizados} producto(s); alertas reevaluadas.')
+        return redirect('pedidos:minimos')
+
+    propuestas = PropuestaMinimo.objects.select_related('producto')
+    return render(request, 'pedidos/minimos.html', {
+        'propuestas': propuestas[:LIMITE_PROPUESTAS],
+        'total': propuestas.count(),
+        'limite': LIMITE_PROPUESTAS,
+    })
@@ -17,13 +17,14 @@ class TipoReporteAdmin(admin.ModelAdmin):
 
 @admin.register(Reporte)
 class ReporteAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'tipo_reporte', 'formato', 'estado', 'generado_por', 
+    list_display = ['nombre', 'tipo_reporte', 'formato', 'estado', 'progreso', 'generado_por', 
                    'fecha_generacion', 'tamaño_archivo_display']
     list_filter = ['tipo_reporte', 'formato', 'estado', 'fecha_generacion']
     search_fields = ['nombre', 'observaciones', 'generado_por__username']
     ordering = ['-fecha_generacion']
-    readonly_fields = ['fecha_generacion', 'tamaño_archivo_display']
+    readonly_fields = ['fecha_generacion', 'tamaño_archivo_display', 'progreso', 'fecha_inicio', 'fecha_fin', 'intentos']
     date_hierarchy = 'fecha_generacion'
+    actions = ['reencolar']
     
     fieldsets = (
         ('Información del Reporte', {
@@ -40,10 +41,19 @@ class ReporteAdmin(admin.ModelAdmin):
             'fields': ('generado_por', 'fecha_generacion', 'archivo_path', 
                       'tamaño_archivo_display', 'observaciones')
         }),
+        ('Generación', {
+            'fields': ('progreso', 'fecha_inicio', 'fecha_fin', 'intentos'),
+            'classes': ('collapse',)
+        }),
     )
     
     filter_horizontal = ['categorias', 'areas', 'productos']
     
+    def reencolar(self, request, queryset):
+        total = queryset.exclude(estado='PROCESANDO').update(estado='PENDIENTE', progreso=0, intentos=0)
+        self.message_user(request, f'{total} reportes enviados a la cola de generación.')
+    reencolar.short_description = 'Volver a generar (encolar)'
+    
     def tamaño_archivo_display(self, obj):
         if obj.tamaño_archivo:
             if obj.tamaño_archivo < 1024:
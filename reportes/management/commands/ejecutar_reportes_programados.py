@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from reportes.services.programacion import ejecutar_programados
+
+
+class Command(BaseCommand):
+    help = (
+        'Scheduler de reportes programados: genera y envía por correo las configuraciones '
+        'vencidas según su frecuencia. Es seguro ejecutar varias instancias a la vez'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Ejecuta las vencidas y termina (para cron)')
+        parser.add_argument('--intervalo', type=float, default=60, help='Segundos entre revisiones')
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('--intervalo debe ser mayor a 0.')
+
+        try:
+            while True:
+                close_old_connections()
+                resultado = ejecutar_programados()
+                if resultado.total:
+                    estilo = self.style.ERROR if resultado.errores else self.style.SUCCESS
+                    self.stdout.write(estilo(
+                        f'Reportes programados enviados: {resultado.enviados}, con error: {resultado.errores}.'
+                    ))
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Scheduler de reportes detenido.')
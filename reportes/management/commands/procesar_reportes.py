@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from reportes.services.cola import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de la cola de reportes: genera en segundo plano los reportes pendientes. '
+        'Se pueden ejecutar varios a la vez (cada trabajo se reclama con bloqueo de fila)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Vacía la cola y termina')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera con la cola vacía')
+        parser.add_argument('--limite', type=int, default=None, help='Máximo de reportes por pasada')
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('--intervalo debe ser mayor a 0.')
+
+        try:
+            while True:
+                close_old_connections()
+                resultado = procesar_pendientes(limite=options['limite'])
+                if resultado.total:
+                    estilo = self.style.ERROR if resultado.errores else self.style.SUCCESS
+                    self.stdout.write(estilo(
+                        f'Reportes generados: {resultado.generados}, con error: {resultado.errores}.'
+                    ))
+                if options['una_vez']:
+                    break
+                if not resultado.total:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Worker de reportes detenido.')
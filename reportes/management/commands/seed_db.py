@@ -11,6 +11,7 @@ from inventario.models import (
 from pedidos.models import (
     Proveedor as PedProveedor, Pedido, DetallePedido, RecepcionPedido, DetalleRecepcion
 )
+from inventario.services.stock import apply_movement, apply_movements
 from reportes.models import TipoReporte, Reporte, ConfiguracionReporte, LogReporte
 from usuarios.models import PerfilUsuario
 
@@ -153,7 +154,16 @@ class Command(BaseCommand):
                 producto.stock_minimo = Decimal(stock_min)
                 producto.save()
 
-            # Crear stocks en varias áreas
+        # Stocks iniciales como movimientos INICIAL (pasan por el servicio de stock y quedan en el libro)
+        admin = User.objects.filter(username='admin').first()
+        if not admin:
+            return
+        actuales = {
+            (producto_id, area_id): cantidad
+            for producto_id, area_id, cantidad in Stock.objects.values_list('producto_id', 'area_id', 'cantidad')
+        }
+        iniciales = []
+        for producto in Producto.objects.filter(codigo__in=[p[0] for p in productos]):
             for area in Area.objects.all():
                 # dar cantidades diferentes por tipo de área
                 if area.tipo == 'BODEGA':
@@ -167,11 +177,14 @@ class Command(BaseCommand):
                 else:
                     cantidad = Decimal('10')
 
-                stock, _ = Stock.objects.get_or_create(producto=producto, area=area, defaults={'cantidad': cantidad})
-                # solo actualizar si es menor que el valor deseado
-                if stock.cantidad < cantidad:
-                    stock.cantidad = cantidad
-                    stock.save()
+                # solo completar si es menor que el valor deseado
+                actual = actuales.get((producto.pk, area.pk), Decimal('0'))
+                if actual < cantidad:
+                    iniciales.append(Movimiento(
+                        producto=producto, area_destino=area, tipo='AJUSTE', motivo='INICIAL',
+                        cantidad=cantidad - actual, usuario=admin, observaciones='Stock inicial de ejemplo',
+                    ))
+        apply_movements(iniciales)
 
     def _create_entradas_movimientos(self):
         # Usar el usuario admin como registrado
@@ -204,7 +217,7 @@ class Command(BaseCommand):
                 defaults={'cantidad': Decimal('50'), 'precio_unitario': producto.precio_unitario or Decimal('0')}
             )
             if dcreated:
-                Movimiento.objects.create(
+                apply_movement(
                     producto=producto,
                     area_origen=None,
                     area_destino=detalle.area_destino,
@@ -259,6 +272,7 @@ class Command(BaseCommand):
         tipos = [
             ('Stock Critico', 'Reporte de productos con stock por debajo del mínimo', 'reportes/stock_critico.html'),
             ('Movimientos', 'Reporte de movimientos de inventario', 'reportes/movimientos.html'),
+            ('Valorización de Stock', 'Stock por producto y área al cierre de una fecha, valorizado a precio actual', 'reportes/valorizacion.html'),
         ]
         for nombre, descripcion, tpl in tipos:
             TipoReporte.objects.get_or_create(nombre=nombre, defaults={'descripcion': descripcion, 'template_nombre': tpl})
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_minimos_por_area'),
+        ('reportes', '0003_remove_kanbancard_creado_por_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='fecha_fin',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='fecha_inicio',
+            field=models.DateTimeField(blank=True, help_text='Inicio del último intento de generación', null=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='progreso',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Porcentaje de filas escritas'),
+        ),
+        migrations.AlterField(
+            model_name='reporte',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('GENERADO', 'Generado'), ('ENVIADO', 'Enviado'), ('ERROR', 'Error en Generación')], default='PENDIENTE', max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='reporte',
+            index=models.Index(condition=models.Q(('estado__in', ['PENDIENTE', 'PROCESANDO'])), fields=['fecha_generacion'], name='reporte_en_cola_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_version_inventario'),
+        ('reportes', '0004_cola_de_reportes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='huella',
+            field=models.CharField(blank=True, help_text='Hash de tipo, formato y filtros', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='version_datos',
+            field=models.BigIntegerField(blank=True, help_text='Versión del inventario al generar', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reporte',
+            index=models.Index(fields=['huella', 'version_datos'], name='reporte_huella_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:40
+
+from django.db import migrations
+
+
+def crear_tipo(apps, schema_editor):
+    TipoReporte = apps.get_model('reportes', 'TipoReporte')
+    TipoReporte.objects.get_or_create(
+        template_nombre='reportes/valorizacion.html',
+        defaults={
+            'nombre': 'Valorización de Stock',
+            'descripcion': 'Stock por producto y área al cierre de una fecha, valorizado a precio actual',
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0005_cache_de_reportes'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tipo, migrations.RunPython.noop),
+    ]
@@ -20,8 +20,14 @@ class TipoReporte(models.Model):
 
 
 class Reporte(models.Model):
-    """Reportes generados por el sistema"""
+    """Reportes generados por el sistema.
+
+    Cada reporte es también un trabajo de la cola: se crea en PENDIENTE y el
+    comando `procesar_reportes` lo genera en segundo plano (ver reportes/services).
+    """
     ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PROCESANDO', 'Procesando'),
         ('GENERADO', 'Generado'),
         ('ENVIADO', 'Enviado'),
         ('ERROR', 'Error en Generación'),
@@ -45,17 +51,36 @@ class Reporte(models.Model):
     productos = models.ManyToManyField(Producto, blank=True, help_text="Filtrar por productos específicos")
     
     # Metadatos del reporte
-    estado = models.CharField(max_length=15, choices=ESTADOS, default='GENERADO')
+    estado = models.CharField(max_length=15, choices=ESTADOS, default='PENDIENTE')
     generado_por = models.ForeignKey(User, on_delete=models.PROTECT, related_name='reportes_generados')
     fecha_generacion = models.DateTimeField(auto_now_add=True)
     archivo_path = models.CharField(max_length=500, blank=True, null=True)
     tamaño_archivo = models.IntegerField(null=True, blank=True, help_text="Tamaño en bytes")
     observaciones = models.TextField(blank=True, null=True)
     
+    # Seguimiento de la generación en segundo plano
+    progreso = models.PositiveSmallIntegerField(default=0, help_text="Porcentaje de filas escritas")
+    fecha_inicio = models.DateTimeField(null=True, blank=True, help_text="Inicio del último intento de generación")
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    
+    # Caché: mismos filtros (huella) y misma versión de datos = mismo archivo
+    huella = models.CharField(max_length=64, blank=True, help_text="Hash de tipo, formato y filtros")
+    version_datos = models.BigIntegerField(null=True, blank=True, help_text="Versión del inventario al generar")
+    
     class Meta:
         verbose_name = "Reporte"
         verbose_name_plural = "Reportes"
         ordering = ['-fecha_generacion']
+        indexes = [
+            # El worker solo busca trabajos pendientes o en proceso
+            models.Index(
+                fields=['fecha_generacion'],
+                condition=models.Q(estado__in=['PENDIENTE', 'PROCESANDO']),
+                name='reporte_en_cola_idx',
+            ),
+            models.Index(fields=['huella', 'version_datos'], name='reporte_huella_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.fecha_generacion.strftime('%d/%m/%Y %H:%M')}"
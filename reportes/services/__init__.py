@@ -0,0 +1 @@
+"""Servicios de reportes: generación de archivos y cola de trabajos en segundo plano."""
@@ -0,0 +1,67 @@
+"""Caché de reportes por contenido.
+
+Un reporte queda identificado por su huella (hash de tipo, formato, fechas y
+filtros) y por la versión de datos del inventario con que se generó
+(`inventario.services.version`). Mientras la versión no cambie, pedir de nuevo
+el mismo reporte devuelve el archivo ya generado; si hay uno igual en cola se
+reutiliza ese trabajo en lugar de encolar otro.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+from django.conf import settings
+
+from inventario.services.version import version_actual
+
+from ..models import Reporte
+
+
+GENERADOS = ('GENERADO', 'ENVIADO')
+EN_CURSO = ('PENDIENTE', 'PROCESANDO')
+
+
+def _ids(valores):
+    return sorted(int(getattr(valor, 'pk', valor)) for valor in valores)
+
+
+def calcular_huella(tipo_reporte, formato, fecha_desde=None, fecha_hasta=None, categorias=(), areas=(), productos=()):
+    datos = {
+        'tipo': tipo_reporte.pk,
+        'formato': formato,
+        'desde': fecha_desde.isoformat() if fecha_desde else None,
+        'hasta': fecha_hasta.isoformat() if fecha_hasta else None,
+        'categorias': _ids(categorias),
+        'areas': _ids(areas),
+        'productos': _ids(productos),
+    }
+    return hashlib.sha256(json.dumps(datos, sort_keys=True).encode()).hexdigest()
+
+
+def ruta_archivo(reporte):
+    return Path(settings.MEDIA_ROOT) / reporte.archivo_path if reporte.archivo_path else None
+
+
+def reporte_en_cache(huella, version=None):
+    """Reporte ya generado con esta huella y la versión de datos actual cuyo archivo sigue en disco"""
+    version = version_actual() if version is None else version
+    candidatos = Reporte.objects.filter(huella=huella, version_datos=version, estado__in=GENERADOS)
+    for reporte in candidatos.order_by('-fecha_fin'):
+        ruta = ruta_archivo(reporte)
+        if ruta and ruta.is_file():
+            return reporte
+    return None
+
+
+def pedir_reporte(tipo_reporte, usuario, formato='PDF', **filtros):
+    """Devuelve `(reporte, origen)`: el generado vigente ('cache'), uno igual en cola ('cola') o uno nuevo ('nuevo')"""
+    from .cola import solicitar_reporte
+
+    huella = calcular_huella(tipo_reporte, formato, **filtros)
+    reporte = reporte_en_cache(huella)
+    if reporte is not None:
+        return reporte, 'cache'
+    reporte = Reporte.objects.filter(huella=huella, estado__in=EN_CURSO).order_by('fecha_generacion').first()
+    if reporte is not None:
+        return reporte, 'cola'
+    return solicitar_reporte(tipo_reporte, usuario, formato=formato, **filtros), 'nuevo'
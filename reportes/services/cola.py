@@ -0,0 +1,141 @@
+"""Cola de generación de reportes sin broker externo.
+
+La tabla `Reporte` es la cola: pedir un reporte crea una fila PENDIENTE y
+responde de inmediato; el comando `procesar_reportes` (uno o varios procesos)
+reclama trabajos con `SELECT ... FOR UPDATE SKIP LOCKED`, de modo que dos
+workers nunca toman el mismo. El archivo se genera fuera de la transacción y el
+avance se publica en `Reporte.progreso`.
+
+Un trabajo en PROCESANDO por más de `TIEMPO_MAXIMO` se considera abandonado
+(worker caído) y se vuelve a tomar, hasta `MAX_INTENTOS`.
+"""
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from inventario.services.version import version_actual
+
+from ..models import LogReporte, Reporte
+from .cache import calcular_huella
+from .generacion import generar_archivo
+
+
+TIEMPO_MAXIMO = timedelta(minutes=30)
+MAX_INTENTOS = 3
+
+
+@dataclass
+class ResultadoCola:
+    generados: int = 0
+    errores: int = 0
+
+    @property
+    def total(self):
+        return self.generados + self.errores
+
+
+def solicitar_reporte(tipo_reporte, usuario, formato='PDF', nombre=None, fecha_desde=None, fecha_hasta=None,
+                      categorias=(), areas=(), productos=(), encolar=True):
+    """Encola un reporte (estado PENDIENTE) y lo devuelve sin generarlo.
+
+    Con `encolar=False` el reporte nace ya reclamado (PROCESANDO) para que quien lo
+    pide lo genere con `procesar_reporte` sin que un worker lo tome.
+    """
+    reclamo = {} if encolar else {'estado': 'PROCESANDO', 'fecha_inicio': timezone.now(), 'intentos': 1}
+    with transaction.atomic():
+        reporte = Reporte.objects.create(
+            tipo_reporte=tipo_reporte,
+            nombre=nombre or tipo_reporte.nombre,
+            formato=formato,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            generado_por=usuario,
+            huella=calcular_huella(tipo_reporte, formato, fecha_desde, fecha_hasta, categorias, areas, productos),
+            **reclamo,
+        )
+        if categorias:
+            reporte.categorias.set(categorias)
+        if areas:
+            reporte.areas.set(areas)
+        if productos:
+            reporte.productos.set(productos)
+    return reporte
+
+
+def _vencidos(ahora):
+    return Q(estado='PROCESANDO', fecha_inicio__lt=ahora - TIEMPO_MAXIMO)
+
+
+def tomar_reporte():
+    """Reclama el siguiente trabajo de la cola (o `None`) y lo marca PROCESANDO"""
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Abandonados que ya agotaron sus intentos: no se reintentan más
+        Reporte.objects.filter(_vencidos(ahora), intentos__gte=MAX_INTENTOS).update(
+            estado='ERROR', fecha_fin=ahora,
+        )
+        reporte = Reporte.objects.select_for_update(skip_locked=True).filter(
+            Q(estado='PENDIENTE') | _vencidos(ahora)
+        ).order_by('fecha_generacion', 'id').first()
+        if reporte is None:
+            return None
+        reporte.estado = 'PROCESANDO'
+        reporte.fecha_inicio = ahora
+        reporte.fecha_fin = None
+        reporte.progreso = 0
+        reporte.intentos += 1
+        reporte.save(update_fields=['estado', 'fecha_inicio', 'fecha_fin', 'progreso', 'intentos'])
+    return reporte
+
+
+def procesar_reporte(reporte):
+    """Genera el archivo de un reporte ya reclamado. Devuelve `True` si quedó GENERADO."""
+    def avisar(porcentaje):
+        Reporte.objects.filter(pk=reporte.pk).update(progreso=porcentaje)
+
+    # La versión se lee antes que los datos: si cambian durante la generación el
+    # archivo queda asociado a la versión anterior y no se sirve como vigente
+    reporte.version_datos = version_actual()
+    try:
+        ruta, tamano = generar_archivo(reporte, avisar)
+    except Exception as exc:
+        Reporte.objects.filter(pk=reporte.pk).update(estado='ERROR', fecha_fin=timezone.now())
+        LogReporte.objects.create(
+            reporte=reporte,
+            accion='ERROR_GENERACION',
+            detalle=f'{exc}\n\n{traceback.format_exc()}',
+            usuario=reporte.generado_por,
+        )
+        return False
+
+    reporte.estado = 'GENERADO'
+    reporte.archivo_path = ruta
+    reporte.tamaño_archivo = tamano
+    reporte.progreso = 100
+    reporte.fecha_fin = timezone.now()
+    reporte.save(update_fields=['estado', 'archivo_path', 'tamaño_archivo', 'progreso', 'fecha_fin', 'version_datos'])
+    LogReporte.objects.create(
+        reporte=reporte,
+        accion='GENERADO',
+        detalle=f'{ruta} ({tamano} bytes)',
+        usuario=reporte.generado_por,
+    )
+    return True
+
+
+def procesar_pendientes(limite=None):
+    """Procesa trabajos de la cola hasta vaciarla (o hasta `limite`)"""
+    resultado = ResultadoCola()
+    while limite is None or resultado.total < limite:
+        reporte = tomar_reporte()
+        if reporte is None:
+            break
+        if procesar_reporte(reporte):
+            resultado.generados += 1
+        else:
+            resultado.errores += 1
+    return resultado
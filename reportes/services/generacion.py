@@ -0,0 +1,258 @@
+"""Generación de archivos de reporte.
+
+Cada `TipoReporte` se resuelve por el nombre base de su `template_nombre`
+("reportes/stock_critico.html" -> "stock_critico"). Las filas salen de
+`inventario.services.exportacion`, recorridas con cursor, o de las fotos diarias
+de stock en la valorización (`inventario.services.snapshots.as_of`), y se
+escriben en un temporal dentro de `MEDIA_ROOT/reportes/AAAA/MM/` que se renombra
+al terminar: un reporte nunca queda apuntando a un archivo a medio escribir.
+"""
+import os
+import tempfile
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from inventario.models import Area, Movimiento, Producto, Stock
+from inventario.services import exportacion
+from inventario.services.fechas import inicio_del_dia
+from inventario.services.snapshots import as_of
+
+
+CARPETA = 'reportes'
+EXTENSIONES = {'PDF': 'pdf', 'EXCEL': 'xlsx', 'CSV': 'csv'}
+AVISAR_CADA = exportacion.TAMANO_BLOQUE  # filas entre actualizaciones de progreso
+
+PDF_MOVIMIENTOS = {
+    'anchos': [70, 55, 150, 60, 80, 45, 90, 90, 60],
+    'largos': [None, None, 35, None, None, None, 20, 20, 15],
+    'alineaciones': {0: 'CENTER', 5: 'RIGHT'},
+}
+
+CABECERAS_VALORIZACION = ['Código', 'Producto', 'Categoría', 'Área', 'Unidad', 'Cantidad', 'Precio Unitario', 'Valor']
+PDF_VALORIZACION = {
+    'anchos': [60, 170, 90, 90, 50, 60, 70, 80],
+    'largos': [None, 35, 18, 18, None, None, None, None],
+    'alineaciones': {0: 'CENTER', 4: 'CENTER', 5: 'RIGHT', 6: 'RIGHT', 7: 'RIGHT'},
+}
+
+
+class TipoNoSoportado(ValueError):
+    """El tipo de reporte no tiene generador"""
+
+
+@dataclass
+class Contenido:
+    """Qué escribir para un reporte: título, filas (según formato) y opciones de cada escritor"""
+    titulo: str
+    queryset: object  # queryset o lista de filas (para contar el avance)
+    filas: object  # callable(formato) -> iterable de tuplas
+    cabeceras: list
+    excel: dict = field(default_factory=dict)
+    pdf: dict = field(default_factory=dict)
+    subtitulo: str | None = None
+
+
+def clave_tipo(tipo_reporte):
+    return Path(tipo_reporte.template_nombre or '').stem
+
+
+def _ids(relacion):
+    return list(relacion.values_list('pk', flat=True))
+
+
+def _filtrar_productos(reporte, queryset):
+    categorias = _ids(reporte.categorias)
+    productos = _ids(reporte.productos)
+    areas = _ids(reporte.areas)
+    if categorias:
+        queryset = queryset.filter(categoria_id__in=categorias)
+    if productos:
+        queryset = queryset.filter(pk__in=productos)
+    if areas:
+        queryset = queryset.filter(Exists(
+            Stock.objects.filter(producto=OuterRef('pk'), area_id__in=areas, cantidad__gt=0)
+        ))
+    return queryset
+
+
+def _filas_productos(queryset):
+    def filas(formato):
+        if formato != 'PDF':
+            return exportacion.filas_productos_stock(queryset)
+        return (
+            (id_, codigo or '-', nombre, categoria or 'Sin cat.', unidad, stock or 0,
+             f'${precio:.2f}' if precio else '-', areas)
+            for id_, codigo, nombre, categoria, unidad, stock, precio, areas
+            in exportacion.filas_productos_stock(queryset, entre='(', cierre=')', separador=', ')
+        )
+    return filas
+
+
+def _productos_stock(reporte):
+    queryset = _filtrar_productos(reporte, exportacion.productos_con_stock())
+    return Contenido(
+        titulo='Reporte de Productos con Stock', queryset=queryset,
+        filas=_filas_productos(queryset), cabeceras=exportacion.CABECERAS,
+    )
+
+
+def _stock_critico(reporte):
+    queryset = _filtrar_productos(reporte, Producto.objects.filter(
+        activo=True, stock_total__lte=F('stock_minimo')
+    ).order_by('categoria__nombre', 'nombre', 'id'))
+    return Contenido(
+        titulo='Reporte de Stock Crítico', queryset=queryset,
+        filas=_filas_productos(queryset), cabeceras=exportacion.CABECERAS,
+    )
+
+
+def _movimientos(reporte):
+    queryset = Movimiento.objects.order_by('fecha', 'id')
+    if reporte.fecha_desde:
+        queryset = queryset.filter(fecha__gte=inicio_del_dia(reporte.fecha_desde))
+    if reporte.fecha_hasta:
+        queryset = queryset.filter(fecha__lt=inicio_del_dia(reporte.fecha_hasta + timedelta(days=1)))
+    categorias = _ids(reporte.categorias)
+    productos = _ids(reporte.productos)
+    areas = _ids(reporte.areas)
+    if categorias:
+        queryset = queryset.filter(producto__categoria_id__in=categorias)
+    if productos:
+        queryset = queryset.filter(producto_id__in=productos)
+    if areas:
+        queryset = queryset.filter(Q(area_origen_id__in=areas) | Q(area_destino_id__in=areas))
+
+    def filas(formato):
+        filas = exportacion.filas_movimientos(queryset)
+        if formato != 'PDF':
+            return filas
+        return ((fecha.strftime('%d/%m/%Y %H:%M'), *resto) for fecha, *resto in filas)
+
+    return Contenido(
+        titulo='Reporte de Movimientos', queryset=queryset, filas=filas,
+        cabeceras=exportacion.CABECERAS_MOVIMIENTOS,
+        excel={'anchos': exportacion.ANCHOS_MOVIMIENTOS, 'numericas': (5,)},
+        pdf=PDF_MOVIMIENTOS,
+    )
+
+
+def _valorizacion(reporte):
+    """Stock por producto y área al cierre de `fecha_hasta` (por defecto ayer), a precio actual"""
+    dia = reporte.fecha_hasta or timezone.localdate() - timedelta(days=1)
+    categorias = _ids(reporte.categorias)
+    productos = _ids(reporte.productos)
+    filtro = None
+    if categorias or productos:
+        filtro = Producto.objects.all()
+        if categorias:
+            filtro = filtro.filter(categoria_id__in=categorias)
+        if productos:
+            filtro = filtro.filter(pk__in=productos)
+        filtro = filtro.values('pk')
+    saldos = as_of(dia, productos=filtro, areas=_ids(reporte.areas) or None)
+
+    catalogo = Producto.objects.select_related('categoria').in_bulk({producto_id for producto_id, _ in saldos})
+    areas = dict(Area.objects.values_list('pk', 'nombre'))
+    lineas = []
+    for (producto_id, area_id), cantidad in saldos.items():
+        producto = catalogo[producto_id]
+        precio = producto.precio_unitario or Decimal('0')
+        lineas.append((
+            producto.codigo, producto.nombre, producto.categoria.nombre if producto.categoria else 'Sin cat.',
+            areas.get(area_id, ''), producto.get_unidad_medida_display(), cantidad, precio,
+            (cantidad * precio).quantize(Decimal('0.01')),
+        ))
+    lineas.sort(key=lambda fila: (fila[2], fila[1], fila[3]))
+
+    def filas(formato):
+        if formato != 'PDF':
+            return lineas
+        return ((*resto, f'${precio:,.0f}', f'${valor:,.0f}') for *resto, precio, valor in lineas)
+
+    return Contenido(
+        titulo='Valorización de Stock', queryset=lineas, filas=filas, cabeceras=CABECERAS_VALORIZACION,
+        excel={'anchos': [16, 40, 24, 20, 12, 12, 16, 18], 'numericas': (5, 6, 7)},
+        pdf=PDF_VALORIZACION,
+        subtitulo=f'Stock al cierre del {dia:%d/%m/%Y} (precios actuales)',
+    )
+
+
+GENERADORES = {
+    'productos_stock': _productos_stock,
+    'stock_critico': _stock_critico,
+    'movimientos': _movimientos,
+    'valorizacion': _valorizacion,
+}
+
+
+def contenido(reporte):
+    generador = GENERADORES.get(clave_tipo(reporte.tipo_reporte))
+    if generador is None:
+        raise TipoNoSoportado(f'No hay generador para el tipo de reporte "{reporte.tipo_reporte.nombre}".')
+    return generador(reporte)
+
+
+def _con_avance(filas, total, avisar):
+    for numero, fila in enumerate(filas, 1):
+        yield fila
+        if avisar and total and numero % AVISAR_CADA == 0:
+            avisar(min(99, numero * 100 // total))
+
+
+def _subtitulo(reporte):
+    if reporte.fecha_desde or reporte.fecha_hasta:
+        desde = reporte.fecha_desde.strftime('%d/%m/%Y') if reporte.fecha_desde else '...'
+        hasta = reporte.fecha_hasta.strftime('%d/%m/%Y') if reporte.fecha_hasta else '...'
+        return f'Período: {desde} - {hasta}'
+    return None
+
+
+def escribir(reporte, destino, avisar=None):
+    """Escribe el archivo del reporte en `destino` (ruta); `avisar(porcentaje)` informa el avance"""
+    datos = contenido(reporte)
+    total = None
+    if avisar:
+        total = len(datos.queryset) if isinstance(datos.queryset, list) else datos.queryset.count()
+    filas = _con_avance(datos.filas(reporte.formato), total, avisar)
+
+    if reporte.formato == 'CSV':
+        with open(destino, 'w', newline='', encoding='utf-8') as archivo:
+            archivo.writelines(exportacion.lineas_csv(filas, datos.cabeceras))
+    elif reporte.formato == 'EXCEL':
+        exportacion.escribir_excel(filas, destino, cabeceras=datos.cabeceras, titulo=datos.titulo[:31], **datos.excel)
+    elif reporte.formato == 'PDF':
+        opciones = {'cabeceras': datos.cabeceras, **datos.pdf} if datos.pdf else {}
+        subtitulo = datos.subtitulo or _subtitulo(reporte)
+        exportacion.escribir_pdf(filas, destino, titulo=datos.titulo, subtitulo=subtitulo, **opciones)
+    else:
+        raise TipoNoSoportado(f'Formato de reporte no soportado: {reporte.formato}.')
+
+
+def ruta_relativa(reporte):
+    """Ruta del archivo del reporte, relativa a `MEDIA_ROOT`"""
+    fecha = timezone.localtime(reporte.fecha_generacion)
+    nombre = slugify(reporte.nombre)[:80] or 'reporte'
+    return f'{CARPETA}/{fecha:%Y/%m}/{reporte.pk}-{nombre}.{EXTENSIONES[reporte.formato]}'
+
+
+def generar_archivo(reporte, avisar=None):
+    """Genera el archivo del reporte bajo `MEDIA_ROOT`. Devuelve `(ruta_relativa, tamaño)`."""
+    relativa = ruta_relativa(reporte)
+    destino = Path(settings.MEDIA_ROOT) / relativa
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=destino.parent, prefix='.generando-', suffix=destino.suffix)
+    os.close(descriptor)
+    try:
+        escribir(reporte, temporal, avisar)
+        os.replace(temporal, destino)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+    return relativa, destino.stat().st_size
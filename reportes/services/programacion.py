@@ -0,0 +1,181 @@
+"""Ejecución de reportes programados (`ConfiguracionReporte`).
+
+Cada pasada toma las configuraciones vencidas (`proximo_envio <= ahora`) con
+`SELECT ... FOR UPDATE SKIP LOCKED` y, dentro de esa misma transacción corta,
+adelanta `proximo_envio` al siguiente período. Recién después de confirmar se
+genera el reporte y se envía por correo: otro scheduler que corra en paralelo ya
+no ve la configuración como vencida, así que nunca se envía dos veces. Si la
+generación o el envío fallan (o la configuración no tiene destinatarios) queda
+registrado en `LogReporte` y la configuración espera a su próximo período.
+
+Los períodos perdidos (scheduler detenido) no se recuperan uno por uno: se envía
+una vez y se salta al siguiente período futuro.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import ConfiguracionReporte, LogReporte, Reporte
+from .cola import procesar_reporte, solicitar_reporte
+
+
+DIAS_POR_FRECUENCIA = {'DIARIO': 1, 'SEMANAL': 7, 'QUINCENAL': 14}
+
+
+@dataclass
+class ResultadoProgramados:
+    enviados: int = 0
+    errores: int = 0
+
+    @property
+    def total(self):
+        return self.enviados + self.errores
+
+
+def _mover_meses(fecha, meses):
+    """Misma fecha `meses` después (o antes); el día se ajusta al largo del mes"""
+    anio, mes = divmod(fecha.year * 12 + fecha.month - 1 + meses, 12)
+    mes += 1
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def siguiente_envio(fecha, frecuencia):
+    """Fecha del envío siguiente a `fecha` según la frecuencia"""
+    if frecuencia == 'MENSUAL':
+        return _mover_meses(fecha, 1)
+    return fecha + timedelta(days=DIAS_POR_FRECUENCIA[frecuencia])
+
+
+def proximo_futuro(programado, frecuencia, ahora):
+    """Primer envío posterior a `ahora` partiendo de `programado` (conserva la hora del día)"""
+    siguiente = siguiente_envio(programado, frecuencia)
+    while siguiente <= ahora:
+        siguiente = siguiente_envio(siguiente, frecuencia)
+    return siguiente
+
+
+def periodo_cubierto(programado, frecuencia):
+    """Fechas `(desde, hasta)` que cubre un envío: el período anterior completo"""
+    dia = timezone.localtime(programado).date()
+    if frecuencia == 'MENSUAL':
+        return _mover_meses(dia, -1), dia - timedelta(days=1)
+    return dia - timedelta(days=DIAS_POR_FRECUENCIA[frecuencia]), dia - timedelta(days=1)
+
+
+def destinatarios(configuracion):
+    return [email.strip() for email in configuracion.emails_destino.replace(';', ',').split(',') if email.strip()]
+
+
+def tomar_vencida(ahora=None):
+    """Reclama una configuración vencida: adelanta su `proximo_envio` y la devuelve con el envío que le tocaba.
+
+    Devuelve `(configuracion, programado)` o `None` si no hay vencidas. Una
+    configuración activa sin `proximo_envio` se considera vencida (primer envío).
+    """
+    ahora = ahora or timezone.now()
+    with transaction.atomic():
+        configuracion = ConfiguracionReporte.objects.select_for_update(skip_locked=True).filter(
+            Q(proximo_envio__lte=ahora) | Q(proximo_envio__isnull=True),
+            activo=True,
+        ).order_by('proximo_envio', 'id').first()
+        if configuracion is None:
+            return None
+        programado = configuracion.proximo_envio or ahora
+        configuracion.proximo_envio = proximo_futuro(programado, configuracion.frecuencia, ahora)
+        configuracion.save(update_fields=['proximo_envio'])
+    return configuracion, programado
+
+
+def generar_reporte(configuracion, programado):
+    """Crea y genera (en este proceso) el reporte de un envío programado"""
+    desde, hasta = periodo_cubierto(programado, configuracion.frecuencia)
+    reporte = solicitar_reporte(
+        configuracion.tipo_reporte,
+        configuracion.creado_por,
+        formato=configuracion.formato,
+        nombre=f'{configuracion.nombre} {timezone.localtime(programado):%d/%m/%Y}',
+        fecha_desde=desde,
+        fecha_hasta=hasta,
+        categorias=list(configuracion.categorias_default.all()),
+        areas=list(configuracion.areas_default.all()),
+        encolar=False,
+    )
+    return reporte if procesar_reporte(reporte) else None
+
+
+def enviar_reporte(configuracion, reporte):
+    """Envía el archivo del reporte a los destinatarios de la configuración"""
+    mensaje = EmailMessage(
+        subject=f'[{settings.HOTEL_CONFIG["NOMBRE_HOTEL"]}] {reporte.nombre}',
+        body=(
+            f'Adjunto el reporte "{configuracion.tipo_reporte.nombre}" '
+            f'({configuracion.get_frecuencia_display().lower()}).\n'
+            f'Período: {reporte.fecha_desde:%d/%m/%Y} - {reporte.fecha_hasta:%d/%m/%Y}.'
+        ),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=destinatarios(configuracion),
+    )
+    mensaje.attach_file(str(Path(settings.MEDIA_ROOT) / reporte.archivo_path))
+    mensaje.send()
+
+
+def ejecutar_configuracion(configuracion, programado):
+    """Genera y envía un reporte programado ya reclamado. Devuelve `True` si se envió."""
+    if not destinatarios(configuracion):
+        LogReporte.objects.create(
+            configuracion=configuracion,
+            accion='ERROR_ENVIO',
+            detalle='La configuración no tiene destinatarios: el envío no se generó.',
+            usuario=configuracion.creado_por,
+        )
+        return False
+
+    reporte = generar_reporte(configuracion, programado)
+    if reporte is None:
+        # El detalle del fallo ya quedó en el log del reporte
+        LogReporte.objects.create(
+            configuracion=configuracion,
+            accion='ERROR_GENERACION',
+            detalle=f'No se pudo generar el envío programado del {timezone.localtime(programado):%d/%m/%Y %H:%M}.',
+            usuario=configuracion.creado_por,
+        )
+        return False
+
+    try:
+        enviar_reporte(configuracion, reporte)
+    except Exception as exc:
+        LogReporte.objects.create(
+            reporte=reporte, configuracion=configuracion, accion='ERROR_ENVIO',
+            detalle=str(exc), usuario=configuracion.creado_por,
+        )
+        return False
+
+    ahora = timezone.now()
+    Reporte.objects.filter(pk=reporte.pk).update(estado='ENVIADO')
+    ConfiguracionReporte.objects.filter(pk=configuracion.pk).update(ultimo_envio=ahora)
+    LogReporte.objects.create(
+        reporte=reporte, configuracion=configuracion, accion='ENVIADO',
+        detalle=f'Enviado a: {", ".join(destinatarios(configuracion))}', usuario=configuracion.creado_por,
+    )
+    return True
+
+
+def ejecutar_programados(limite=None, ahora=None):
+    """Ejecuta todas las configuraciones vencidas (o hasta `limite`)"""
+    resultado = ResultadoProgramados()
+    while limite is None or resultado.total < limite:
+        tomada = tomar_vencida(ahora)
+        if tomada is None:
+            break
+        if ejecutar_configuracion(*tomada):
+            resultado.enviados += 1
+        else:
+            resultado.errores += 1
+    return resultado
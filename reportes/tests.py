@@ -1,3 +1,231 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from inventario.models import Area, Categoria, Producto, Stock
+from inventario.services.stock import recalcular_totales
+
+from .models import ConfiguracionReporte, LogReporte, Reporte, TipoReporte
+from .services.cola import procesar_pendientes, solicitar_reporte, tomar_reporte
+from .services.programacion import ejecutar_programados, siguiente_envio
+
+
+class ColaReportesTests(TestCase):
+    """Los reportes se encolan al pedirlos y los genera el worker"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('gerencia', password='clave')
+        categoria = Categoria.objects.create(nombre='Vinos de prueba')
+        bodega = Area.objects.create(nombre='Bodega vinos', tipo='BODEGA')
+        for i in range(3):
+            producto = Producto.objects.create(
+                codigo=f'VIN-{i:03d}', nombre=f'Vino {i}', categoria=categoria,
+                unidad_medida='BOT', stock_minimo=Decimal('2'), precio_unitario=Decimal('8990'),
+            )
+            Stock.objects.create(producto=producto, area=bodega, cantidad=Decimal(i))
+        recalcular_totales()
+        cls.critico = TipoReporte.objects.create(nombre='Stock Critico', template_nombre='reportes/stock_critico.html')
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_pedir_pdf_solo_encola(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('inventario:reporte_productos_stock'), {'formato': 'pdf'})
+        self.assertRedirects(respuesta, reverse('reportes:lista'))
+        reporte = Reporte.objects.get()
+        self.assertEqual((reporte.estado, reporte.archivo_path), ('PENDIENTE', None))
+
+        lista = self.client.get(reverse('reportes:lista'))
+        self.assertTrue(lista.context['hay_en_cola'])
+
+        resultado = procesar_pendientes()
+        self.assertEqual((resultado.generados, resultado.errores), (1, 0))
+        reporte.refresh_from_db()
+        self.assertEqual((reporte.estado, reporte.progreso, reporte.intentos), ('GENERADO', 100, 1))
+        archivo = Path(self.media) / reporte.archivo_path
+        self.assertTrue(archivo.read_bytes().startswith(b'%PDF'))
+        self.assertEqual(reporte.tamaño_archivo, archivo.stat().st_size)
+        self.assertTrue(LogReporte.objects.filter(reporte=reporte, accion='GENERADO').exists())
+
+    def test_formatos_y_filtros(self):
+        for formato in ('CSV', 'EXCEL', 'PDF'):
+            solicitar_reporte(self.critico, self.usuario, formato=formato)
+        self.assertEqual(procesar_pendientes().generados, 3)
+        csv = Reporte.objects.get(formato='CSV')
+        lineas = (Path(self.media) / csv.archivo_path).read_text(encoding='utf-8').splitlines()
+        # Stock 0, 1 y 2 con mínimo 2: los tres están en falta
+        self.assertEqual(len(lineas), 4)
+        self.assertTrue(lineas[1].startswith(f'{Producto.objects.get(codigo="VIN-000").pk},VIN-000,'))
+
+    def test_valorizacion_desde_la_foto_diaria(self):
+        from inventario.services.snapshots import generar_snapshots
+
+        generar_snapshots(timezone.localdate() - timedelta(days=1))
+        tipo = TipoReporte.objects.get(template_nombre='reportes/valorizacion.html')
+        for formato in ('CSV', 'EXCEL', 'PDF'):
+            solicitar_reporte(tipo, self.usuario, formato=formato)
+        self.assertEqual(procesar_pendientes().generados, 3)
+        csv = Reporte.objects.get(formato='CSV')
+        lineas = (Path(self.media) / csv.archivo_path).read_text(encoding='utf-8').splitlines()
+        # Solo saldos distintos de 0, valorizados al precio del producto
+        self.assertEqual(lineas[1:], [
+            'VIN-001,Vino 1,Vinos de prueba,Bodega vinos,Botella,1.00,8990.00,8990.00',
+            'VIN-002,Vino 2,Vinos de prueba,Bodega vinos,Botella,2.00,8990.00,17980.00',
+        ])
+
+    def test_tipo_sin_generador_queda_en_error(self):
+        tipo = TipoReporte.objects.create(nombre='Desconocido', template_nombre='reportes/otro.html')
+        reporte = solicitar_reporte(tipo, self.usuario, formato='CSV')
+        self.assertEqual(procesar_pendientes().errores, 1)
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, 'ERROR')
+        self.assertTrue(LogReporte.objects.filter(reporte=reporte, accion='ERROR_GENERACION').exists())
+        self.assertIsNone(tomar_reporte())
+
+
+class ReportesProgramadosTests(TestCase):
+    """El scheduler envía cada configuración vencida una sola vez por período"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('programador', password='clave')
+        categoria = Categoria.objects.create(nombre='Aseo de prueba')
+        otra = Categoria.objects.create(nombre='Otra de prueba')
+        for codigo, cat in (('ASE-001', categoria), ('OTR-001', otra)):
+            Producto.objects.create(
+                codigo=codigo, nombre=codigo, categoria=cat, unidad_medida='UN', stock_minimo=Decimal('1'),
+            )
+        tipo = TipoReporte.objects.create(nombre='Stock Critico', template_nombre='reportes/stock_critico.html')
+        cls.configuracion = ConfiguracionReporte.objects.create(
+            nombre='Semanal aseo', tipo_reporte=tipo, frecuencia='SEMANAL', formato='CSV',
+            emails_destino='gerencia@hotel.local, bodega@hotel.local', creado_por=cls.usuario,
+            # Vencida hace 18 días: dos envíos semanales perdidos
+            proximo_envio=timezone.now() - timedelta(days=18),
+        )
+        cls.configuracion.categorias_default.set([categoria])
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_envia_y_adelanta_el_proximo_envio(self):
+        from django.core import mail
+        from django.core.management import call_command
+
+        programado = self.configuracion.proximo_envio
+        self.assertEqual(ejecutar_programados().enviados, 1)
+        self.assertEqual(ejecutar_programados().total, 0)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['gerencia@hotel.local', 'bodega@hotel.local'])
+        self.assertEqual(mail.outbox[0].from_email, settings.DEFAULT_FROM_EMAIL)
+        nombre, contenido, _ = mail.outbox[0].attachments[0]
+        self.assertIn('ASE-001', contenido)
+        self.assertNotIn('OTR-001', contenido)
+
+        self.configuracion.refresh_from_db()
+        # Los períodos perdidos se saltan: el próximo es el primer envío futuro a la misma hora
+        self.assertEqual(self.configuracion.proximo_envio, programado + timedelta(days=21))
+        self.assertIsNotNone(self.configuracion.ultimo_envio)
+        reporte = Reporte.objects.get()
+        dia = timezone.localtime(programado).date()
+        self.assertEqual(
+            (reporte.estado, reporte.fecha_desde, reporte.fecha_hasta),
+            ('ENVIADO', dia - timedelta(days=7), dia - timedelta(days=1)),
+        )
+        self.assertTrue(LogReporte.objects.filter(configuracion=self.configuracion, accion='ENVIADO').exists())
+
+        # Con la configuración al día el comando no envía nada
+        call_command('ejecutar_reportes_programados', '--una-vez', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_sin_destinatarios_no_se_marca_enviado(self):
+        from django.core import mail
+
+        ConfiguracionReporte.objects.filter(pk=self.configuracion.pk).update(emails_destino=' ; ')
+        resultado = ejecutar_programados()
+        self.assertEqual((resultado.enviados, resultado.errores), (0, 1))
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Reporte.objects.exists())
+        self.assertEqual(LogReporte.objects.get(configuracion=self.configuracion).accion, 'ERROR_ENVIO')
+        self.configuracion.refresh_from_db()
+        self.assertIsNone(self.configuracion.ultimo_envio)
+
+    def test_frecuencia_mensual_ajusta_fin_de_mes(self):
+        self.assertEqual(siguiente_envio(date(2026, 1, 31), 'MENSUAL'), date(2026, 2, 28))
+        self.assertEqual(siguiente_envio(date(2026, 12, 15), 'MENSUAL'), date(2027, 1, 15))
+        self.assertEqual(siguiente_envio(date(2026, 1, 1), 'QUINCENAL'), date(2026, 1, 15))
+
+
+class CacheReportesTests(TestCase):
+    """Pedir el mismo reporte sin cambios de inventario reutiliza el archivo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('auditor', password='clave')
+        categoria = Categoria.objects.create(nombre='Licores de prueba')
+        cls.bodega = Area.objects.create(nombre='Bodega licores', tipo='BODEGA')
+        cls.producto = Producto.objects.create(
+            codigo='LIC-001', nombre='Pisco', categoria=categoria,
+            unidad_medida='BOT', stock_minimo=Decimal('1'), precio_unitario=Decimal('6990'),
+        )
+        Stock.objects.create(producto=cls.producto, area=cls.bodega, cantidad=Decimal('4'))
+        recalcular_totales()
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.client.force_login(self.usuario)
+
+    def _pedir_pdf(self):
+        return self.client.get(reverse('inventario:reporte_productos_stock'), {'formato': 'pdf'})
+
+    def test_reutiliza_hasta_que_cambia_el_inventario(self):
+        from inventario.services.stock import apply_movement
+
+        self._pedir_pdf()
+        self._pedir_pdf()
+        # El segundo pedido se une al trabajo en cola
+        self.assertEqual(Reporte.objects.count(), 1)
+        procesar_pendientes()
+        reporte = Reporte.objects.get()
+
+        respuesta = self._pedir_pdf()
+        descarga = reverse('reportes:descargar', args=[reporte.pk])
+        self.assertRedirects(respuesta, descarga, fetch_redirect_response=False)
+        self.assertEqual(Reporte.objects.count(), 1)
+
+        primera = self.client.get(descarga)
+        self.assertEqual(primera.status_code, 200)
+        revalidada = self.client.get(descarga, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(revalidada.status_code, 304)
+
+        # La versión avanza al confirmar la transacción del movimiento
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_movement(
+                producto=self.producto, area_origen=self.bodega, tipo='SALIDA', motivo='CONSUMO',
+                cantidad=Decimal('1'), usuario=self.usuario,
+            )
+        self.assertRedirects(self._pedir_pdf(), reverse('reportes:lista'))
+        self.assertEqual(Reporte.objects.filter(estado='PENDIENTE').count(), 1)
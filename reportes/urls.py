@@ -5,4 +5,5 @@ app_name = 'reportes'
 
 urlpatterns = [
     path('', views.lista_reportes, name='lista'),
+    path('<int:reporte_id>/descargar/', views.descargar_reporte, name='descargar'),
 ]
@@ -1,15 +1,20 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from .models import Reporte
+from .services.cache import GENERADOS, ruta_archivo
 
 @login_required
 def lista_reportes(request):
 	"""Lista simple de reportes disponibles con enlace al archivo si existe"""
 	reportes = Reporte.objects.select_related('tipo_reporte', 'generado_por').order_by('-fecha_generacion')[:100]
 
-	# Preparar urls de archivos: si es ruta relativa, la servimos desde MEDIA_URL
-	from django.conf import settings
-	def build_file_url(path: str | None) -> str | None:
+	# Preparar urls de archivos: las rutas relativas (bajo MEDIA_ROOT) se sirven por descargar_reporte
+	def build_file_url(r) -> str | None:
+		path = r.archivo_path
 		if not path:
 			return None
 		path = str(path)
@@ -18,17 +23,47 @@ def lista_reportes(request):
 		if path.startswith('/'):
 			# Ruta absoluta en el servidor; la dejamos tal cual
 			return path
-		# Considerar como ruta relativa a MEDIA_URL
-		return f"{settings.MEDIA_URL.rstrip('/')}/{path}"
+		# Ruta relativa a MEDIA_ROOT: se descarga por la vista (ETag / Last-Modified)
+		return reverse('reportes:descargar', args=[r.pk])
 
 	reportes_info = []
 	for r in reportes:
+		en_cola = r.estado in ('PENDIENTE', 'PROCESANDO')
 		reportes_info.append({
 			'obj': r,
-			'archivo_url': build_file_url(r.archivo_path),
+			# Mientras se genera, el archivo anterior (si lo hay) no es el definitivo
+			'archivo_url': None if en_cola else build_file_url(r),
 			'tamano_kb': (r.tamaño_archivo / 1024) if r.tamaño_archivo else None,
+			'en_cola': en_cola,
 		})
 
 	return render(request, 'reportes/lista.html', {
 		'reportes': reportes_info,
+		# La página se recarga sola mientras haya reportes generándose
+		'hay_en_cola': any(item['en_cola'] for item in reportes_info),
 	})
+
+
+@login_required
+def descargar_reporte(request, reporte_id):
+	"""Descarga el archivo de un reporte generado.
+
+	El ETag (huella + versión de datos) y Last-Modified permiten al navegador
+	revalidar y recibir 304 sin volver a transferir el archivo.
+	"""
+	reporte = get_object_or_404(Reporte, pk=reporte_id, estado__in=GENERADOS)
+	ruta = ruta_archivo(reporte)
+	if ruta is None or not ruta.is_file():
+		raise Http404('El archivo del reporte ya no está disponible.')
+
+	# Débil: dos generaciones con igual huella y versión tienen el mismo contenido
+	# salvo detalles como la fecha de emisión impresa
+	etag = f'W/"{reporte.huella[:32] or reporte.pk}-{reporte.version_datos or 0}"'
+	modificado = int(ruta.stat().st_mtime)
+	respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+	if respuesta is None:
+		respuesta = FileResponse(ruta.open('rb'), as_attachment=True, filename=ruta.name)
+	respuesta['ETag'] = etag
+	respuesta['Last-Modified'] = http_date(modificado)
+	patch_cache_control(respuesta, private=True, no_cache=True)
+	return respuesta